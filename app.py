@@ -5,30 +5,159 @@ This module provides the application factory pattern for creating Flask app inst
 Routes are organized in separate blueprint modules in the routes package.
 """
 
+import os
+from typing import Dict, Optional
+
 from flask import Flask
-from database import init_database, add_sample_data
+from database import (
+    init_database, add_book_insert_listener, add_availability_listener, configure_shards, use_branch
+)
+from repositories import SQLiteRepository, InMemoryRepository, use_repository
 from routes import register_blueprints
+from routes.branch_router import register_branch_router
+from routes.request_clock import register_request_clock
+from routes.repository_scope import register_repository
+from routes.streaming import register_templates
+from routes.admission import AdmissionController, SQLiteBucketStore, register_admission_control
+from services.suggest_index import suggest_index
+from services.search_index import search_index
+from services.fee_policy import fee_policies, load_fee_policies
+from services.job_queue import JobQueue
+from services.event_bus import publish_availability, publish_book_added
+from services.availability_snapshot import availability_snapshot
+from services.query_stats import query_stats, DEFAULT_SLOW_MS
+
+
+def parse_branch_databases(value: str) -> Dict[str, str]:
+    """Parse "north=north.db,south=south.db" into a branch -> file mapping."""
+    branch_databases = {}
+    for item in value.split(','):
+        if '=' in item:
+            branch, path = item.split('=', 1)
+            branch_databases[branch.strip()] = path.strip()
+    return branch_databases
+
+
+def configure_from_env(branch_databases: Optional[Dict[str, str]] = None,
+                       fee_policy_config: Optional[Dict] = None) -> Dict[str, str]:
+    """
+    Apply the settings the app and the standalone scripts share: branch
+    shards (LIBRARY_BRANCH_DATABASES) and fee policies (LIBRARY_FEE_POLICIES,
+    else the standard policy). Arguments given take precedence over the
+    environment.
+
+    Returns:
+        Dict[str, str]: The branch -> database file mapping in use
+    """
+    if branch_databases is None:
+        branch_databases = parse_branch_databases(os.environ.get('LIBRARY_BRANCH_DATABASES', ''))
+    configure_shards(branch_databases)
+
+    # Load fee policy rules once; policies are compiled on first use
+    if fee_policy_config is not None:
+        fee_policies.load(fee_policy_config)
+    elif os.environ.get('LIBRARY_FEE_POLICIES'):
+        load_fee_policies(os.environ['LIBRARY_FEE_POLICIES'])
+    else:
+        fee_policies.load({})
+    return branch_databases
 
 
-def create_app():
+def create_app(branch_databases: Optional[Dict[str, str]] = None, fee_policy_config: Optional[Dict] = None,
+               admission: Optional[AdmissionController] = None, repository=None,
+               job_queue: Optional[JobQueue] = None, availability_snapshot_path: Optional[str] = None,
+               template_cache_dir: Optional[str] = None):
     """
     Application factory function to create and configure Flask app.
     
+    Args:
+        branch_databases: Optional branch -> SQLite file mapping to shard
+            catalog and loans by branch (defaults to LIBRARY_BRANCH_DATABASES)
+        fee_policy_config: Optional per-branch/patron-type fee rules (defaults
+            to the JSON file named by LIBRARY_FEE_POLICIES, else the standard policy)
+        admission: Optional rate limiter/load shedder (defaults to in-process
+            buckets, shared through the SQLite file LIBRARY_RATE_LIMIT_DB if set)
+        repository: Optional storage for books, loans and holds (defaults to
+            SQLite; LIBRARY_STORAGE=memory selects an in-memory repository)
+        job_queue: Optional queue for background payment jobs (defaults to
+            the SQLite file LIBRARY_JOB_DB, else jobs.db, created on first use)
+        availability_snapshot_path: Optional memory-mapped file shared by
+            worker processes for catalog/search availability (defaults to
+            LIBRARY_AVAILABILITY_SNAPSHOT; without one, books are read from SQLite)
+        template_cache_dir: Optional directory for compiled template bytecode
+            shared by workers and restarts (defaults to LIBRARY_TEMPLATE_CACHE)
+    
     Returns:
         Flask: Configured Flask application instance
+
+    Raises:
+        ValueError: If an availability snapshot is requested with a repository other than SQLite
     """
     app = Flask(__name__)
     app.secret_key = "super secret key"
     
-    # Initialize the database
+    # Branch shards and fee policies, as for the standalone scripts
+    branch_databases = configure_from_env(branch_databases, fee_policy_config)
+    
+    # Time database.py statements for /debug/queries when asked to (off by default)
+    if os.environ.get('LIBRARY_QUERY_STATS'):
+        query_stats.enable(float(os.environ.get('LIBRARY_SLOW_QUERY_MS', DEFAULT_SLOW_MS)))
+    
+    if repository is None:
+        repository = InMemoryRepository() if os.environ.get('LIBRARY_STORAGE') == 'memory' else SQLiteRepository()
+    if availability_snapshot_path is None:
+        availability_snapshot_path = os.environ.get('LIBRARY_AVAILABILITY_SNAPSHOT')
+    if availability_snapshot_path and repository.name != 'sqlite':
+        # The snapshot is rebuilt from SQLite and versioned by its catalog_version
+        raise ValueError("The availability snapshot requires SQLite storage")
+    
+    # Initialize the database (every branch shard when sharded); SQLite-only
+    # features such as authors and statistics need it whatever the repository
     init_database()
+    for branch in branch_databases:
+        with use_branch(branch):
+            init_database()
     
-    # Add sample data for testing and demonstration
-    add_sample_data()
+    with use_repository(repository):
+        # Add sample data for testing and demonstration
+        repository.init()
+        
+        # Build the type-ahead and search indexes and keep them current as books are added
+        books = repository.get_all_books()
+        suggest_index.rebuild(books)
+        search_index.rebuild(books)
+    add_book_insert_listener(suggest_index.add_book)
+    add_book_insert_listener(search_index.add_book)
     
-    # Register all route blueprints
+    # Stream availability changes and new books to /api/events
+    add_availability_listener(publish_availability)
+    add_book_insert_listener(publish_book_added)
+    
+    # Serve catalog and search availability from a file shared by the workers
+    if availability_snapshot_path:
+        availability_snapshot.open(availability_snapshot_path)
+        add_availability_listener(availability_snapshot.update)
+        add_book_insert_listener(availability_snapshot.book_added)
+    
+    # Reject excess requests before anything touches the database
+    if admission is None:
+        store = SQLiteBucketStore(os.environ['LIBRARY_RATE_LIMIT_DB']) if os.environ.get('LIBRARY_RATE_LIMIT_DB') else None
+        admission = AdmissionController(store)
+    register_admission_control(app, admission)
+    
+    # Payments, refunds and verifications run in scripts/job_worker.py
+    app.extensions['job_queue'] = job_queue or JobQueue(os.environ.get('LIBRARY_JOB_DB', 'jobs.db'))
+    
+    # Pin one clock per request, route each request to the app's repository
+    # and its branch's shard, then register all route blueprints
+    register_request_clock(app)
+    register_repository(app, repository)
+    register_branch_router(app)
     register_blueprints(app)
     
+    # Compile the templates now rather than on the first request for each
+    register_templates(app, template_cache_dir)
+    
     return app
 
 
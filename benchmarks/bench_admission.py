@@ -0,0 +1,32 @@
+"""
+Cost of a rate-limit check with the in-process and shared SQLite stores.
+
+Usage:
+    python benchmarks/bench_admission.py [checks]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes.admission import AdmissionController, MemoryBucketStore, SQLiteBucketStore
+
+
+def main():
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, store in (('memory', MemoryBucketStore()), ('sqlite', SQLiteBucketStore(os.path.join(tmp, 'limits.db')))):
+            controller = AdmissionController(store)
+            start = time.perf_counter()
+            for i in range(checks):
+                controller.check('api.search_books_api', f'10.0.{i % 250}.{i % 200}', f'{i % 5000:06d}')
+            elapsed = time.perf_counter() - start
+            print(f'{name:7s} {elapsed / checks * 1e6:6.1f} us/check, rate limited: '
+                  f'{controller.snapshot()["rate_limited"]["search"]}')
+
+
+if __name__ == '__main__':
+    main()
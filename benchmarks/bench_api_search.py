@@ -0,0 +1,73 @@
+"""
+Benchmark for /api/search: bytes on the wire and serialization CPU per request.
+
+Usage:
+    python benchmarks/bench_api_search.py [num_books]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from app import create_app
+from routes import api_response
+
+
+def build_catalog(num_books: int):
+    """Fill the benchmark database with synthetic books."""
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, ?, ?)
+    ''', ((f'Synthetic Title {i}', f'Author Name {i % 5000}', f'{9780000000000 + i}', 3, 3)
+          for i in range(num_books)))
+    database.backfill_authors(conn)
+    conn.commit()
+    conn.close()
+
+
+def measure(client, query: str, encoding: str, runs: int = 5):
+    """Return (bytes on wire, mean wall ms, mean CPU ms) for a request."""
+    size = 0
+    wall = cpu = 0.0
+    for _ in range(runs):
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        response = client.get(f'/api/search?{query}', headers={'Accept-Encoding': encoding})
+        wall += time.perf_counter() - start_wall
+        cpu += time.process_time() - start_cpu
+        size = len(response.get_data())
+    return size, wall / runs * 1000, cpu / runs * 1000
+
+
+def main():
+    num_books = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        app = create_app()
+        build_catalog(num_books)
+        client = app.test_client()
+
+        print(f'encoder: {"orjson" if api_response.orjson else "json (stdlib)"}, '
+              f'brotli: {"yes" if api_response.brotli else "no"}, books: {num_books}')
+        print(f'{"query":<45} {"encoding":<10} {"bytes":>12} {"wall ms":>10} {"cpu ms":>10}')
+        for query in ('type=author&q=e', 'type=author&q=e&fields=id,title'):
+            for encoding in ('identity', 'gzip', 'br'):
+                size, wall, cpu = measure(client, query, encoding)
+                print(f'{query:<45} {encoding:<10} {size:>12} {wall:>10.1f} {cpu:>10.1f}')
+
+        rows = database.get_all_books()
+        start = time.process_time()
+        api_response.dumps({'results': rows})
+        fast = time.process_time() - start
+        start = time.process_time()
+        api_response.json.dumps({'results': rows}).encode('utf-8')
+        stdlib = time.process_time() - start
+        print(f'serialize {len(rows)} rows: lean encoder {fast * 1000:.1f} ms, stdlib json {stdlib * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
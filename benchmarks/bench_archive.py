@@ -0,0 +1,107 @@
+"""
+Effect of archiving returned loans on open-loan queries.
+
+Fills borrow_records with years of synthetic returned loans plus a small
+number of open ones, then compares get_patron_borrowed_books and
+get_patron_borrow_count latency and the size of borrow_records (table and
+indexes, via dbstat) before and after archiving.
+
+Usage:
+    python benchmarks/bench_archive.py [num_loans]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import (
+    init_database, get_db_connection, archive_returned_loans,
+    get_patron_borrowed_books, get_patron_borrow_count, get_patron_borrow_history
+)
+
+NUM_BOOKS = 1000
+NUM_PATRONS = 20000
+QUERIES = 2000
+
+
+def synthetic_loans(num_loans: int, rng: random.Random):
+    """Yield loan rows spread over five years; 1% are still open."""
+    now = datetime.now()
+    for _ in range(num_loans):
+        borrowed = now - timedelta(days=rng.uniform(0, 5 * 365))
+        returned = None
+        if rng.random() >= 0.01:
+            returned = min(borrowed + timedelta(days=rng.randint(1, 20)), now).isoformat()
+        yield (f'{rng.randrange(NUM_PATRONS):06d}', rng.randrange(1, NUM_BOOKS + 1),
+               borrowed.isoformat(), (borrowed + timedelta(days=14)).isoformat(), returned)
+
+
+def table_size(name: str) -> int:
+    """Bytes used by a table and its indexes."""
+    conn = get_db_connection()
+    size = conn.execute('''
+        SELECT COALESCE(SUM(pgsize), 0) FROM dbstat
+        WHERE name = ? OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?)
+    ''', (name, name)).fetchone()[0]
+    conn.close()
+    return size
+
+
+def time_queries(patrons):
+    """Average microseconds per open-loan lookup pair."""
+    start = time.perf_counter()
+    for patron_id in patrons:
+        get_patron_borrowed_books(patron_id)
+        get_patron_borrow_count(patron_id)
+    return (time.perf_counter() - start) / len(patrons) * 1e6
+
+
+def main():
+    num_loans = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(42)
+    patrons = [f'{rng.randrange(NUM_PATRONS):06d}' for _ in range(QUERIES)]
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        init_database()
+
+        conn = get_db_connection()
+        conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, 1, 1)',
+                         ((f'Book {i}', f'Author {i}', f'{i:013d}') for i in range(NUM_BOOKS)))
+        conn.executemany('''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+            VALUES (?, ?, ?, ?, ?)
+        ''', synthetic_loans(num_loans, rng))
+        conn.commit()
+        conn.close()
+
+        before_size = table_size('borrow_records')
+        before_us = time_queries(patrons)
+
+        start = time.perf_counter()
+        archived = archive_returned_loans(older_than_days=90, batch_size=5000)
+        elapsed = time.perf_counter() - start
+        print(f'archived {archived} of {num_loans} loans in {elapsed:.1f} s ({archived / elapsed:,.0f} loans/s)')
+
+        conn = get_db_connection()
+        conn.execute('VACUUM')
+        conn.close()
+
+        after_size = table_size('borrow_records')
+        after_us = time_queries(patrons)
+        print(f'borrow_records + indexes: {before_size / 2**20:.1f} MiB -> {after_size / 2**20:.1f} MiB')
+        print(f'open-loan lookups: {before_us:.0f} us -> {after_us:.0f} us per patron')
+
+        start = time.perf_counter()
+        for patron_id in patrons[:200]:
+            get_patron_borrow_history(patron_id, limit=20)
+        print(f'history page (hot + cold): {(time.perf_counter() - start) / 200 * 1e6:.0f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Catalog and search availability from SQLite versus the shared snapshot file.
+
+Builds a synthetic catalog in a temporary database, then times the catalog
+read (every book with its counters) and search-result annotation (books for
+20 hit IDs) through SQLiteRepository with and without the snapshot, and the
+cost a borrow pays to keep the file current.
+
+Usage:
+    python benchmarks/bench_availability_snapshot.py [books]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, add_availability_listener
+from repositories import SQLiteRepository
+from services.availability_snapshot import availability_snapshot
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+from services.synthetic_data import generate_library
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    seconds = (time.perf_counter() - start) / count
+    print(f'{label:40s} {seconds * 1000:9.3f} ms')
+
+
+def main():
+    books = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repository = SQLiteRepository()
+    rng = random.Random(3)
+    hits = [rng.randrange(1, books + 1) for _ in range(20)]
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'library.db')
+        init_database()
+        generate_library(books=books, patrons=1000, years=0.1, events=False)
+
+        timed('catalog, SQLite', 5, repository.get_all_books)
+        timed('search annotation (20 IDs), SQLite', 500, lambda: repository.get_books_by_ids(hits))
+        timed('borrow + return, no snapshot', 100,
+              lambda: (borrow_book_by_patron('100001', hits[0]), return_book_by_patron('100001', hits[0])))
+
+        start = time.perf_counter()
+        availability_snapshot.open(os.path.join(tmp, 'availability.snap'))
+        print(f'{"build snapshot":40s} {(time.perf_counter() - start) * 1000:9.3f} ms')
+        add_availability_listener(availability_snapshot.update)
+        repository.get_all_books()  # loads the book columns once
+
+        timed('catalog, snapshot', 5, repository.get_all_books)
+        timed('search annotation (20 IDs), snapshot', 500, lambda: repository.get_books_by_ids(hits))
+        timed('borrow + return, with snapshot', 100,
+              lambda: (borrow_book_by_patron('100001', hits[0]), return_book_by_patron('100001', hits[0])))
+        print(availability_snapshot.snapshot())
+        availability_snapshot.close()
+
+
+if __name__ == '__main__':
+    main()
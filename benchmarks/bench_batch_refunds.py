@@ -0,0 +1,37 @@
+"""
+Refunds per second of a batch at different concurrency levels.
+
+Uses the real (simulated) gateway, whose refund_payment sleeps 0.5 s, so
+one refund at a time tops out at 2 refunds/s.
+
+Usage:
+    python benchmarks/bench_batch_refunds.py [refunds] [concurrency ...]
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.batch_refunds import RefundBatch, run_refund_batch
+
+
+def main():
+    refunds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    levels = [int(arg) for arg in sys.argv[2:]] or [1, 8, 32, 64]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for concurrency in levels:
+            count = min(refunds, 8) if concurrency == 1 else refunds  # 0.5 s each; a few are enough
+            batch = RefundBatch(os.path.join(tmp, f'batch-{concurrency}.db'))
+            batch.load([{'transaction_id': f'txn_{n}', 'amount': 5.0} for n in range(count)])
+            summary = run_refund_batch(batch, concurrency=concurrency)
+            batch.close()
+            print(f"concurrency {concurrency:3d}: {summary['sent']:5d} refunds in {summary['seconds']:6.2f} s "
+                  f"= {summary['refunds_per_second']:6.1f} refunds/s "
+                  f"(10,000 refunds: {10000 / summary['refunds_per_second'] / 60:6.1f} min)")
+
+
+if __name__ == '__main__':
+    main()
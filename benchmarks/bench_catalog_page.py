@@ -0,0 +1,72 @@
+"""
+Catalog page for a large catalog: buffered render_template versus streamed.
+
+Builds a synthetic catalog in a temporary database and requests /catalog
+through the WSGI app, timing the first byte and the whole body, then again
+tracing peak Python memory (tracemalloc) while the page is produced. The
+buffered variant renders the same template with render_template, as before.
+
+Usage:
+    python benchmarks/bench_catalog_page.py [books]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template
+from werkzeug.test import EnvironBuilder
+
+import database
+from app import create_app
+from database import init_database
+from repositories import get_all_books
+from services.synthetic_data import generate_library
+
+
+def request_page(app, path, trace=False):
+    """(seconds to first byte, seconds to last byte, body bytes, peak traced bytes or None)."""
+    environ = EnvironBuilder(path=path).get_environ()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    body = app.wsgi_app(environ, lambda status, headers: None)
+    first = None
+    size = 0
+    for chunk in body:
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    if hasattr(body, 'close'):
+        body.close()
+    total = time.perf_counter() - start
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return first, total, size, peak
+
+
+def main():
+    books = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'library.db')
+        init_database()
+        generate_library(books=books, patrons=1000, years=0.1, events=False)
+        app = create_app(template_cache_dir=os.path.join(tmp, 'templates'))
+        app.add_url_rule('/catalog-buffered', 'catalog_buffered',
+                         lambda: render_template('catalog.html', books=get_all_books()))
+
+        for label, path in (('render_template (buffered)', '/catalog-buffered'), ('stream_page', '/catalog')):
+            first, total, size, _ = request_page(app, path)
+            peak = request_page(app, path, trace=True)[3]  # tracing slows it down, so measured apart
+            print(f'{label:28s} first byte {first * 1000:8.1f} ms   total {total * 1000:8.1f} ms   '
+                  f'{size / 1e6:6.1f} MB page   peak {peak / 1e6:7.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
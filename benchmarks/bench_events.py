@@ -0,0 +1,106 @@
+"""
+Live availability with 1,000 connected event-stream clients under borrow load.
+
+Each client is a thread running the same loop as an /api/events stream
+(next_batch, join the formatted events). Borrow/return latency is measured with no
+clients and with all of them connected, next to what polling /catalog
+(get_all_books once per screen refresh) would cost instead.
+
+Usage:
+    python benchmarks/bench_events.py [clients] [borrow_return_pairs]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, insert_book, get_all_books, add_availability_listener
+from services.event_bus import live_events, publish_availability
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+NUM_BOOKS = 500
+
+
+def borrow_load(pairs: int):
+    """Per-operation latencies of borrow/return pairs on random books."""
+    rng = random.Random(7)
+    latencies = []
+    for n in range(pairs):
+        patron_id, book_id = f'{n % 1000:06d}', rng.randrange(1, NUM_BOOKS + 1)
+        start = time.perf_counter()
+        borrow_book_by_patron(patron_id, book_id)
+        return_book_by_patron(patron_id, book_id)
+        latencies.append((time.perf_counter() - start) / 2)
+    return latencies
+
+
+def client(stop: threading.Event, received: list, index: int):
+    subscription = live_events.subscribe()
+    try:
+        while not stop.is_set():
+            batch = subscription.next_batch(timeout=0.5)
+            if batch:
+                received[index] += len(''.join(event['text'] for event in batch))
+    finally:
+        subscription.close()
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    pairs = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        init_database()
+        for n in range(NUM_BOOKS):
+            insert_book(f'Book {n}', f'Author {n % 50}', f'{n:013d}', 5, 5)
+        add_availability_listener(publish_availability)
+
+        start = time.perf_counter()
+        baseline = borrow_load(pairs)
+        baseline_seconds = time.perf_counter() - start
+
+        stop = threading.Event()
+        received = [0] * clients
+        threads = [threading.Thread(target=client, args=(stop, received, n), daemon=True) for n in range(clients)]
+        for thread in threads:
+            thread.start()
+        while live_events.snapshot()['subscribers'] < clients:
+            time.sleep(0.01)
+        before = live_events.snapshot()
+        start = time.perf_counter()
+        loaded = borrow_load(pairs)
+        seconds = time.perf_counter() - start
+        time.sleep(live_events.coalesce_seconds * 2)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        after = live_events.snapshot()
+
+        start = time.perf_counter()
+        for _ in range(20):
+            get_all_books()
+        poll = (time.perf_counter() - start) / 20
+
+    published = after['published'] - before['published']
+    delivered = after['delivered'] - before['delivered']
+    for label, latencies, elapsed in (('no clients', baseline, baseline_seconds),
+                                      (f'{clients} clients', loaded, seconds)):
+        print(f'borrow/return, {label:12s}: p50 {statistics.median(latencies) * 1e3:6.2f} ms  '
+              f'p99 {sorted(latencies)[int(len(latencies) * 0.99)] * 1e3:6.2f} ms  {pairs * 2 / elapsed:5.0f} ops/s')
+    print(f'{published} events published, {delivered} delivered '
+          f'({delivered / clients:.0f} per client after coalescing, {published} without), '
+          f'{after["resyncs"] - before["resyncs"]} resyncs, {sum(received) / clients / 1024:.1f} KiB per client')
+    print(f'polling instead: get_all_books {poll * 1e3:.2f} ms per screen refresh; '
+          f'{clients} screens every 2 s = {clients / 2 * poll:.2f} CPU-s per second')
+
+
+if __name__ == '__main__':
+    main()
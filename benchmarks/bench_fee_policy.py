@@ -0,0 +1,56 @@
+"""
+Late fee lookups: precomputed cents table versus the branchy float formula,
+and bulk evaluation of loans across patron types.
+
+Usage:
+    python benchmarks/bench_fee_policy.py [iterations]
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+
+from services.fee_policy import default_fee_policy, FeePolicyRegistry
+
+
+def formula_fee(days_overdue):
+    """The tiered fee as previously computed inline."""
+    if days_overdue < 1:
+        return 0
+    fee_amount = 0
+    if (days_overdue <= 7):
+        fee_amount = 0.50 * days_overdue
+    else:
+        fee_amount = 3.50 + (days_overdue - 7)
+    if (fee_amount > 15.00):
+        fee_amount = 15.00
+    return fee_amount
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(42)
+    days = [rng.randint(-14, 60) for _ in range(iterations)]
+
+    for name, func in (('formula', formula_fee), ('table', default_fee_policy.fee),
+                       ('table (cents)', default_fee_policy.fee_cents)):
+        elapsed = min(timeit.repeat(lambda: [func(d) for d in days], number=1, repeat=5))
+        print(f'{name:14s} {elapsed / iterations * 1e9:6.1f} ns/lookup')
+
+    registry = FeePolicyRegistry({
+        'patron_types': {'staff': ['99'], 'student': ['2']},
+        'rules': [{'patron_type': 'staff', 'later_cents': 0}, {'patron_type': 'student', 'cap_cents': 500}]
+    })
+    as_of = datetime(2024, 6, 30)
+    loans = [(f'{rng.randrange(1000000):06d}', as_of - timedelta(days=d)) for d in days]
+    elapsed = min(timeit.repeat(lambda: registry.evaluate_bulk(loans, as_of, 'main'), number=1, repeat=5))
+    print(f'{"bulk (3 types)":14s} {elapsed / iterations * 1e9:6.1f} ns/loan')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Request latency with refunds run inline versus queued for background workers.
+
+Inline, each request waits for PaymentGateway.refund_payment (0.5 s). Queued,
+the request only inserts a job; worker threads drain the queue in parallel.
+Uses the real (simulated) gateway, so the gateway latency is genuine sleep.
+
+Usage:
+    python benchmarks/bench_jobs.py [refunds] [worker_threads]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from app import create_app
+from routes.admission import AdmissionController
+from services.job_queue import JobQueue, start_workers
+from services.library_service import refund_late_fee_payment
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    refunds = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        queue = JobQueue(os.path.join(tmp, 'jobs.db'))
+        client = create_app(admission=AdmissionController(limits={}), job_queue=queue).test_client()
+
+        inline = []
+        for n in range(min(refunds, 8)):  # 0.5 s each; a few are enough
+            start = time.perf_counter()
+            refund_late_fee_payment(f'txn_{n}', 5.0)
+            inline.append(time.perf_counter() - start)
+
+        queued = []
+        start_all = time.perf_counter()
+        for n in range(refunds):
+            start = time.perf_counter()
+            client.post('/api/jobs/refunds', json={'transaction_id': f'txn_{n}', 'amount': 5.0})
+            queued.append(time.perf_counter() - start)
+
+        stop = threading.Event()
+        workers = start_workers(queue, threads, stop, poll_interval=0.01)
+        while queue.metrics()['jobs']['done'] < refunds:
+            time.sleep(0.01)
+        drained = time.perf_counter() - start_all
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+    print(f'inline request:  p50 {statistics.median(inline) * 1000:7.1f} ms  p99 {percentile(inline, 0.99) * 1000:7.1f} ms')
+    print(f'queued request:  p50 {statistics.median(queued) * 1000:7.1f} ms  p99 {percentile(queued, 0.99) * 1000:7.1f} ms')
+    print(f'{refunds} refunds done in {drained:.2f} s with {threads} worker threads '
+          f'({refunds / drained:.1f} refunds/s; inline: {1 / statistics.mean(inline):.1f}/s)')
+
+
+if __name__ == '__main__':
+    main()
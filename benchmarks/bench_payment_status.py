@@ -0,0 +1,41 @@
+"""
+Payment status lookups: one gateway call per ID versus cached and batched.
+
+Uses the real (simulated) gateway, whose status calls sleep 0.3 s.
+
+Usage:
+    python benchmarks/bench_payment_status.py [transactions]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.payment_service import PaymentGateway
+from services.payment_status import PaymentStatusCache
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    print(f'{label:34s} {seconds * 1000:9.1f} ms  ({seconds / count * 1e6:10.1f} µs per transaction)')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    transaction_ids = [f'txn_{n}' for n in range(count)]
+    gateway = PaymentGateway()
+    cache = PaymentStatusCache(gateway)
+
+    timed('uncached, one call per ID', count, lambda: [gateway.verify_payment_status(t) for t in transaction_ids])
+    timed('get_many, cold (one round trip)', count, lambda: cache.get_many(transaction_ids))
+    timed('get_many, warm', count, lambda: cache.get_many(transaction_ids))
+    timed('get per ID, warm', count, lambda: [cache.get(t) for t in transaction_ids])
+    print(cache.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Cost of query statistics: statements with timing disabled versus enabled.
+
+Disabled, database.py opens plain sqlite3 connections, so this is the
+baseline; enabled, every statement goes through the timing cursor.
+
+Usage:
+    python benchmarks/bench_query_stats.py [operations]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, add_sample_data, get_book_by_id, get_all_books
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+from services.query_stats import query_stats
+
+
+def run(count):
+    """Per-operation microseconds for point lookups, catalog reads and borrow/return pairs."""
+    results = []
+    for fn in (lambda: get_book_by_id(1), get_all_books,
+               lambda: (borrow_book_by_patron('123456', 1), return_book_by_patron('123456', 1))):
+        start = time.perf_counter()
+        for _ in range(count):
+            fn()
+        results.append((time.perf_counter() - start) / count * 1e6)
+    return results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'library.db')
+        init_database()
+        add_sample_data()
+
+        print(f'{"":10s} {"get_book_by_id":>16s} {"get_all_books":>16s} {"borrow+return":>16s}  (µs)')
+        run(count // 10)  # warm up
+        for label, enabled in (('disabled', False), ('enabled', True), ('disabled', False)):
+            query_stats.enable() if enabled else query_stats.disable()
+            print(f'{label:10s} ' + ' '.join(f'{us:16.1f}' for us in run(count)))
+        query_stats.enable()
+        print(f'{len(query_stats.report()["statements"])} statement shapes recorded')
+        query_stats.disable()
+
+
+if __name__ == '__main__':
+    main()
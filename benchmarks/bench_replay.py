@@ -0,0 +1,86 @@
+"""
+Replay speed of the loan event log.
+
+Writes a synthetic history of borrow/return events (about 1% of loans left
+open), then times a full replay, snapshot creation, and a replay from the
+snapshot after 1% more events.
+
+Usage:
+    python benchmarks/bench_replay.py [num_events]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, get_db_connection
+from services.loan_replay import replay, create_snapshot
+
+NUM_BOOKS = 100000
+
+
+def synthetic_events(first_loan: int, num_events: int, rng: random.Random):
+    """Yield event rows: every loan is borrowed, and 99% are returned later."""
+    loan_id = first_loan
+    open_loans = []
+    emitted = 0
+    while emitted < num_events:
+        if open_loans and (rng.random() < 0.5 or len(open_loans) > 1000):
+            loan, patron_id, book_id = open_loans.pop(rng.randrange(len(open_loans)))
+            if rng.random() < 0.99:
+                yield ('returned', patron_id, book_id, loan, None, None, '2024-01-02T00:00:00')
+                emitted += 1
+            continue
+        loan_id += 1
+        patron_id, book_id = f'{rng.randrange(1000000):06d}', rng.randrange(1, NUM_BOOKS + 1)
+        open_loans.append((loan_id, patron_id, book_id))
+        yield ('borrowed', patron_id, book_id, loan_id, None, None, '2024-01-01T00:00:00')
+        emitted += 1
+
+
+def write_events(rows):
+    """Bulk insert event rows in one transaction."""
+    conn = get_db_connection()
+    conn.executemany('''
+        INSERT INTO loan_events (event_type, patron_id, book_id, loan_id, copy_id, amount, occurred_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    num_events = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        init_database()
+
+        start = time.perf_counter()
+        write_events(synthetic_events(0, num_events, rng))
+        print(f'wrote {num_events} events in {time.perf_counter() - start:.1f} s')
+
+        start = time.perf_counter()
+        state = replay(use_snapshot=False)
+        elapsed = time.perf_counter() - start
+        print(f'full replay: {elapsed:.2f} s ({num_events / elapsed:,.0f} events/s), '
+              f'{len(state.open_loans)} open loans')
+
+        start = time.perf_counter()
+        create_snapshot()
+        print(f'snapshot: {time.perf_counter() - start:.2f} s')
+
+        extra = num_events // 100
+        write_events(synthetic_events(num_events * 2, extra, rng))
+        start = time.perf_counter()
+        replay()
+        print(f'replay from snapshot (+{extra} events): {time.perf_counter() - start:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
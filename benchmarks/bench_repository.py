@@ -0,0 +1,61 @@
+"""
+Service-level throughput on the SQLite and in-memory repositories.
+
+Runs the same mix of library_service calls (borrow, status report, late
+fee, return) against each backend, so the difference is the storage cost
+and the in-memory figure is roughly the cost of the service logic alone.
+
+Usage:
+    python benchmarks/bench_repository.py [operations]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database
+from repositories import SQLiteRepository, InMemoryRepository, use_repository, insert_book
+from services.library_service import (
+    borrow_book_by_patron, return_book_by_patron, get_patron_status_report, calculate_late_fee_for_book
+)
+
+NUM_BOOKS = 200
+NUM_PATRONS = 500
+
+
+def run(repository, operations: int) -> float:
+    """Seconds taken for the operation mix against a freshly seeded repository."""
+    rng = random.Random(42)
+    with use_repository(repository):
+        for n in range(NUM_BOOKS):
+            insert_book(f'Book {n}', f'Author {n % 50}', f'{n:013d}', 5, 5)
+
+        start = time.perf_counter()
+        for _ in range(operations // 4):
+            patron_id = f'{rng.randrange(NUM_PATRONS):06d}'
+            book_id = rng.randrange(1, NUM_BOOKS + 1)
+            borrow_book_by_patron(patron_id, book_id)
+            get_patron_status_report(patron_id)
+            calculate_late_fee_for_book(patron_id, book_id)
+            return_book_by_patron(patron_id, book_id)
+        return time.perf_counter() - start
+
+
+def main():
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        init_database()
+        for name, repository in (('sqlite', SQLiteRepository()), ('memory', InMemoryRepository())):
+            elapsed = run(repository, operations)
+            print(f'{name:7s} {elapsed:7.3f} s  {operations / elapsed:9.0f} ops/s  '
+                  f'{elapsed / operations * 1e6:8.1f} us/op')
+
+
+if __name__ == '__main__':
+    main()
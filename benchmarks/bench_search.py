@@ -0,0 +1,101 @@
+"""
+Recall/latency benchmark: ranked search vs. search_books_in_catalog.
+
+Queries are a random book's title plus its author's surname, once verbatim
+and once with a typo. The substring search only gets the title (it cannot
+combine fields). Recall is the share of queries whose target book appears
+in the first 10 results.
+
+Usage:
+    python benchmarks/bench_search.py [num_books] [num_queries]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from app import create_app
+from services.library_service import search_books_in_catalog, search_books_ranked
+from services.search_index import search_index
+
+WORDS = ('river', 'night', 'garden', 'silent', 'winter', 'empire', 'glass', 'stone', 'shadow', 'ocean',
+         'crown', 'forest', 'iron', 'golden', 'last', 'hidden', 'secret', 'storm', 'harbor', 'mirror',
+         'lantern', 'orchard', 'falcon', 'meadow', 'thunder', 'velvet', 'copper', 'willow', 'ember', 'quiet')
+SURNAMES = ('Smith', 'Nakamura', 'Okafor', 'Lindqvist', 'Moreau', 'Castillo', 'Petrov', 'Haddad',
+            'Kowalski', 'Oyelaran', 'Fitzgerald', 'Brennan', 'Varga', 'Sato', 'Delacroix', 'Abernathy')
+
+
+def build_catalog(num_books: int, rng: random.Random):
+    """Fill the benchmark database with synthetic books and return them."""
+    books = []
+    for i in range(num_books):
+        title = ' '.join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 5)))
+        author = f'{rng.choice(SURNAMES)[0]}. {rng.choice(SURNAMES)}'
+        books.append((title, author, f'{9780000000000 + i}', 1, 1))
+
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, ?, ?)
+    ''', books)
+    database.backfill_authors(conn)
+    conn.commit()
+    conn.close()
+
+
+def add_typo(word: str, rng: random.Random) -> str:
+    """Swap two adjacent letters of a word."""
+    i = rng.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def run(name, queries, search):
+    """Time a search function over queries and report recall@10."""
+    found = hits = 0
+    start = time.perf_counter()
+    for query, target in queries:
+        results = search(query)
+        hits += len(results)
+        if any(book['id'] == target for book in results[:10]):
+            found += 1
+    elapsed = (time.perf_counter() - start) / len(queries)
+    print(f'{name:<32} recall@10 {found / len(queries):6.1%}   avg hits {hits / len(queries):9.1f}'
+          f'   latency {elapsed * 1000:8.2f} ms')
+
+
+def main():
+    num_books = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        create_app()
+        build_catalog(num_books, rng)
+
+        start = time.perf_counter()
+        search_index.rebuild(database.get_all_books())
+        print(f'books: {num_books}, index build: {time.perf_counter() - start:.2f} s')
+
+        books = database.get_all_books()
+        exact, typo = [], []
+        for book in rng.sample(books, num_queries):
+            words = book['title'].lower().split()
+            surname = book['author'].split()[-1].lower()
+            exact.append((' '.join(words), surname, book['id']))
+            typo.append((' '.join([add_typo(words[0], rng)] + words[1:]), surname, book['id']))
+
+        for label, queries in (('exact', exact), ('typo', typo)):
+            run(f'substring title ({label})', [(title, target) for title, _, target in queries],
+                lambda q: search_books_in_catalog(q, 'title'))
+            run(f'ranked title+author ({label})', [(f'{title} {surname}', target) for title, surname, target in queries],
+                lambda q: search_books_ranked(q, 10))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Write throughput vs. shard count.
+
+A fixed number of worker processes borrow and return books as fast as they
+can; worker i writes to branch i % shards. With one shard every worker
+contends for the same SQLite writer lock.
+
+Usage:
+    python benchmarks/bench_shards.py [workers] [cycles_per_worker]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import configure_shards, use_branch, init_database, insert_book, borrow_copy, return_copy
+
+
+def worker(args):
+    """Run borrow/return cycles against one branch; returns writes performed."""
+    shards, branch, cycles, worker_id = args
+    configure_shards(shards)
+    patron_id = f'{worker_id:06d}'
+    now = datetime.now()
+    writes = 0
+    with use_branch(branch):
+        for _ in range(cycles):
+            if borrow_copy(patron_id, 1, now, now + timedelta(days=14)) is not None:
+                writes += 1
+            if return_copy(patron_id, 1, now):
+                writes += 1
+    return writes
+
+
+def run(tmp: str, num_shards: int, workers: int, cycles: int) -> float:
+    """Return writes/sec for a given shard count."""
+    shards = {f'branch{i}': os.path.join(tmp, f's{num_shards}_{i}.db') for i in range(num_shards)}
+    database.DATABASE = os.path.join(tmp, f's{num_shards}_default.db')
+    configure_shards(shards)
+    for branch in shards:
+        with use_branch(branch):
+            init_database()
+            insert_book('Bench Book', 'Bench Author', '9780000000000', workers, workers)
+
+    jobs = [(shards, f'branch{i % num_shards}', cycles, i) for i in range(workers)]
+    with Pool(workers) as pool:
+        start = time.perf_counter()
+        writes = sum(pool.map(worker, jobs))
+        elapsed = time.perf_counter() - start
+    return writes / elapsed
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = None
+        for num_shards in (1, 2, 4, 8):
+            if num_shards > workers:
+                break
+            throughput = run(tmp, num_shards, workers, cycles)
+            baseline = baseline or throughput
+            print(f'shards {num_shards}: {throughput:9.0f} writes/s  ({throughput / baseline:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
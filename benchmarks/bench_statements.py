@@ -0,0 +1,81 @@
+"""
+Month-end statements: per-patron status reports versus the parallel batch
+generator.
+
+Creates one open loan for each of num_patrons patrons (a third of them
+overdue) plus a returned loan for every other patron, then times
+get_patron_status_report on a sample and generate_statements with 1, 2, 4...
+workers up to the CPU count.
+
+Usage:
+    python benchmarks/bench_statements.py [num_patrons]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, get_db_connection
+from services.library_service import get_patron_status_report
+from services.statements import generate_statements
+
+NUM_BOOKS = 10000
+SAMPLE = 2000
+
+
+def write_loans(num_patrons: int, rng: random.Random):
+    """Bulk insert books and loans."""
+    now = datetime.now()
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, 5, 5)',
+                     ((f'Book {i}', f'Author {i % 1000}', f'{i:013d}') for i in range(NUM_BOOKS)))
+    rows = []
+    for patron in range(num_patrons):
+        patron_id = f'{patron:06d}'
+        borrowed = now - timedelta(days=rng.randint(0, 40))
+        rows.append((patron_id, rng.randrange(1, NUM_BOOKS + 1), borrowed.isoformat(),
+                     (borrowed + timedelta(days=14)).isoformat(), None))
+        if patron % 2:
+            rows.append((patron_id, rng.randrange(1, NUM_BOOKS + 1), (now - timedelta(days=20)).isoformat(),
+                         (now - timedelta(days=6)).isoformat(), (now - timedelta(days=rng.randint(0, 10))).isoformat()))
+    conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date) VALUES (?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    num_patrons = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        init_database()
+        write_loans(num_patrons, rng)
+
+        sample = [f'{rng.randrange(num_patrons):06d}' for _ in range(SAMPLE)]
+        start = time.perf_counter()
+        for patron_id in sample:
+            get_patron_status_report(patron_id)
+        per_patron = (time.perf_counter() - start) / SAMPLE
+        print(f'status report loop: {per_patron * 1e3:.2f} ms/patron, '
+              f'~{per_patron * num_patrons:.0f} s for {num_patrons} patrons (extrapolated)')
+
+        workers = 1
+        baseline = None
+        while workers <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            result = generate_statements(os.path.join(tmp, f'out{workers}'), workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f'batch, {workers} worker(s): {elapsed:.1f} s for {result["patrons"]} patrons '
+                  f'({baseline / elapsed:.2f}x)')
+            workers *= 2
+
+
+if __name__ == '__main__':
+    main()
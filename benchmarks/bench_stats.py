@@ -0,0 +1,92 @@
+"""
+Circulation reports from daily rollups versus GROUP BY over borrow_records.
+
+Writes a synthetic two-year loan history (loans plus their borrow/return
+events), rolls it up, then times a 30-day top-books report both ways.
+
+Usage:
+    python benchmarks/bench_stats.py [num_loans]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import init_database, get_db_connection, rollup_loan_events
+from services.circulation_stats import circulation_report
+
+NUM_BOOKS = 5000
+RUNS = 20
+
+
+def write_history(num_loans: int, rng: random.Random):
+    """Bulk insert returned loans and their events over the last two years."""
+    today = datetime.combine(date.today(), datetime.min.time())
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, 2, 2)',
+                     ((f'Book {i}', f'Author {i % 500}', f'{i:013d}') for i in range(NUM_BOOKS)))
+    database.backfill_authors(conn)
+    loans, events = [], []
+    for loan_id in range(1, num_loans + 1):
+        borrowed = today - timedelta(days=rng.uniform(20, 730))
+        returned = borrowed + timedelta(days=rng.uniform(1, 20))
+        due = borrowed + timedelta(days=14)
+        patron_id, book_id = f'{rng.randrange(100000):06d}', rng.randrange(1, NUM_BOOKS + 1)
+        loans.append((loan_id, patron_id, book_id, borrowed.isoformat(), due.isoformat(), returned.isoformat()))
+        events.append(('borrowed', patron_id, book_id, loan_id, borrowed.isoformat()))
+        events.append(('returned', patron_id, book_id, loan_id, returned.isoformat()))
+    conn.executemany('INSERT INTO borrow_records (id, patron_id, book_id, borrow_date, due_date, return_date) VALUES (?, ?, ?, ?, ?, ?)', loans)
+    events.sort(key=lambda event: event[4])
+    conn.executemany('INSERT INTO loan_events (event_type, patron_id, book_id, loan_id, occurred_at) VALUES (?, ?, ?, ?, ?)', events)
+    conn.commit()
+    conn.close()
+
+
+def raw_report(since: str):
+    """The same top-books report computed from borrow_records directly."""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT book_id, COUNT(*) AS borrows, SUM(return_date > due_date) AS late_returns
+        FROM borrow_records WHERE borrow_date >= ?
+        GROUP BY book_id ORDER BY borrows DESC LIMIT 20
+    ''', (since,)).fetchall()
+    conn.close()
+    return rows
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        func(*args)
+    return (time.perf_counter() - start) / RUNS * 1000
+
+
+def main():
+    num_loans = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        init_database()
+        write_history(num_loans, rng)
+
+        start = time.perf_counter()
+        processed = rollup_loan_events()
+        elapsed = time.perf_counter() - start
+        print(f'rolled up {processed} events in {elapsed:.1f} s ({processed / elapsed:,.0f} events/s)')
+
+        since = date.today() - timedelta(days=29)
+        print(f'top books, last 30 days: rollups {timed(circulation_report, "books", since):.1f} ms, '
+              f'raw GROUP BY {timed(raw_report, since.isoformat()):.1f} ms')
+        print(f'top books, two years: rollups {timed(circulation_report, "books", since - timedelta(days=700)):.1f} ms, '
+              f'raw GROUP BY {timed(raw_report, (since - timedelta(days=700)).isoformat()):.1f} ms')
+        print(f'daily totals, last 30 days: {timed(circulation_report, "daily", since):.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark for the type-ahead suggest index: build time, lookup latency and memory.
+
+Usage:
+    python benchmarks/bench_suggest.py [num_books]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.suggest_index import SuggestIndex
+
+WORDS = ('river', 'night', 'garden', 'silent', 'winter', 'empire', 'glass', 'stone', 'shadow',
+         'ocean', 'crown', 'forest', 'iron', 'golden', 'last', 'hidden', 'secret', 'storm')
+
+
+def synthetic_books(num_books: int, seed: int = 42):
+    """Yield synthetic books with word-salad titles and a bounded set of authors."""
+    rng = random.Random(seed)
+    for i in range(num_books):
+        title = ' '.join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 5)))
+        yield {'title': f'The {title} {i}', 'author': f'Author {rng.randint(0, num_books // 20)}'}
+
+
+def main():
+    num_books = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    index = SuggestIndex()
+
+    start = time.perf_counter()
+    index.rebuild(synthetic_books(num_books))
+    build = time.perf_counter() - start
+
+    rng = random.Random(7)
+    prefixes = [rng.choice(WORDS)[:rng.randint(1, 4)] for _ in range(10000)] + ['author 1'] * 1000
+    start = time.perf_counter()
+    for prefix in prefixes:
+        index.suggest(prefix, 10)
+    lookup = (time.perf_counter() - start) / len(prefixes)
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.add_book({'title': f'Incremental Title {i}', 'author': f'New Author {i}'})
+    insert = (time.perf_counter() - start) / 1000
+
+    print(f'books: {num_books}, entries: {len(index)}')
+    print(f'build: {build:.2f} s, lookup (k=10): {lookup * 1e6:.1f} us, incremental add: {insert * 1e6:.1f} us')
+    print(f'memory: {index.memory_bytes() / 1024 / 1024:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,23 +4,190 @@ Handles all database operations and connections
 """
 
 import sqlite3 
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 # Database configuration
 DATABASE = 'library.db'
+DEFAULT_BRANCH = 'main'
+
+# Branch -> SQLite file holding that branch's catalog and loans. Empty means
+# a single database; branches not listed here use DATABASE.
+BRANCH_DATABASES: Dict[str, str] = {}
+
+# Branch selected for the current request/thread (set by the router in app.py)
+_current_branch: ContextVar[Optional[str]] = ContextVar('current_branch', default=None)
+
+# Copy statuses; only 'available' copies count towards books.available_copies
+COPY_AVAILABLE = 'available'
+COPY_ON_LOAN = 'on_loan'
+COPY_ON_HOLD = 'on_hold'
+
+# Hold statuses: waiting in the queue, or ready with a copy set aside
+HOLD_WAITING = 'waiting'
+HOLD_READY = 'ready'
+
+# Loan event types appended to loan_events alongside each state change
+EVENT_BORROWED = 'borrowed'
+EVENT_RETURNED = 'returned'
+EVENT_FEE_PAID = 'fee_paid'
+EVENT_HELD = 'held'                  # copy set aside for a ready hold
+EVENT_HOLD_RELEASED = 'hold_released'  # set-aside copy freed by a cancelled hold
+
+# Callbacks notified with the new book's row after a successful insert_book
+_book_insert_listeners = []
+
+def add_book_insert_listener(listener) -> None:
+    """Register a callback called with the book dict after insert_book succeeds."""
+    if listener not in _book_insert_listeners:
+        _book_insert_listeners.append(listener)
+
+def notify_book_inserted(book: Dict) -> None:
+    """Pass a newly inserted book to the insert listeners (for repositories other than SQLite)."""
+    for listener in _book_insert_listeners:
+        listener(book)
+
+# Callbacks notified with {'id', 'total_copies', 'available_copies', 'version'}
+# after a book's copies are checked out, returned or released
+_availability_listeners = []
+
+def add_availability_listener(listener) -> None:
+    """Register a callback called with a book's copy counters after they change."""
+    if listener not in _availability_listeners:
+        _availability_listeners.append(listener)
+
+def _availability(conn, book_id: int) -> Optional[Dict]:
+    """
+    A book's copy counters and the catalog version they belong to, read in
+    the caller's transaction, if anyone is listening.
+    """
+    # Listeners cover the default database only, as for insert_book
+    if not _availability_listeners or not is_default_shard():
+        return None
+    row = conn.execute('''
+        SELECT id, total_copies, available_copies, (SELECT version FROM catalog_version) AS version
+        FROM books WHERE id = ?
+    ''', (book_id,)).fetchone()
+    return dict(row) if row else None
+
+def notify_availability(book: Optional[Dict]) -> None:
+    """Pass committed copy counters (None: nothing changed) to the availability listeners."""
+    if book is not None:
+        for listener in _availability_listeners:
+            listener(book)
+
+def normalize_author_key(name: str) -> str:
+    """Casefolded, whitespace-collapsed author name used as the lookup key."""
+    return ' '.join(name.casefold().split()) if name else ''
+
+def author_name_suffixes(name_key: str) -> List[str]:
+    """The name key from each word on ("f. scott fitzgerald", "scott fitzgerald", "fitzgerald")."""
+    return [name_key[i:] for i in range(len(name_key)) if i == 0 or name_key[i - 1] == ' ']
+
+def configure_shards(branch_databases: Dict[str, str]) -> None:
+    """Set the branch -> database file mapping used for routing."""
+    BRANCH_DATABASES.clear()
+    BRANCH_DATABASES.update(branch_databases)
+
+def get_branches() -> List[str]:
+    """Get the configured branch names (just the default branch when unsharded)."""
+    return list(BRANCH_DATABASES) or [DEFAULT_BRANCH]
+
+def is_known_branch(branch: Optional[str]) -> bool:
+    """True for None (the default database) or a configured branch."""
+    return branch is None or branch in get_branches()
+
+def current_branch() -> Optional[str]:
+    """Get the branch selected for the current context, if any."""
+    return _current_branch.get()
+
+@contextmanager
+def use_branch(branch: Optional[str]):
+    """Route database calls made inside the block to the given branch's shard."""
+    token = _current_branch.set(branch)
+    try:
+        yield
+    finally:
+        _current_branch.reset(token)
+
+def get_shard_path(branch: Optional[str] = None) -> str:
+    """Get the database file for a branch (defaults to the current context's branch)."""
+    branch = branch or _current_branch.get()
+    return BRANCH_DATABASES.get(branch, DATABASE) if branch else DATABASE
+
+def is_default_shard() -> bool:
+    """True when the current context uses the default DATABASE file."""
+    return get_shard_path() == DATABASE
+
+def fan_out(func: Callable, *args, **kwargs) -> List[Tuple[str, object]]:
+    """
+    Call func once per branch, each with that branch's shard selected,
+    in a thread pool. Returns (branch, result) pairs in branch order.
+    """
+    branches = get_branches()
+
+    def run(branch):
+        with use_branch(branch):
+            return func(*args, **kwargs)
+
+    if len(branches) == 1:
+        return [(branches[0], run(branches[0]))]
+    with ThreadPoolExecutor(max_workers=len(branches)) as pool:
+        return list(zip(branches, pool.map(run, branches)))
+
+# Connection class handed out by get_db_connection (services/query_stats.py
+# swaps in one that times every statement)
+_connection_factory = sqlite3.Connection
+
+def set_connection_factory(factory=None) -> None:
+    """Use a sqlite3.Connection subclass for new connections (None: the plain class)."""
+    global _connection_factory
+    _connection_factory = factory or sqlite3.Connection
 
 def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
+    """Get a connection to the current branch's database."""
+    conn = sqlite3.connect(get_shard_path(), factory=_connection_factory)
     conn.row_factory = sqlite3.Row  # This enables column access by name
+    conn.create_function('author_key', 1, normalize_author_key, deterministic=True)
     return conn
 
+# Seeded database that reset_test_additions copies into place instead of
+# rebuilding the tables (set once per test session by tests/conftest.py)
+TEST_TEMPLATE: Optional[str] = None
+
+def copy_database(source: str, dest: Optional[str] = None) -> None:
+    """Overwrite a database (default: the current branch's) with a page-by-page copy of source."""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(dest or get_shard_path())
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
 def reset_test_additions():
     """Function added by Nathan Daneliak to reset the database changes made during unit testing"""
+    if TEST_TEMPLATE:
+        copy_database(TEST_TEMPLATE)
+        return
+
     conn = get_db_connection()
     conn.execute('DROP TABLE IF EXISTS borrow_records')
+    conn.execute('DROP TABLE IF EXISTS borrow_records_archive')
+    conn.execute('DROP TABLE IF EXISTS loan_events')
+    conn.execute('DROP TABLE IF EXISTS loan_snapshots')
+    conn.execute('DROP TABLE IF EXISTS daily_book_stats')
+    conn.execute('DROP TABLE IF EXISTS monthly_book_stats')
+    conn.execute('DROP TABLE IF EXISTS rollup_state')
+    conn.execute('DROP TABLE IF EXISTS holds')
+    conn.execute('DROP TABLE IF EXISTS copies')
     conn.execute('DROP TABLE IF EXISTS books')
+    conn.execute('DROP TABLE IF EXISTS author_name_keys')
+    conn.execute('DROP TABLE IF EXISTS authors')
+    conn.close()
 
     init_database()
     add_sample_data()
@@ -37,10 +204,30 @@ def init_database():
             author TEXT NOT NULL,
             isbn TEXT UNIQUE NOT NULL,
             total_copies INTEGER NOT NULL,
-            available_copies INTEGER NOT NULL
+            available_copies INTEGER NOT NULL,
+            author_id INTEGER REFERENCES authors (id)
         )
     ''')
     
+    # Create authors table keyed by normalized name
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS authors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            name_key TEXT UNIQUE NOT NULL
+        )
+    ''')
+    
+    # Each author's name key from every word on, so a search for a name or any
+    # part of it starting at a word ("lee", "scott fitz") is an index range
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS author_name_keys (
+            name_key TEXT NOT NULL,
+            author_id INTEGER NOT NULL REFERENCES authors (id),
+            PRIMARY KEY (name_key, author_id)
+        ) WITHOUT ROWID
+    ''')
+    
     # Create borrow_records table
     conn.execute('''
         CREATE TABLE IF NOT EXISTS borrow_records (
@@ -50,13 +237,329 @@ def init_database():
             borrow_date TEXT NOT NULL,
             due_date TEXT NOT NULL,
             return_date TEXT,
+            copy_id INTEGER REFERENCES copies (id),
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_borrow_records_patron ON borrow_records (patron_id, borrow_date)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_returned ON borrow_records (return_date)
+        WHERE return_date IS NOT NULL
+    ''')
+    
+    # Create cold store for returned loans moved out of borrow_records by the archiver
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS borrow_records_archive (
+            id INTEGER PRIMARY KEY,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT NOT NULL,
+            copy_id INTEGER,
+            archived_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_archive_patron
+        ON borrow_records_archive (patron_id, borrow_date)
+    ''')
+    
+    # Create copies table (one row per physical copy)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS copies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            barcode TEXT UNIQUE NOT NULL,
+            book_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'available',
+            branch TEXT NOT NULL DEFAULT 'main',
             FOREIGN KEY (book_id) REFERENCES books (id)
         )
     ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_copies_book_status ON copies (book_id, status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_copies_status ON copies (status, branch)')
+    
+    # books.total_copies/available_copies are aggregates of copies kept current by triggers
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS copies_after_insert AFTER INSERT ON copies
+        BEGIN
+            UPDATE books SET total_copies = total_copies + 1,
+                             available_copies = available_copies + (NEW.status = 'available')
+            WHERE id = NEW.book_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS copies_after_update AFTER UPDATE OF status ON copies
+        WHEN OLD.status != NEW.status
+        BEGIN
+            UPDATE books SET available_copies = available_copies
+                                                + (NEW.status = 'available') - (OLD.status = 'available')
+            WHERE id = NEW.book_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS copies_after_delete AFTER DELETE ON copies
+        BEGIN
+            UPDATE books SET total_copies = total_copies - 1,
+                             available_copies = available_copies - (OLD.status = 'available')
+            WHERE id = OLD.book_id;
+        END
+    ''')
+    
+    # Counter bumped by every change to the books or their copy counters, so
+    # caches such as the availability snapshot can tell when they are stale
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_version_insert AFTER INSERT ON books
+        BEGIN
+            UPDATE catalog_version SET version = version + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_version_update AFTER UPDATE OF total_copies, available_copies ON books
+        WHEN OLD.total_copies != NEW.total_copies OR OLD.available_copies != NEW.available_copies
+        BEGIN
+            UPDATE catalog_version SET version = version + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_version_delete AFTER DELETE ON books
+        BEGIN
+            UPDATE catalog_version SET version = version + 1;
+        END
+    ''')
+    
+    # Create holds table; waiting holds form a FIFO queue per book
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'waiting',
+            copy_id INTEGER REFERENCES copies (id),
+            ready_at TEXT,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_holds_queue ON holds (book_id, created_at)
+        WHERE status = 'waiting'
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_holds_patron ON holds (patron_id, book_id)')
+    
+    # Create append-only loan event log and its snapshots
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS loan_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            loan_id INTEGER,
+            copy_id INTEGER,
+            amount REAL,
+            occurred_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS loan_events_no_update BEFORE UPDATE ON loan_events
+        BEGIN
+            SELECT RAISE(ABORT, 'loan_events is append-only');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS loan_events_no_delete BEFORE DELETE ON loan_events
+        BEGIN
+            SELECT RAISE(ABORT, 'loan_events is append-only');
+        END
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS loan_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            last_event_id INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            state BLOB NOT NULL
+        )
+    ''')
+    
+    # Create daily and monthly circulation rollups, fed incrementally from loan_events
+    for table, period in (('daily_book_stats', 'day'), ('monthly_book_stats', 'month')):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {period} TEXT NOT NULL,
+                book_id INTEGER NOT NULL,
+                borrows INTEGER NOT NULL DEFAULT 0,
+                returns INTEGER NOT NULL DEFAULT 0,
+                late_returns INTEGER NOT NULL DEFAULT 0,
+                loan_days REAL NOT NULL DEFAULT 0,
+                fees_paid REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY ({period}, book_id)
+            ) WITHOUT ROWID
+        ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name TEXT PRIMARY KEY,
+            last_event_id INTEGER NOT NULL
+        )
+    ''')
+    
+    migrate_authors(conn)
+    migrate_copies(conn)
+    backfill_loan_events(conn)
     
     conn.commit()
     conn.close()
 
+def migrate_authors(conn) -> None:
+    """Add books.author_id to databases created before the authors table and backfill it."""
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(books)')]
+    if 'author_id' not in columns:
+        conn.execute('ALTER TABLE books ADD COLUMN author_id INTEGER REFERENCES authors (id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_author_id ON books (author_id)')
+    backfill_authors(conn)
+
+def backfill_authors(conn) -> None:
+    """Create author rows for books without an author_id and link them (set-based)."""
+    conn.execute('''
+        INSERT OR IGNORE INTO authors (name, name_key)
+        SELECT MIN(author), author_key(author) FROM books
+        WHERE author_id IS NULL
+        GROUP BY author_key(author)
+    ''')
+    conn.execute('''
+        UPDATE books SET author_id = (
+            SELECT id FROM authors WHERE name_key = author_key(books.author)
+        ) WHERE author_id IS NULL
+    ''')
+    index_author_names(conn)
+
+def index_author_names(conn, name_key: Optional[str] = None) -> None:
+    """Add the search keys of one author (by name key) or of every author without them."""
+    if name_key is None:
+        authors = conn.execute('''
+            SELECT id, name_key FROM authors
+            WHERE id NOT IN (SELECT author_id FROM author_name_keys)
+        ''').fetchall()
+    else:
+        authors = conn.execute('SELECT id, name_key FROM authors WHERE name_key = ?', (name_key,)).fetchall()
+    conn.executemany('INSERT OR IGNORE INTO author_name_keys (name_key, author_id) VALUES (?, ?)',
+                     [(suffix, author['id']) for author in authors for suffix in author_name_suffixes(author['name_key'])])
+
+def migrate_copies(conn) -> None:
+    """Add borrow_records.copy_id to older databases and create copy rows for books without any."""
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(borrow_records)')]
+    if 'copy_id' not in columns:
+        conn.execute('ALTER TABLE borrow_records ADD COLUMN copy_id INTEGER REFERENCES copies (id)')
+    backfill_copies(conn)
+
+def backfill_copies(conn) -> None:
+    """
+    Create copies for books that have none, matching their current counters
+    (total - available copies are created on loan), then attach open loans
+    without a copy to those on-loan copies.
+    """
+    missing = [row['id'] for row in conn.execute('''
+        SELECT id FROM books
+        WHERE total_copies > 0 AND NOT EXISTS (SELECT 1 FROM copies WHERE copies.book_id = books.id)
+    ''')]
+    if not missing:
+        return
+
+    conn.execute('''
+        WITH RECURSIVE seq (book_id, n, total, available) AS (
+            SELECT id, 1, total_copies, available_copies FROM books
+            WHERE total_copies > 0 AND NOT EXISTS (SELECT 1 FROM copies WHERE copies.book_id = books.id)
+            UNION ALL
+            SELECT book_id, n + 1, total, available FROM seq WHERE n < total
+        )
+        INSERT INTO copies (barcode, book_id, status, branch)
+        SELECT printf('BK%06d-%03d', book_id, n), book_id,
+               CASE WHEN n <= available THEN 'available' ELSE 'on_loan' END, ?
+        FROM seq
+    ''', (current_branch() or DEFAULT_BRANCH,))
+
+    # The insert trigger added the new copies on top of the existing counters
+    refresh_book_counts(conn, missing)
+
+    loans = conn.execute('''
+        SELECT id, book_id FROM borrow_records
+        WHERE return_date IS NULL AND copy_id IS NULL
+        ORDER BY id
+    ''').fetchall()
+    for loan in loans:
+        conn.execute('''
+            UPDATE borrow_records SET copy_id = (
+                SELECT c.id FROM copies c
+                WHERE c.book_id = ? AND c.status = 'on_loan'
+                  AND NOT EXISTS (SELECT 1 FROM borrow_records r WHERE r.copy_id = c.id AND r.return_date IS NULL)
+                ORDER BY c.id LIMIT 1
+            ) WHERE id = ?
+        ''', (loan['book_id'], loan['id']))
+
+def backfill_loan_events(conn) -> None:
+    """Seed an empty event log with the loans and holds that are already open."""
+    if conn.execute('SELECT 1 FROM loan_events LIMIT 1').fetchone():
+        return
+    conn.execute('''
+        INSERT INTO loan_events (event_type, patron_id, book_id, loan_id, copy_id, occurred_at)
+        SELECT ?, patron_id, book_id, id, copy_id, borrow_date FROM borrow_records
+        WHERE return_date IS NULL ORDER BY id
+    ''', (EVENT_BORROWED,))
+    conn.execute('''
+        INSERT INTO loan_events (event_type, patron_id, book_id, copy_id, occurred_at)
+        SELECT ?, patron_id, book_id, copy_id, ready_at FROM holds
+        WHERE status = 'ready' ORDER BY ready_at
+    ''', (EVENT_HELD,))
+
+def refresh_book_counts(conn, book_ids: Optional[List[int]] = None) -> None:
+    """Recompute books.total_copies/available_copies from copy rows."""
+    sql = '''
+        UPDATE books SET
+            total_copies = (SELECT COUNT(*) FROM copies WHERE copies.book_id = books.id),
+            available_copies = (SELECT COUNT(*) FROM copies WHERE copies.book_id = books.id AND status = 'available')
+    '''
+    if book_ids is None:
+        conn.execute(sql)
+    else:
+        conn.executemany(sql + ' WHERE id = ?', [(book_id,) for book_id in book_ids])
+
+def check_inventory_drift(repair: bool = False) -> List[Dict]:
+    """
+    Compare each book's counters with its copy rows.
+    
+    Args:
+        repair: Recompute the counters of drifted books from their copies
+        
+    Returns:
+        List[Dict]: One entry per book whose counters disagree with its copies
+    """
+    conn = get_db_connection()
+    drifted = conn.execute('''
+        SELECT b.id AS book_id, b.title,
+               b.total_copies, b.available_copies,
+               COUNT(c.id) AS copy_total,
+               COALESCE(SUM(c.status = 'available'), 0) AS copy_available
+        FROM books b
+        LEFT JOIN copies c ON c.book_id = b.id
+        GROUP BY b.id
+        HAVING b.total_copies != copy_total OR b.available_copies != copy_available
+        ORDER BY b.id
+    ''').fetchall()
+    drifted = [dict(row) for row in drifted]
+
+    if repair and drifted:
+        refresh_book_counts(conn, [row['book_id'] for row in drifted])
+        conn.commit()
+    conn.close()
+    return drifted
+
 def add_sample_data():
     """Add sample data to the database if it's empty."""
     conn = get_db_connection()
@@ -87,6 +590,10 @@ def add_sample_data():
         # Update available copies for 1984
         conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
         
+        backfill_authors(conn)
+        backfill_copies(conn)
+        backfill_loan_events(conn)
+        
         conn.commit()
     
     conn.close()
@@ -114,6 +621,61 @@ def get_book_by_isbn(isbn: str) -> Optional[Dict]:
     conn.close()
     return dict(book) if book else None
 
+def get_books_by_ids(book_ids: List[int]) -> List[Dict]:
+    """Get books by ID, preserving the order of the given IDs."""
+    if not book_ids:
+        return []
+    conn = get_db_connection()
+    placeholders = ','.join('?' * len(book_ids))
+    books = conn.execute(f'SELECT * FROM books WHERE id IN ({placeholders})', list(book_ids)).fetchall()
+    conn.close()
+    by_id = {book['id']: dict(book) for book in books}
+    return [by_id[book_id] for book_id in book_ids if book_id in by_id]
+
+def search_books_by_author(search_term: str) -> List[Dict]:
+    """Get books whose author's normalized name has a word starting with the search term."""
+    key = normalize_author_key(search_term)
+    conn = get_db_connection()
+    books = conn.execute('''
+        SELECT * FROM books
+        WHERE author_id IN (SELECT author_id FROM author_name_keys WHERE name_key >= ? AND name_key < ?)
+        ORDER BY title
+    ''', (key, key + '\uffff')).fetchall()
+    conn.close()
+    return [dict(book) for book in books]
+
+def get_authors(prefix: str = '', limit: int = 50, offset: int = 0) -> List[Dict]:
+    """Get authors (optionally by name prefix) with their book and copy counts."""
+    key = normalize_author_key(prefix)
+    conn = get_db_connection()
+    authors = conn.execute('''
+        SELECT a.id, a.name, COUNT(b.id) AS book_count,
+               COALESCE(SUM(b.total_copies), 0) AS total_copies,
+               COALESCE(SUM(b.available_copies), 0) AS available_copies
+        FROM authors a
+        LEFT JOIN books b ON b.author_id = a.id
+        WHERE a.name_key >= ? AND a.name_key < ?
+        GROUP BY a.id
+        ORDER BY a.name_key
+        LIMIT ? OFFSET ?
+    ''', (key, key + '\uffff', limit, offset)).fetchall()
+    conn.close()
+    return [dict(author) for author in authors]
+
+def get_author_by_id(author_id: int) -> Optional[Dict]:
+    """Get an author and their books."""
+    conn = get_db_connection()
+    author = conn.execute('SELECT id, name FROM authors WHERE id = ?', (author_id,)).fetchone()
+    if not author:
+        conn.close()
+        return None
+    books = conn.execute('SELECT * FROM books WHERE author_id = ? ORDER BY title', (author_id,)).fetchall()
+    conn.close()
+    result = dict(author)
+    result['books'] = [dict(book) for book in books]
+    result['book_count'] = len(books)
+    return result
+
 def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     """Get currently borrowed books for a patron."""
     conn = get_db_connection()
@@ -139,32 +701,128 @@ def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     
     return borrowed_books
 
-def get_patron_borrow_history(patron_id: str) -> List[Dict]:
-    """Get borrowing history for a patron."""
+def _history_rows(conn: sqlite3.Connection, patron_id: str, after: Optional[Tuple[str, int]] = None,
+                  since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  limit: Optional[int] = None, offset: int = 0) -> List[sqlite3.Row]:
+    """Returned loans of a patron from the live and archive tables, oldest first."""
+    conditions = ['patron_id = ?', 'return_date IS NOT NULL']
+    params = [patron_id]
+    if after is not None:
+        conditions.append('(borrow_date > ? OR (borrow_date = ? AND id > ?))')
+        params += [after[0], after[0], after[1]]
+    if since is not None:
+        conditions.append('borrow_date >= ?')
+        params.append(since.isoformat())
+    if until is not None:
+        conditions.append('borrow_date < ?')
+        params.append(until.isoformat())
+    where = ' AND '.join(conditions)
+
+    return conn.execute(f'''
+        SELECT br.id, br.book_id, br.borrow_date, br.due_date, br.return_date, b.title, b.author
+        FROM (
+            SELECT id, book_id, borrow_date, due_date, return_date FROM borrow_records WHERE {where}
+            UNION ALL
+            SELECT id, book_id, borrow_date, due_date, return_date FROM borrow_records_archive WHERE {where}
+        ) br
+        JOIN books b ON br.book_id = b.id
+        ORDER BY br.borrow_date, br.id
+        LIMIT ? OFFSET ?
+    ''', params + params + [-1 if limit is None else limit, offset]).fetchall()
+
+def _history_record(record: sqlite3.Row, now: datetime) -> Dict:
+    """Convert a history row to the dict used by the status report."""
+    due_date = datetime.fromisoformat(record['due_date'])
+    return {
+        'loan_id': record['id'],
+        'book_id': record['book_id'],
+        'title': record['title'],
+        'author': record['author'],
+        'borrow_date': datetime.fromisoformat(record['borrow_date']),
+        'due_date': due_date,
+        'is_overdue': now > due_date,
+        'return_date': datetime.fromisoformat(record["return_date"]),
+    }
+
+def get_patron_borrow_history(patron_id: str, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+    """
+    Get returned loans for a patron, oldest first, from both the live
+    borrow_records table and the archive.
+    """
     conn = get_db_connection()
-    records = conn.execute('''
-        SELECT br.*, b.title, b.author 
-        FROM borrow_records br 
-        JOIN books b ON br.book_id = b.id 
-        WHERE br.patron_id = ?
-        ORDER BY br.borrow_date
-    ''', (patron_id,)).fetchall()
+    records = _history_rows(conn, patron_id, limit=limit, offset=offset)
     conn.close()
 
-    history = []
-    for record in records:
-        if record["return_date"]:
-            history.append({
-                'book_id': record['book_id'],
-                'title': record['title'],
-                'author': record['author'],
-                'borrow_date': datetime.fromisoformat(record['borrow_date']),
-                'due_date': datetime.fromisoformat(record['due_date']),
-                'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date']),
-                'return_date': datetime.fromisoformat(record["return_date"]),
-            })
-    
-    return history
+    now = datetime.now()
+    return [_history_record(record, now) for record in records]
+
+def iter_patron_borrow_history(patron_id: str, after: Optional[Tuple[str, int]] = None,
+                               since: Optional[datetime] = None, until: Optional[datetime] = None,
+                               page_size: int = 100) -> Iterator[Dict]:
+    """
+    Lazily yield a patron's returned loans, oldest first.
+    
+    Rows are fetched page_size at a time using the (borrow_date, loan_id) of
+    the last row as the keyset, so no page is read until it is needed and
+    deep pages cost the same as the first.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        after: (borrow_date, loan_id) to resume after, as from a previous record
+        since: Only loans borrowed at or after this time
+        until: Only loans borrowed before this time
+        page_size: Rows fetched per query
+    """
+    now = datetime.now()
+    while True:
+        conn = get_db_connection()
+        records = _history_rows(conn, patron_id, after, since, until, page_size)
+        conn.close()
+
+        for record in records:
+            yield _history_record(record, now)
+        if len(records) < page_size:
+            return
+        after = (records[-1]['borrow_date'], records[-1]['id'])
+
+def archive_returned_loans(older_than_days: int = 365, batch_size: int = 1000,
+                           now: Optional[datetime] = None) -> int:
+    """
+    Move loans returned more than older_than_days ago from borrow_records to
+    borrow_records_archive, one short transaction per batch so borrowing is
+    never blocked for long.
+    
+    Returns:
+        Number of loans archived
+    """
+    now = now or datetime.now()
+    cutoff = (now - timedelta(days=older_than_days)).isoformat()
+    archived = 0
+    conn = get_db_connection()
+    try:
+        while True:
+            conn.execute('BEGIN IMMEDIATE')
+            ids = [row['id'] for row in conn.execute('''
+                SELECT id FROM borrow_records
+                WHERE return_date IS NOT NULL AND return_date < ?
+                ORDER BY return_date LIMIT ?
+            ''', (cutoff, batch_size))]
+            if not ids:
+                conn.rollback()
+                break
+            placeholders = ','.join('?' * len(ids))
+            conn.execute(f'''
+                INSERT INTO borrow_records_archive
+                    (id, patron_id, book_id, borrow_date, due_date, return_date, copy_id, archived_at)
+                SELECT id, patron_id, book_id, borrow_date, due_date, return_date, copy_id, ?
+                FROM borrow_records WHERE id IN ({placeholders})
+            ''', [now.isoformat()] + ids)
+            conn.execute(f'DELETE FROM borrow_records WHERE id IN ({placeholders})', ids)
+            conn.commit()
+            archived += len(ids)
+    finally:
+        conn.close()
+    return archived
 
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
@@ -176,14 +834,271 @@ def get_patron_borrow_count(patron_id: str) -> int:
     conn.close()
     return count
 
-def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
-    """Insert a new book into the database."""
+def get_readonly_connection(path: Optional[str] = None) -> sqlite3.Connection:
+    """Open a read-only connection (for batch jobs that must not write)."""
+    conn = sqlite3.connect(f'file:{path or get_shard_path()}?mode=ro', uri=True, factory=_connection_factory)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def get_patron_range_activity(conn: sqlite3.Connection, first_patron: str, last_patron: str,
+                              returned_since: datetime) -> Dict[str, List[sqlite3.Row]]:
+    """
+    Open loans, holds and loans returned since a date for every patron with
+    first_patron <= patron_id <= last_patron, each in one query ordered by
+    patron.
+    """
+    bounds = (first_patron, last_patron)
+    open_loans = conn.execute('''
+        SELECT br.patron_id, br.book_id, b.title, b.author, br.borrow_date, br.due_date
+        FROM borrow_records br JOIN books b ON br.book_id = b.id
+        WHERE br.patron_id BETWEEN ? AND ? AND br.return_date IS NULL
+        ORDER BY br.patron_id, br.borrow_date
+    ''', bounds).fetchall()
+    holds = conn.execute('''
+        SELECT h.patron_id, h.book_id, b.title, b.author, h.status
+        FROM holds h JOIN books b ON h.book_id = b.id
+        WHERE h.patron_id BETWEEN ? AND ?
+        ORDER BY h.patron_id, h.created_at
+    ''', bounds).fetchall()
+    returned = conn.execute('''
+        SELECT br.patron_id, br.book_id, b.title, b.author, br.borrow_date, br.return_date
+        FROM (
+            SELECT patron_id, book_id, borrow_date, return_date FROM borrow_records
+            WHERE patron_id BETWEEN ? AND ? AND return_date >= ?
+            UNION ALL
+            SELECT patron_id, book_id, borrow_date, return_date FROM borrow_records_archive
+            WHERE patron_id BETWEEN ? AND ? AND return_date >= ?
+        ) br JOIN books b ON br.book_id = b.id
+        ORDER BY br.patron_id, br.return_date
+    ''', bounds + (returned_since.isoformat(),) + bounds + (returned_since.isoformat(),)).fetchall()
+    return {'open_loans': open_loans, 'holds': holds, 'returned': returned}
+
+def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int,
+                branch: Optional[str] = None) -> bool:
+    """Insert a new book and its copies into the database (copies belong to the current branch by default)."""
+    branch = branch or current_branch() or DEFAULT_BRANCH
+    conn = get_db_connection()
+    try:
+        if conn.execute('''
+            INSERT OR IGNORE INTO authors (name, name_key) VALUES (?, author_key(?))
+        ''', (author, author)).rowcount:
+            index_author_names(conn, normalize_author_key(author))
+        # Counters start at 0; the copies trigger brings them up to date
+        cursor = conn.execute('''
+            INSERT INTO books (title, author, isbn, total_copies, available_copies, author_id)
+            VALUES (?, ?, ?, 0, 0, (SELECT id FROM authors WHERE name_key = author_key(?)))
+        ''', (title, author, isbn, author))
+        book_id = cursor.lastrowid
+        conn.executemany('''
+            INSERT INTO copies (barcode, book_id, status, branch) VALUES (?, ?, ?, ?)
+        ''', [(f'BK{book_id:06d}-{n:03d}', book_id, COPY_AVAILABLE if n <= available_copies else COPY_ON_LOAN, branch)
+              for n in range(1, total_copies + 1)])
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        conn.close()
+        return False
+
+    # Listeners (in-memory indexes) cover the default database only, since
+    # book IDs are only unique within a shard
+    if is_default_shard():
+        notify_book_inserted({'id': book_id, 'title': title, 'author': author, 'isbn': isbn,
+                              'total_copies': total_copies, 'available_copies': available_copies})
+    return True
+
+def _append_loan_event(conn, event_type: str, patron_id: str, book_id: int, occurred_at: datetime,
+                       loan_id: Optional[int] = None, copy_id: Optional[int] = None,
+                       amount: Optional[float] = None) -> None:
+    """Append a loan event in the caller's transaction."""
+    conn.execute('''
+        INSERT INTO loan_events (event_type, patron_id, book_id, loan_id, copy_id, amount, occurred_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (event_type, patron_id, book_id, loan_id, copy_id, amount, occurred_at.isoformat()))
+
+def insert_loan_event(event_type: str, patron_id: str, book_id: int, amount: Optional[float] = None) -> bool:
+    """Record a standalone loan event (e.g. a late fee payment)."""
+    conn = get_db_connection()
+    try:
+        _append_loan_event(conn, event_type, patron_id, book_id, datetime.now(), amount=amount)
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def rollup_loan_events(batch_size: int = 100000) -> int:
+    """
+    Fold loan events newer than the rollup high-water mark into
+    daily_book_stats and monthly_book_stats. Each batch and its new mark
+    commit together, so every event is counted exactly once. Returns the
+    number of events processed.
+
+    Late returns compare the return with the loan's due date; loan days are
+    credited to the day of the return.
+    """
+    processed = 0
+    conn = get_db_connection()
+    try:
+        while True:
+            conn.execute('BEGIN IMMEDIATE')
+            mark = conn.execute("SELECT last_event_id FROM rollup_state WHERE name = 'book_stats'").fetchone()
+            start = mark['last_event_id'] if mark else 0
+            batch = conn.execute('''
+                SELECT COUNT(*), MAX(id) FROM (SELECT id FROM loan_events WHERE id > ? ORDER BY id LIMIT ?)
+            ''', (start, batch_size)).fetchone()
+            if not batch[0]:
+                conn.rollback()
+                break
+            end = batch[1]
+
+            for table, period, length in (('daily_book_stats', 'day', 10), ('monthly_book_stats', 'month', 7)):
+                conn.execute(f'''
+                    INSERT INTO {table} ({period}, book_id, borrows, returns, late_returns, loan_days, fees_paid)
+                    SELECT substr(e.occurred_at, 1, {length}), e.book_id,
+                           SUM(e.event_type = ?),
+                           SUM(e.event_type = ?),
+                           SUM(e.event_type = ? AND e.occurred_at > COALESCE(l.due_date, a.due_date)),
+                           SUM(CASE WHEN e.event_type = ?
+                               THEN julianday(e.occurred_at) - julianday(COALESCE(l.borrow_date, a.borrow_date))
+                               ELSE 0 END),
+                           SUM(CASE WHEN e.event_type = ? THEN e.amount ELSE 0 END)
+                    FROM loan_events e
+                    LEFT JOIN borrow_records l ON l.id = e.loan_id
+                    LEFT JOIN borrow_records_archive a ON a.id = e.loan_id
+                    WHERE e.id > ? AND e.id <= ? AND e.event_type IN (?, ?, ?)
+                    GROUP BY 1, 2
+                    ON CONFLICT ({period}, book_id) DO UPDATE SET
+                        borrows = borrows + excluded.borrows,
+                        returns = returns + excluded.returns,
+                        late_returns = late_returns + excluded.late_returns,
+                        loan_days = loan_days + excluded.loan_days,
+                        fees_paid = fees_paid + excluded.fees_paid
+                ''', (EVENT_BORROWED, EVENT_RETURNED, EVENT_RETURNED, EVENT_RETURNED, EVENT_FEE_PAID,
+                      start, end, EVENT_BORROWED, EVENT_RETURNED, EVENT_FEE_PAID))
+            conn.execute('''
+                INSERT INTO rollup_state (name, last_event_id) VALUES ('book_stats', ?)
+                ON CONFLICT (name) DO UPDATE SET last_event_id = excluded.last_event_id
+            ''', (end,))
+            conn.commit()
+            processed += batch[0]
+    finally:
+        conn.close()
+    return processed
+
+def pending_loan_events() -> int:
+    """Number of loan events not yet folded into the rollups (read-only)."""
+    conn = get_db_connection()
+    mark = conn.execute("SELECT last_event_id FROM rollup_state WHERE name = 'book_stats'").fetchone()
+    pending = conn.execute('SELECT COUNT(*) FROM loan_events WHERE id > ?',
+                           (mark['last_event_id'] if mark else 0,)).fetchone()[0]
+    conn.close()
+    return pending
+
+# Totals summed from the rollups, and the sort orders allowed on them
+_STATS_COLUMNS = '''
+    SUM(borrows) AS borrows, SUM(returns) AS returns, SUM(late_returns) AS late_returns,
+    SUM(loan_days) AS loan_days, SUM(fees_paid) AS fees_paid
+'''
+STATS_ORDERS = {
+    'borrows': 'borrows DESC',
+    'late_returns': 'late_returns DESC',
+    'overdue_rate': 'CAST(late_returns AS REAL) / MAX(returns, 1) DESC',
+    'utilisation': 'loan_days / MAX(copies, 1) DESC',
+}
+
+def _book_stats_source(since: date, until: date) -> Tuple[str, List[str]]:
+    """
+    Per-book rollup rows covering since..until inclusive: whole months from
+    monthly_book_stats and the partial months at either end from
+    daily_book_stats.
+    """
+    columns = 'book_id, borrows, returns, late_returns, loan_days, fees_paid'
+    first_month = since if since.day == 1 else (since.replace(day=1) + timedelta(days=32)).replace(day=1)
+    next_month = (until.replace(day=1) + timedelta(days=32)).replace(day=1)
+    end_month = next_month if until == next_month - timedelta(days=1) else until.replace(day=1)
+    if first_month >= end_month:
+        return f'SELECT {columns} FROM daily_book_stats WHERE day >= ? AND day <= ?', [since.isoformat(), until.isoformat()]
+
+    parts = [f'SELECT {columns} FROM monthly_book_stats WHERE month >= ? AND month < ?']
+    params = [first_month.isoformat()[:7], end_month.isoformat()[:7]]
+    if since < first_month:
+        parts.append(f'SELECT {columns} FROM daily_book_stats WHERE day >= ? AND day < ?')
+        params += [since.isoformat(), first_month.isoformat()]
+    if end_month <= until:
+        parts.append(f'SELECT {columns} FROM daily_book_stats WHERE day >= ? AND day <= ?')
+        params += [end_month.isoformat(), until.isoformat()]
+    return ' UNION ALL '.join(parts), params
+
+def get_book_stats(since: date, until: date, order: str = 'borrows', limit: int = 20) -> List[Dict]:
+    """Circulation totals per book over an inclusive day range, from the rollups."""
+    source, params = _book_stats_source(since, until)
+    conn = get_db_connection()
+    rows = conn.execute(f'''
+        SELECT s.*, b.title, b.author, b.total_copies AS copies
+        FROM (SELECT book_id, {_STATS_COLUMNS} FROM ({source}) GROUP BY book_id) s
+        JOIN books b ON b.id = s.book_id
+        ORDER BY {STATS_ORDERS[order]}, s.book_id
+        LIMIT ?
+    ''', params + [limit]).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def get_author_stats(since: date, until: date, order: str = 'borrows', limit: int = 20) -> List[Dict]:
+    """Circulation totals per author over an inclusive day range, from the rollups."""
+    source, params = _book_stats_source(since, until)
+    conn = get_db_connection()
+    rows = conn.execute(f'''
+        SELECT a.id AS author_id, a.name, c.copies, {_STATS_COLUMNS}
+        FROM (SELECT book_id, {_STATS_COLUMNS} FROM ({source}) GROUP BY book_id) s
+        JOIN books b ON b.id = s.book_id
+        JOIN authors a ON a.id = b.author_id
+        JOIN (SELECT author_id, SUM(total_copies) AS copies FROM books GROUP BY author_id) c ON c.author_id = a.id
+        GROUP BY a.id
+        ORDER BY {STATS_ORDERS[order]}, a.id
+        LIMIT ?
+    ''', params + [limit]).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def get_daily_stats(since: date, until: date) -> List[Dict]:
+    """Library-wide circulation totals per day over an inclusive range, from the rollups."""
+    conn = get_db_connection()
+    rows = conn.execute(f'''
+        SELECT day, {_STATS_COLUMNS}
+        FROM daily_book_stats
+        WHERE day >= ? AND day <= ?
+        GROUP BY day
+        ORDER BY day
+    ''', (since.isoformat(), until.isoformat())).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def iter_loan_events(after_id: int = 0, batch_size: int = 50000):
+    """Stream loan events after the given ID in order as plain tuples
+    (id, event_type, patron_id, book_id, loan_id, copy_id, amount, occurred_at)."""
+    conn = get_db_connection()
+    conn.row_factory = None
+    try:
+        cursor = conn.execute('''
+            SELECT id, event_type, patron_id, book_id, loan_id, copy_id, amount, occurred_at
+            FROM loan_events WHERE id > ? ORDER BY id
+        ''', (after_id,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def insert_loan_snapshot(last_event_id: int, state: bytes) -> bool:
+    """Store a compact snapshot of loan state as of an event ID."""
     conn = get_db_connection()
     try:
         conn.execute('''
-            INSERT INTO books (title, author, isbn, total_copies, available_copies)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (title, author, isbn, total_copies, available_copies))
+            INSERT INTO loan_snapshots (last_event_id, created_at, state) VALUES (?, ?, ?)
+        ''', (last_event_id, datetime.now().isoformat(), state))
         conn.commit()
         conn.close()
         return True
@@ -191,14 +1106,108 @@ def insert_book(title: str, author: str, isbn: str, total_copies: int, available
         conn.close()
         return False
 
+def get_latest_loan_snapshot() -> Optional[Dict]:
+    """Get the most recent loan snapshot, if any."""
+    conn = get_db_connection()
+    snapshot = conn.execute('''
+        SELECT id, last_event_id, created_at, state FROM loan_snapshots
+        ORDER BY last_event_id DESC LIMIT 1
+    ''').fetchone()
+    conn.close()
+    return dict(snapshot) if snapshot else None
+
+def get_catalog_version() -> int:
+    """Current value of the counter bumped by every book or copy counter change."""
+    conn = get_db_connection()
+    row = conn.execute('SELECT version FROM catalog_version').fetchone()
+    conn.close()
+    return row['version'] if row else 0
+
+def get_versioned_book_counts() -> Tuple[int, Dict[int, Tuple[int, int]]]:
+    """The catalog version and (total_copies, available_copies) for every book, read together."""
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN')
+        version = conn.execute('SELECT version FROM catalog_version').fetchone()['version']
+        rows = conn.execute('SELECT id, total_copies, available_copies FROM books').fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+    return version, {row['id']: (row['total_copies'], row['available_copies']) for row in rows}
+
+def get_book_counts() -> Dict[int, Tuple[int, int]]:
+    """Get (total_copies, available_copies) for every book."""
+    conn = get_db_connection()
+    rows = conn.execute('SELECT id, total_copies, available_copies FROM books').fetchall()
+    conn.close()
+    return {row['id']: (row['total_copies'], row['available_copies']) for row in rows}
+
+def get_open_loan_ids() -> List[int]:
+    """Get the IDs of all borrow records that have not been returned."""
+    conn = get_db_connection()
+    rows = conn.execute('SELECT id FROM borrow_records WHERE return_date IS NULL ORDER BY id').fetchall()
+    conn.close()
+    return [row['id'] for row in rows]
+
+def set_book_available_copies(available: Dict[int, int]) -> bool:
+    """Overwrite books.available_copies with the given values."""
+    conn = get_db_connection()
+    try:
+        conn.executemany('UPDATE books SET available_copies = ? WHERE id = ?',
+                         [(count, book_id) for book_id, count in available.items()])
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def set_copy_statuses(on_loan: Iterable[int], on_hold: Iterable[int]) -> List[int]:
+    """
+    Make the given copies on loan or on hold and every other lent or held copy
+    available (e.g. from a replayed event log). The copy triggers move the
+    book counters; books whose counters had drifted from their copies are
+    recounted. Returns the IDs of books whose available_copies changed.
+    """
+    wanted = {copy_id: COPY_ON_HOLD for copy_id in on_hold}
+    wanted.update((copy_id, COPY_ON_LOAN) for copy_id in on_loan)
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        before = {row['id']: row['available_copies']
+                  for row in conn.execute('SELECT id, available_copies FROM books')}
+        copies = conn.execute('SELECT id, status FROM copies WHERE status IN (?, ?)',
+                              (COPY_ON_LOAN, COPY_ON_HOLD)).fetchall()
+        current = {row['id']: row['status'] for row in copies}
+        for start in range(0, len(wanted), 500):
+            ids = list(wanted)[start:start + 500]
+            rows = conn.execute(f"SELECT id, status FROM copies WHERE id IN ({','.join('?' * len(ids))})", ids)
+            current.update((row['id'], row['status']) for row in rows)
+        changes = [(wanted.get(copy_id, COPY_AVAILABLE), copy_id) for copy_id, status in current.items()
+                   if wanted.get(copy_id, COPY_AVAILABLE) != status]
+        conn.executemany('UPDATE copies SET status = ? WHERE id = ?', changes)
+
+        drifted = conn.execute('''
+            SELECT b.id FROM books b LEFT JOIN copies c ON c.book_id = b.id
+            GROUP BY b.id
+            HAVING b.total_copies != COUNT(c.id) OR b.available_copies != COALESCE(SUM(c.status = 'available'), 0)
+        ''').fetchall()
+        refresh_book_counts(conn, [row['id'] for row in drifted])
+        after = conn.execute('SELECT id, available_copies FROM books').fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+    return [row['id'] for row in after if before.get(row['id']) != row['available_copies']]
+
 def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
     """Insert a new borrow record into the database."""
     conn = get_db_connection()
     try:
-        conn.execute('''
+        cursor = conn.execute('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
         ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+        _append_loan_event(conn, EVENT_BORROWED, patron_id, book_id, borrow_date, loan_id=cursor.lastrowid)
         conn.commit()
         conn.close()
         return True
@@ -207,23 +1216,254 @@ def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, du
         return False
 
 def update_book_availability(book_id: int, change: int) -> bool:
-    """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
+    """
+    Update the available copies of a book by a given amount (+1 for return, -1 for borrow).
+    Copies are checked in/out so the counters stay consistent with copy rows.
+    """
+    if change > 0:
+        from_status, to_status = COPY_ON_LOAN, COPY_AVAILABLE
+    else:
+        from_status, to_status = COPY_AVAILABLE, COPY_ON_LOAN
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE copies SET status = ?
+            WHERE id IN (SELECT id FROM copies WHERE book_id = ? AND status = ? ORDER BY id LIMIT ?)
+        ''', (to_status, book_id, from_status, abs(change)))
+        changed = _availability(conn, book_id)
+        conn.commit()
+        conn.close()
+        notify_availability(changed)
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def get_book_copies(book_id: int) -> List[Dict]:
+    """Get every copy of a book with the patron currently holding it, if any."""
+    conn = get_db_connection()
+    copies = conn.execute('''
+        SELECT c.id, c.barcode, c.status, c.branch, br.patron_id, br.due_date
+        FROM copies c
+        LEFT JOIN borrow_records br ON br.copy_id = c.id AND br.return_date IS NULL
+        WHERE c.book_id = ?
+        ORDER BY c.id
+    ''', (book_id,)).fetchall()
+    conn.close()
+    return [dict(copy) for copy in copies]
+
+def borrow_copy(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> Optional[int]:
+    """
+    Check out a copy of a book and record the loan in one transaction.
+    A copy set aside for the patron's ready hold is used first, otherwise
+    any available copy.
+    
+    Returns:
+        The borrowed copy's ID, or None if no copy was available or the write failed.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        hold = conn.execute('''
+            SELECT id, copy_id FROM holds
+            WHERE patron_id = ? AND book_id = ? AND status = 'ready'
+            ORDER BY created_at LIMIT 1
+        ''', (patron_id, book_id)).fetchone()
+        if hold:
+            copy_id = hold['copy_id']
+            conn.execute('DELETE FROM holds WHERE id = ?', (hold['id'],))
+        else:
+            copy = conn.execute('''
+                SELECT id FROM copies WHERE book_id = ? AND status = 'available' ORDER BY id LIMIT 1
+            ''', (book_id,)).fetchone()
+            if not copy:
+                conn.rollback()
+                conn.close()
+                return None
+            copy_id = copy['id']
+        conn.execute("UPDATE copies SET status = 'on_loan' WHERE id = ?", (copy_id,))
+        cursor = conn.execute('''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, copy_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat(), copy_id))
+        _append_loan_event(conn, EVENT_BORROWED, patron_id, book_id, borrow_date,
+                           loan_id=cursor.lastrowid, copy_id=copy_id)
+        changed = None if hold else _availability(conn, book_id)
+        conn.commit()
+        conn.close()
+        notify_availability(changed)
+        return copy_id
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return None
+
+def _release_copy(conn, copy_id: int, book_id: int, now: datetime) -> Optional[str]:
+    """
+    Give a copy coming back to the shelf to the head of the book's hold queue,
+    or make it available if nobody is waiting. Runs in the caller's transaction.
+    
+    Returns:
+        The patron ID the copy was set aside for, or None.
+    """
+    head = conn.execute('''
+        SELECT id, patron_id FROM holds
+        WHERE book_id = ? AND status = 'waiting'
+        ORDER BY created_at, id LIMIT 1
+    ''', (book_id,)).fetchone()
+    if head:
+        conn.execute("UPDATE copies SET status = 'on_hold' WHERE id = ?", (copy_id,))
+        conn.execute('''
+            UPDATE holds SET status = 'ready', copy_id = ?, ready_at = ? WHERE id = ?
+        ''', (copy_id, now.isoformat(), head['id']))
+        _append_loan_event(conn, EVENT_HELD, head['patron_id'], book_id, now, copy_id=copy_id)
+        return head['patron_id']
+
+    conn.execute("UPDATE copies SET status = 'available' WHERE id = ?", (copy_id,))
+    return None
+
+def return_copy(patron_id: str, book_id: int, return_date: datetime) -> bool:
+    """
+    Close a patron's open loan of a book and check its copy back in, in one
+    transaction. The copy goes to the first waiting hold on the book if any.
+    Loans recorded without a copy release any on-loan copy of the book.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        loan = conn.execute('''
+            SELECT id, copy_id FROM borrow_records
+            WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+            ORDER BY borrow_date LIMIT 1
+        ''', (patron_id, book_id)).fetchone()
+        if not loan:
+            conn.rollback()
+            conn.close()
+            return False
+        conn.execute('UPDATE borrow_records SET return_date = ? WHERE id = ?', (return_date.isoformat(), loan['id']))
+        _append_loan_event(conn, EVENT_RETURNED, patron_id, book_id, return_date,
+                           loan_id=loan['id'], copy_id=loan['copy_id'])
+
+        copy_id = loan['copy_id']
+        if copy_id is None:
+            copy = conn.execute('''
+                SELECT id FROM copies WHERE book_id = ? AND status = 'on_loan'
+                  AND NOT EXISTS (SELECT 1 FROM borrow_records r WHERE r.copy_id = copies.id AND r.return_date IS NULL)
+                ORDER BY id LIMIT 1
+            ''', (book_id,)).fetchone()
+            copy_id = copy['id'] if copy else None
+        changed = None
+        if copy_id is not None and _release_copy(conn, copy_id, book_id, return_date) is None:
+            changed = _availability(conn, book_id)
+
+        conn.commit()
+        conn.close()
+        notify_availability(changed)
+        return True
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return False
+
+def insert_hold(patron_id: str, book_id: int, created_at: datetime) -> Optional[int]:
+    """
+    Add a patron to the end of a book's hold queue.
+    
+    Returns:
+        The patron's position in the queue (1 = next), or None if the patron
+        already has an active hold on the book or the write failed.
+    """
     conn = get_db_connection()
     try:
+        conn.execute('BEGIN IMMEDIATE')
+        existing = conn.execute('''
+            SELECT 1 FROM holds WHERE patron_id = ? AND book_id = ?
+        ''', (patron_id, book_id)).fetchone()
+        if existing:
+            conn.rollback()
+            conn.close()
+            return None
         conn.execute('''
-            UPDATE books SET available_copies = available_copies + ? WHERE id = ?
-        ''', (change, book_id))
+            INSERT INTO holds (patron_id, book_id, created_at) VALUES (?, ?, ?)
+        ''', (patron_id, book_id, created_at.isoformat()))
+        position = conn.execute('''
+            SELECT COUNT(*) AS count FROM holds WHERE book_id = ? AND status = 'waiting'
+        ''', (book_id,)).fetchone()['count']
+        conn.commit()
+        conn.close()
+        return position
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return None
+
+def delete_hold(patron_id: str, book_id: int) -> bool:
+    """
+    Cancel a patron's hold on a book. A copy set aside for it moves on to the
+    next waiting hold (or back to the shelf) in the same transaction.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        hold = conn.execute('''
+            SELECT id, status, copy_id FROM holds WHERE patron_id = ? AND book_id = ?
+        ''', (patron_id, book_id)).fetchone()
+        if not hold:
+            conn.rollback()
+            conn.close()
+            return False
+        conn.execute('DELETE FROM holds WHERE id = ?', (hold['id'],))
+        changed = None
+        if hold['status'] == HOLD_READY and hold['copy_id'] is not None:
+            now = datetime.now()
+            _append_loan_event(conn, EVENT_HOLD_RELEASED, patron_id, book_id, now, copy_id=hold['copy_id'])
+            if _release_copy(conn, hold['copy_id'], book_id, now) is None:
+                changed = _availability(conn, book_id)
         conn.commit()
         conn.close()
+        notify_availability(changed)
         return True
     except Exception as e:
+        conn.rollback()
         conn.close()
         return False
 
+def get_patron_holds(patron_id: str) -> List[Dict]:
+    """Get a patron's holds with their queue position (0 once a copy is ready)."""
+    conn = get_db_connection()
+    holds = conn.execute('''
+        SELECT h.book_id, b.title, b.author, h.status, h.created_at, h.ready_at,
+               CASE WHEN h.status = 'waiting' THEN (
+                   SELECT COUNT(*) FROM holds q
+                   WHERE q.book_id = h.book_id AND q.status = 'waiting'
+                     AND (q.created_at, q.id) <= (h.created_at, h.id)
+               ) ELSE 0 END AS position
+        FROM holds h
+        JOIN books b ON h.book_id = b.id
+        WHERE h.patron_id = ?
+        ORDER BY h.created_at
+    ''', (patron_id,)).fetchall()
+    conn.close()
+    return [dict(hold) for hold in holds]
+
+def has_ready_hold(patron_id: str, book_id: int) -> bool:
+    """Check whether a copy of the book is set aside for the patron."""
+    conn = get_db_connection()
+    hold = conn.execute('''
+        SELECT 1 FROM holds WHERE patron_id = ? AND book_id = ? AND status = 'ready'
+    ''', (patron_id, book_id)).fetchone()
+    conn.close()
+    return hold is not None
+
 def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
     """Update the return date for a borrow record."""
     conn = get_db_connection()
     try:
+        conn.execute('''
+            INSERT INTO loan_events (event_type, patron_id, book_id, loan_id, copy_id, occurred_at)
+            SELECT ?, patron_id, book_id, id, copy_id, ? FROM borrow_records
+            WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+        ''', (EVENT_RETURNED, return_date.isoformat(), patron_id, book_id))
         conn.execute('''
             UPDATE borrow_records 
             SET return_date = ? 
@@ -0,0 +1,382 @@
+"""
+Repositories - Pluggable storage for books, loans and holds
+
+The business logic in services/library_service.py reads and writes books,
+loans and holds through the functions at the bottom of this module, which
+forward to the repository active for the current request/thread:
+
+- ``SQLiteRepository`` (the default) calls the functions in database.py,
+  reading book availability from the shared snapshot when one is open.
+- ``InMemoryRepository`` keeps everything in indexed dicts, for unit tests
+  and benchmarks that should not pay for (or measure) SQLite.
+
+An app picks its repository with ``create_app(repository=...)``; scripts and
+tests can switch with ``use_repository``. Authors, copies, the archive,
+statistics and the loan event log stay SQLite-only.
+"""
+
+import bisect
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import database
+from database import (
+    normalize_author_key, author_name_suffixes, HOLD_WAITING, HOLD_READY,
+    EVENT_BORROWED, EVENT_RETURNED, EVENT_HELD, EVENT_HOLD_RELEASED
+)
+from services.availability_snapshot import availability_snapshot
+
+
+class SQLiteRepository:
+    """Books, loans and holds in the current branch's SQLite database."""
+
+    name = 'sqlite'
+
+    def init(self) -> None:
+        """Add the sample data to an empty database (tables come from init_database)."""
+        database.add_sample_data()
+
+    def get_all_books(self) -> List[Dict]:
+        books = availability_snapshot.all_books() if availability_snapshot.enabled else None
+        return database.get_all_books() if books is None else books
+
+    def get_book_by_id(self, book_id: int) -> Optional[Dict]:
+        return database.get_book_by_id(book_id)
+
+    def get_book_by_isbn(self, isbn: str) -> Optional[Dict]:
+        return database.get_book_by_isbn(isbn)
+
+    def get_books_by_ids(self, book_ids: List[int]) -> List[Dict]:
+        books = availability_snapshot.books_by_ids(book_ids) if availability_snapshot.enabled else None
+        return database.get_books_by_ids(book_ids) if books is None else books
+
+    def search_books_by_author(self, search_term: str) -> List[Dict]:
+        return database.search_books_by_author(search_term)
+
+    def insert_book(self, title: str, author: str, isbn: str, total_copies: int, available_copies: int,
+                    branch: Optional[str] = None) -> bool:
+        return database.insert_book(title, author, isbn, total_copies, available_copies, branch)
+
+    def get_patron_borrowed_books(self, patron_id: str) -> List[Dict]:
+        return database.get_patron_borrowed_books(patron_id)
+
+    def get_patron_borrow_count(self, patron_id: str) -> int:
+        return database.get_patron_borrow_count(patron_id)
+
+    def iter_patron_borrow_history(self, patron_id: str, after: Optional[Tuple[str, int]] = None,
+                                   since: Optional[datetime] = None, until: Optional[datetime] = None,
+                                   page_size: int = 100) -> Iterator[Dict]:
+        return database.iter_patron_borrow_history(patron_id, after, since, until, page_size)
+
+    def borrow_copy(self, patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> Optional[int]:
+        return database.borrow_copy(patron_id, book_id, borrow_date, due_date)
+
+    def return_copy(self, patron_id: str, book_id: int, return_date: datetime) -> bool:
+        return database.return_copy(patron_id, book_id, return_date)
+
+    def insert_hold(self, patron_id: str, book_id: int, created_at: datetime) -> Optional[int]:
+        return database.insert_hold(patron_id, book_id, created_at)
+
+    def delete_hold(self, patron_id: str, book_id: int) -> bool:
+        return database.delete_hold(patron_id, book_id)
+
+    def get_patron_holds(self, patron_id: str) -> List[Dict]:
+        return database.get_patron_holds(patron_id)
+
+    def has_ready_hold(self, patron_id: str, book_id: int) -> bool:
+        return database.has_ready_hold(patron_id, book_id)
+
+    def insert_loan_event(self, event_type: str, patron_id: str, book_id: int, amount: Optional[float] = None) -> bool:
+        return database.insert_loan_event(event_type, patron_id, book_id, amount)
+
+
+class InMemoryRepository:
+    """
+    Books, loans and holds in process memory, with the same results as
+    SQLiteRepository.
+
+    Books are indexed by ID and ISBN, open loans by patron, returned loans by
+    patron in (borrow_date, loan_id) order and holds by book in queue order,
+    so every operation is a dict lookup or a short scan of one patron's or
+    one book's entries. Writes are serialized by a lock.
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop all data."""
+        with self._lock:
+            self._books: Dict[int, Dict] = {}
+            self._isbns: Dict[str, int] = {}
+            self._author_ids: Dict[str, int] = {}
+            self._available: Dict[int, List[int]] = {}   # book_id -> available copy IDs
+            self._copy_ids = 0
+            self._loans: Dict[int, Dict] = {}
+            self._open_loans: Dict[str, Dict[int, Dict]] = defaultdict(dict)   # patron_id -> loan_id -> loan
+            self._history: Dict[str, List[Tuple[str, int]]] = defaultdict(list)  # sorted (borrow_date, loan_id)
+            self._holds: Dict[int, List[Dict]] = defaultdict(list)   # book_id -> holds in queue order
+            self._hold_ids = 0
+            self.events: List[Tuple] = []
+
+    def init(self) -> None:
+        """Add the sample data if the repository is empty."""
+        with self._lock:
+            if self._books:
+                return
+            for title, author, isbn, copies in [
+                ('The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', 3),
+                ('To Kill a Mockingbird', 'Harper Lee', '9780061120084', 2),
+                ('1984', 'George Orwell', '9780451524935', 1)
+            ]:
+                self._add_book(title, author, isbn, copies, copies)
+            # 1984 is on loan, as in the SQLite sample data
+            now = datetime.now()
+            self.borrow_copy('123456', 3, now - timedelta(days=5), now + timedelta(days=9))
+
+    # Books
+
+    def _add_book(self, title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> Dict:
+        book_id = len(self._books) + 1
+        author_id = self._author_ids.setdefault(normalize_author_key(author), len(self._author_ids) + 1)
+        book = {'id': book_id, 'title': title, 'author': author, 'isbn': isbn,
+                'total_copies': total_copies, 'available_copies': available_copies, 'author_id': author_id}
+        self._books[book_id] = book
+        self._isbns[isbn] = book_id
+        first_copy = self._copy_ids + 1
+        self._copy_ids += total_copies
+        self._available[book_id] = list(range(first_copy, first_copy + available_copies))
+        return book
+
+    def get_all_books(self) -> List[Dict]:
+        return sorted((dict(book) for book in self._books.values()), key=lambda book: book['title'])
+
+    def get_book_by_id(self, book_id: int) -> Optional[Dict]:
+        book = self._books.get(book_id)
+        return dict(book) if book else None
+
+    def get_book_by_isbn(self, isbn: str) -> Optional[Dict]:
+        return self.get_book_by_id(self._isbns.get(isbn))
+
+    def get_books_by_ids(self, book_ids: List[int]) -> List[Dict]:
+        return [dict(self._books[book_id]) for book_id in book_ids if book_id in self._books]
+
+    def search_books_by_author(self, search_term: str) -> List[Dict]:
+        key = normalize_author_key(search_term)
+        return [book for book in self.get_all_books()
+                if any(suffix.startswith(key) for suffix in author_name_suffixes(normalize_author_key(book['author'])))]
+
+    def insert_book(self, title: str, author: str, isbn: str, total_copies: int, available_copies: int,
+                    branch: Optional[str] = None) -> bool:
+        with self._lock:
+            if isbn in self._isbns:
+                return False
+            book = self._add_book(title, author, isbn, total_copies, available_copies)
+        database.notify_book_inserted(dict(book))
+        return True
+
+    # Loans
+
+    def _loan_record(self, loan: Dict, now: datetime) -> Dict:
+        """A loan in the shape returned by the database functions."""
+        book = self._books[loan['book_id']]
+        return {
+            'book_id': loan['book_id'],
+            'title': book['title'],
+            'author': book['author'],
+            'borrow_date': loan['borrow_date'],
+            'due_date': loan['due_date'],
+            'is_overdue': now > loan['due_date'],
+        }
+
+    def get_patron_borrowed_books(self, patron_id: str) -> List[Dict]:
+        now = datetime.now()
+        loans = sorted(self._open_loans.get(patron_id, {}).values(), key=lambda loan: loan['borrow_date'])
+        return [self._loan_record(loan, now) for loan in loans]
+
+    def get_patron_borrow_count(self, patron_id: str) -> int:
+        return len(self._open_loans.get(patron_id, ()))
+
+    def iter_patron_borrow_history(self, patron_id: str, after: Optional[Tuple[str, int]] = None,
+                                   since: Optional[datetime] = None, until: Optional[datetime] = None,
+                                   page_size: int = 100) -> Iterator[Dict]:
+        now = datetime.now()
+        keys = self._history.get(patron_id, [])
+        start = bisect.bisect_right(keys, after) if after is not None else 0
+        if since is not None:
+            start = max(start, bisect.bisect_left(keys, (since.isoformat(),)))
+        end = bisect.bisect_left(keys, (until.isoformat(),)) if until is not None else len(keys)
+        for _, loan_id in keys[start:end]:
+            loan = self._loans[loan_id]
+            yield {'loan_id': loan_id, **self._loan_record(loan, now), 'return_date': loan['return_date']}
+
+    def _counters(self, book_id: int) -> Dict:
+        # No catalog 'version' here: that is the SQLite catalog_version counter, so
+        # the availability snapshot (which needs it) only works with SQLite storage
+        book = self._books[book_id]
+        return {'id': book_id, 'total_copies': book['total_copies'], 'available_copies': book['available_copies']}
+
+    def borrow_copy(self, patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> Optional[int]:
+        changed = None
+        with self._lock:
+            book = self._books.get(book_id)
+            if book is None:
+                return None
+            hold = next((hold for hold in self._holds.get(book_id, ())
+                         if hold['patron_id'] == patron_id and hold['status'] == HOLD_READY), None)
+            if hold:
+                copy_id = hold['copy_id']
+                self._holds[book_id].remove(hold)
+            elif self._available[book_id]:
+                copy_id = self._available[book_id].pop(0)
+                book['available_copies'] -= 1
+                changed = self._counters(book_id)
+            else:
+                return None
+
+            loan_id = len(self._loans) + 1
+            loan = {'id': loan_id, 'patron_id': patron_id, 'book_id': book_id, 'copy_id': copy_id,
+                    'borrow_date': borrow_date, 'due_date': due_date, 'return_date': None}
+            self._loans[loan_id] = loan
+            self._open_loans[patron_id][loan_id] = loan
+            self.events.append((EVENT_BORROWED, patron_id, book_id, loan_id, copy_id, None, borrow_date))
+        database.notify_availability(changed)
+        return copy_id
+
+    def _release_copy(self, copy_id: int, book_id: int, now: datetime) -> Optional[Dict]:
+        """
+        Set a copy aside for the first waiting hold, or put it back on the shelf.
+
+        Returns:
+            The book's new copy counters if the copy went back on the shelf, else None
+        """
+        head = next((hold for hold in self._holds.get(book_id, ()) if hold['status'] == HOLD_WAITING), None)
+        if head:
+            head.update(status=HOLD_READY, copy_id=copy_id, ready_at=now.isoformat())
+            self.events.append((EVENT_HELD, head['patron_id'], book_id, None, copy_id, None, now))
+            return None
+        bisect.insort(self._available[book_id], copy_id)
+        self._books[book_id]['available_copies'] += 1
+        return self._counters(book_id)
+
+    def return_copy(self, patron_id: str, book_id: int, return_date: datetime) -> bool:
+        with self._lock:
+            loans = [loan for loan in self._open_loans.get(patron_id, {}).values() if loan['book_id'] == book_id]
+            if not loans:
+                return False
+            loan = min(loans, key=lambda loan: loan['borrow_date'])
+            loan['return_date'] = return_date
+            del self._open_loans[patron_id][loan['id']]
+            bisect.insort(self._history[patron_id], (loan['borrow_date'].isoformat(), loan['id']))
+            self.events.append((EVENT_RETURNED, patron_id, book_id, loan['id'], loan['copy_id'], None, return_date))
+            changed = self._release_copy(loan['copy_id'], book_id, return_date)
+        database.notify_availability(changed)
+        return True
+
+    # Holds
+
+    def insert_hold(self, patron_id: str, book_id: int, created_at: datetime) -> Optional[int]:
+        with self._lock:
+            queue = self._holds[book_id]
+            if any(hold['patron_id'] == patron_id for hold in queue):
+                return None
+            self._hold_ids += 1
+            queue.append({'id': self._hold_ids, 'patron_id': patron_id, 'book_id': book_id,
+                          'status': HOLD_WAITING, 'copy_id': None,
+                          'created_at': created_at.isoformat(), 'ready_at': None})
+            return sum(1 for hold in queue if hold['status'] == HOLD_WAITING)
+
+    def delete_hold(self, patron_id: str, book_id: int) -> bool:
+        with self._lock:
+            queue = self._holds.get(book_id, [])
+            hold = next((hold for hold in queue if hold['patron_id'] == patron_id), None)
+            if hold is None:
+                return False
+            queue.remove(hold)
+            changed = None
+            if hold['status'] == HOLD_READY and hold['copy_id'] is not None:
+                now = datetime.now()
+                self.events.append((EVENT_HOLD_RELEASED, patron_id, book_id, None, hold['copy_id'], None, now))
+                changed = self._release_copy(hold['copy_id'], book_id, now)
+        database.notify_availability(changed)
+        return True
+
+    def get_patron_holds(self, patron_id: str) -> List[Dict]:
+        holds = []
+        for book_id, queue in self._holds.items():
+            position = 0
+            for hold in queue:
+                if hold['status'] == HOLD_WAITING:
+                    position += 1
+                if hold['patron_id'] == patron_id:
+                    book = self._books[book_id]
+                    holds.append({
+                        'book_id': book_id, 'title': book['title'], 'author': book['author'],
+                        'status': hold['status'], 'created_at': hold['created_at'], 'ready_at': hold['ready_at'],
+                        'position': position if hold['status'] == HOLD_WAITING else 0
+                    })
+        return sorted(holds, key=lambda hold: hold['created_at'])
+
+    def has_ready_hold(self, patron_id: str, book_id: int) -> bool:
+        return any(hold['patron_id'] == patron_id and hold['status'] == HOLD_READY
+                   for hold in self._holds.get(book_id, ()))
+
+    def insert_loan_event(self, event_type: str, patron_id: str, book_id: int, amount: Optional[float] = None) -> bool:
+        with self._lock:
+            self.events.append((event_type, patron_id, book_id, None, None, amount, datetime.now()))
+        return True
+
+
+_default_repository = SQLiteRepository()
+
+# Repository selected for the current request/thread (set per app in app.py)
+_current_repository: ContextVar[Optional[object]] = ContextVar('current_repository', default=None)
+
+
+def get_repository():
+    """The repository for the current request/thread (SQLite unless one is selected)."""
+    return _current_repository.get() or _default_repository
+
+
+@contextmanager
+def use_repository(repository):
+    """Route repository calls inside the block to the given repository."""
+    token = _current_repository.set(repository)
+    try:
+        yield repository
+    finally:
+        _current_repository.reset(token)
+
+
+def _forward(name: str):
+    """Module-level function calling the named method of the current repository."""
+    def call(*args, **kwargs):
+        return getattr(get_repository(), name)(*args, **kwargs)
+    call.__name__ = name
+    call.__doc__ = getattr(SQLiteRepository, name).__doc__ or getattr(database, name).__doc__
+    return call
+
+
+get_all_books = _forward('get_all_books')
+get_book_by_id = _forward('get_book_by_id')
+get_book_by_isbn = _forward('get_book_by_isbn')
+get_books_by_ids = _forward('get_books_by_ids')
+search_books_by_author = _forward('search_books_by_author')
+insert_book = _forward('insert_book')
+get_patron_borrowed_books = _forward('get_patron_borrowed_books')
+get_patron_borrow_count = _forward('get_patron_borrow_count')
+iter_patron_borrow_history = _forward('iter_patron_borrow_history')
+borrow_copy = _forward('borrow_copy')
+return_copy = _forward('return_copy')
+insert_hold = _forward('insert_hold')
+delete_hold = _forward('delete_hold')
+get_patron_holds = _forward('get_patron_holds')
+has_ready_hold = _forward('has_ready_hold')
+insert_loan_event = _forward('insert_loan_event')
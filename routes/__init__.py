@@ -7,6 +7,9 @@ from .borrowing_routes import borrowing_bp
 from .search_routes import search_bp
 from .api_routes import api_bp
 from .status_routes import status_bp
+from .job_routes import jobs_bp
+from .event_routes import events_bp
+from .debug_routes import debug_bp
 
 def register_blueprints(app):
     """Register all route blueprints with the Flask app."""
@@ -14,4 +17,7 @@ def register_blueprints(app):
     app.register_blueprint(borrowing_bp)
     app.register_blueprint(search_bp)
     app.register_blueprint(api_bp)
-    app.register_blueprint(status_bp)
\ No newline at end of file
+    app.register_blueprint(status_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(events_bp)
+    app.register_blueprint(debug_bp)
\ No newline at end of file
@@ -0,0 +1,228 @@
+"""
+Admission Control - Rate limiting and load shedding before handlers run
+
+Each limited endpoint belongs to a class (search, borrow, ...) with a token
+bucket per client IP and, when the request names one, per patron ID. Buckets
+live in a pluggable store: ``MemoryBucketStore`` for a single process or
+``SQLiteBucketStore`` to share limits between worker processes through a
+small local database file (separate from the library database).
+
+Independently, requests are shed with 503 once the number already in flight
+reaches ``max_in_flight``, so an overloaded server answers quickly instead of
+queueing work on the single SQLite writer. Rejections are counted and served
+at ``/admission/metrics``.
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from flask import g, request
+from routes.api_response import json_response
+
+# Endpoint class -> (tokens per second, burst size, endpoints)
+DEFAULT_LIMITS = {
+    'search': (10.0, 30, ('search.search_books', 'api.search_books_api', 'api.suggest_api')),
+    'borrow': (1.0, 10, ('borrowing.borrow_book', 'borrowing.return_book', 'borrowing.place_hold_route',
+                         'borrowing.cancel_hold_route', 'api.place_hold_api', 'api.cancel_hold_api')),
+    'fees': (2.0, 10, ('api.get_late_fee', 'jobs.enqueue_payment', 'jobs.enqueue_refund',
+                       'jobs.enqueue_verification', 'jobs.enqueue_refund_batch')),
+}
+DEFAULT_MAX_IN_FLIGHT = 64
+
+
+class MemoryBucketStore:
+    """Token buckets in a dict, for a single process."""
+
+    # Buckets kept before ones that have refilled are pruned
+    PRUNE_AT = 100000
+
+    def __init__(self):
+        # key -> (tokens, updated, time the bucket will be full again)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int, now: float) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until a token is available)."""
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            if len(self._buckets) > self.PRUNE_AT:
+                # A full bucket is the same as no bucket
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file, shared by every process that opens it."""
+
+    def __init__(self, path: str, timeout: float = 1.0):
+        self.path = path
+        self.timeout = timeout  # seconds to wait for another process's write lock
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+
+    def _connection(self) -> sqlite3.Connection:
+        """One autocommit connection per thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # Losing recent counts on a crash is harmless
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, burst: int, now: float) -> Tuple[bool, float]:
+        """
+        Take one token; returns (allowed, seconds until a token is available).
+
+        Raises:
+            sqlite3.OperationalError: If another process held the file locked past the timeout
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(now - updated, 0) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+class AdmissionController:
+    """Per-IP/per-patron token buckets plus in-flight load shedding."""
+
+    def __init__(self, store=None, limits: Optional[Dict] = None, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.store = store or MemoryBucketStore()
+        self.limits = DEFAULT_LIMITS if limits is None else limits
+        self.max_in_flight = max_in_flight
+        self._classes = {endpoint: name for name, (_, _, endpoints) in self.limits.items() for endpoint in endpoints}
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.metrics = {'admitted': 0, 'shed': 0, 'store_errors': 0,
+                        'rate_limited': {name: 0 for name in self.limits}}
+
+    def is_limited(self, endpoint: Optional[str]) -> bool:
+        """True if the endpoint belongs to a rate limit class."""
+        return endpoint in self._classes
+
+    def check(self, endpoint: Optional[str], client_ip: str, patron_id: Optional[str],
+              now: Optional[float] = None) -> Optional[Tuple[int, float]]:
+        """
+        Rate-limit a request.
+
+        Returns:
+            None to admit, or (429, retry_after seconds)
+        """
+        name = self._classes.get(endpoint)
+        if name is None:
+            return None
+
+        rate, burst, _ = self.limits[name]
+        now = time.time() if now is None else now
+        keys = [f'{name}:ip:{client_ip}']
+        if patron_id:
+            keys.append(f'{name}:patron:{patron_id}')
+        for key in keys:
+            try:
+                allowed, retry_after = self.store.take(key, rate, burst, now)
+            except sqlite3.OperationalError:
+                # Shared store locked past its timeout: admit rather than fail the request
+                with self._lock:
+                    self.metrics['store_errors'] += 1
+                return None
+            if not allowed:
+                with self._lock:
+                    self.metrics['rate_limited'][name] += 1
+                return 429, retry_after
+        return None
+
+    def enter(self) -> bool:
+        """Count a request in flight; False (and not counted) when the server is full."""
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.metrics['shed'] += 1
+                return False
+            self.in_flight += 1
+            self.metrics['admitted'] += 1
+            return True
+
+    def leave(self) -> None:
+        """Count a request as finished."""
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self) -> Dict:
+        """Copy of the counters and current in-flight requests."""
+        with self._lock:
+            return {'in_flight': self.in_flight, 'max_in_flight': self.max_in_flight,
+                    'admitted': self.metrics['admitted'], 'shed': self.metrics['shed'],
+                    'store_errors': self.metrics['store_errors'],
+                    'rate_limited': dict(self.metrics['rate_limited'])}
+
+
+def _patron_id() -> Optional[str]:
+    """Patron ID named by the URL, query/form or JSON body, if any."""
+    patron_id = (request.view_args or {}).get('patron_id') or request.values.get('patron_id')
+    if not patron_id and request.is_json:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):  # Handlers reject other bodies with their own 400
+            patron_id = body.get('patron_id')
+    return str(patron_id).strip() if patron_id else None
+
+
+def _reject(status: int, error: str, retry_after: float):
+    """JSON error response telling the client when to retry."""
+    response = json_response({'error': error}, status)
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def register_admission_control(app, controller: AdmissionController):
+    """Install rate limiting and load shedding on the Flask app (before any other hook)."""
+
+    def admit():
+        if request.endpoint == 'admission_metrics':
+            return None
+        if not controller.enter():
+            return _reject(503, 'Server busy, try again shortly.', 1)
+        g.admitted = True
+
+        if not controller.is_limited(request.endpoint):
+            return None  # Nothing to check, so leave the body unparsed
+        limited = controller.check(request.endpoint, request.remote_addr or 'unknown', _patron_id())
+        if limited is not None:
+            return _reject(limited[0], 'Too many requests.', limited[1])
+        return None
+
+    def release(exc=None):
+        if g.pop('admitted', False):
+            controller.leave()
+
+    def metrics():
+        return json_response(controller.snapshot())
+
+    app.extensions['admission'] = controller
+    app.before_request(admit)
+    app.teardown_request(release)
+    app.add_url_rule('/admission/metrics', 'admission_metrics', metrics)
@@ -0,0 +1,121 @@
+"""
+API Response Helpers - Lean JSON serialization and response compression
+"""
+
+import gzip
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from flask import Response, request
+
+try:  # Optional fast encoder, falls back to the standard library
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:  # Optional brotli support, gzip is always available
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Responses smaller than this are sent uncompressed (compression would not pay off)
+COMPRESSION_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Book columns a client may request with the ``fields=`` parameter
+BOOK_FIELDS = ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies')
+
+
+def _default(value: Any) -> Any:
+    """Serialize values the standard json module does not understand."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialize a payload to compact JSON bytes, using orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False, default=_default).encode('utf-8')
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    """Build a JSON response with the lean encoder instead of ``jsonify``."""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def parse_fields(raw: Optional[str], allowed: Iterable[str] = BOOK_FIELDS) -> Optional[List[str]]:
+    """
+    Parse a comma separated ``fields=`` parameter.
+
+    Returns:
+        None when no projection was requested, otherwise the list of fields.
+
+    Raises:
+        ValueError: If a requested field is not allowed.
+    """
+    if not raw:
+        return None
+
+    fields = []
+    for field in raw.split(','):
+        field = field.strip()
+        if not field:
+            continue
+        if field not in allowed:
+            raise ValueError(f"Unknown field: {field}")
+        if field not in fields:
+            fields.append(field)
+
+    return fields or None
+
+
+def project(rows: List[Dict], fields: Optional[List[str]]) -> List[Dict]:
+    """Keep only the requested fields of each row."""
+    if fields is None:
+        return rows
+    return [{field: row[field] for field in fields if field in row} for row in rows]
+
+
+def _choose_encoding() -> Optional[str]:
+    """Pick the best encoding the client accepts, preferring brotli."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality('br') > 0:
+        return 'br'
+    if accepted.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def compress_response(response: Response) -> Response:
+    """
+    Compress a response body according to the request's Accept-Encoding.
+
+    Meant to be registered as an ``after_request`` hook on a blueprint.
+    """
+    response.vary.add('Accept-Encoding')
+
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESSION_MIN_SIZE:
+        return response
+
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
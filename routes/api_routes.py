@@ -2,10 +2,28 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+from datetime import date, datetime, timedelta
+from flask import Blueprint, request
+from services.library_service import (
+    calculate_late_fee_for_book, search_books_in_catalog, search_books_all_branches,
+    place_hold, cancel_hold, get_patron_history_page
+)
+from services.suggest_index import suggest_index, SUGGEST_TYPES
+from services.circulation_stats import circulation_report, STATS_GROUPS
+from services.payment_status import payment_statuses
+from database import get_authors, get_author_by_id, get_book_by_id, get_book_copies
+from repositories import get_patron_holds
+from routes.api_response import json_response, parse_fields, project, compress_response, BOOK_FIELDS
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
+api_bp.after_request(compress_response)
+
+MAX_STATUS_LOOKUPS = 1000
+
+def _date_arg(name):
+    """Parse an optional YYYY-MM-DD query parameter (raises ValueError)."""
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else None
 
 @api_bp.route('/late_fee/<patron_id>/<int:book_id>')
 def get_late_fee(patron_id, book_id):
@@ -14,26 +32,236 @@ def get_late_fee(patron_id, book_id):
     API endpoint for R4: Late Fee Calculation
     """
     result = calculate_late_fee_for_book(patron_id, book_id)
-    return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
+    return json_response(result, 501 if 'not implemented' in result.get('status', '') else 200)
 
 @api_bp.route('/search')
 def search_books_api():
     """
     Search for books via API endpoint.
     Alternative API interface for R5: Book Search Functionality
+
+    Optional ``fields`` parameter (e.g. ``fields=id,title``) limits the
+    columns returned for each book. ``type=all`` ranks matches across
+    title, author and ISBN and adds a ``score`` to each book.
+    ``branch=all`` searches every branch and adds a ``branch`` to each book.
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
-    
+
     if not search_term:
-        return jsonify({'error': 'Search term is required'}), 400
-    
+        return json_response({'error': 'Search term is required'}, 400)
+
+    try:
+        fields = parse_fields(request.args.get('fields'), BOOK_FIELDS + ('score', 'branch'))
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
     # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
-    
-    return jsonify({
+    if request.args.get('branch') == 'all':
+        books = search_books_all_branches(search_term, search_type)
+    else:
+        books = search_books_in_catalog(search_term, search_type)
+
+    return json_response({
         'search_term': search_term,
         'search_type': search_type,
-        'results': books,
+        'results': project(books, fields),
         'count': len(books)
     })
+
+@api_bp.route('/suggest')
+def suggest_api():
+    """
+    Type-ahead completions for titles and authors.
+
+    Query parameters: ``q`` (prefix), ``type`` (title, author or all),
+    ``k`` (maximum suggestions, default 10, at most 50).
+    """
+    prefix = request.args.get('q', '')
+    suggest_type = request.args.get('type', 'all')
+
+    if suggest_type != 'all' and suggest_type not in SUGGEST_TYPES:
+        return json_response({'error': 'Type must be title, author or all'}, 400)
+
+    try:
+        k = min(max(int(request.args.get('k', 10)), 1), 50)
+    except ValueError:
+        return json_response({'error': 'k must be an integer'}, 400)
+
+    suggestions = suggest_index.suggest(prefix, k, None if suggest_type == 'all' else suggest_type)
+
+    return json_response({
+        'query': prefix,
+        'suggestions': suggestions,
+        'count': len(suggestions)
+    })
+
+@api_bp.route('/authors')
+def list_authors_api():
+    """
+    Browse authors alphabetically with their book and copy counts.
+
+    Query parameters: ``prefix`` (name prefix, case-insensitive),
+    ``limit`` (default 50, at most 200) and ``offset``.
+    """
+    prefix = request.args.get('prefix', '')
+
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return json_response({'error': 'limit and offset must be integers'}, 400)
+
+    authors = get_authors(prefix, limit, offset)
+
+    return json_response({
+        'prefix': prefix,
+        'authors': authors,
+        'count': len(authors),
+        'limit': limit,
+        'offset': offset
+    })
+
+@api_bp.route('/authors/<int:author_id>')
+def get_author_api(author_id):
+    """Get an author with the list of their books."""
+    author = get_author_by_id(author_id)
+    if not author:
+        return json_response({'error': 'Author not found'}, 404)
+
+    return json_response(author)
+
+@api_bp.route('/books/<int:book_id>/copies')
+def get_book_copies_api(book_id):
+    """List every copy of a book with its status, branch and current borrower."""
+    book = get_book_by_id(book_id)
+    if not book:
+        return json_response({'error': 'Book not found'}, 404)
+
+    copies = get_book_copies(book_id)
+
+    return json_response({
+        'book_id': book_id,
+        'title': book['title'],
+        'copies': copies,
+        'count': len(copies)
+    })
+
+@api_bp.route('/holds', methods=['POST'])
+def place_hold_api():
+    """Place a hold. Body (JSON or form): ``patron_id`` and ``book_id``."""
+    data = request.get_json(silent=True) or request.form
+    patron_id = str(data.get('patron_id', '')).strip()
+
+    try:
+        book_id = int(data.get('book_id', ''))
+    except (ValueError, TypeError):
+        return json_response({'error': 'Invalid book ID.'}, 400)
+
+    success, message = place_hold(patron_id, book_id)
+    return json_response({'success': success, 'message': message}, 201 if success else 400)
+
+@api_bp.route('/holds/<patron_id>/<int:book_id>', methods=['DELETE'])
+def cancel_hold_api(patron_id, book_id):
+    """Cancel a patron's hold on a book."""
+    success, message = cancel_hold(patron_id, book_id)
+    return json_response({'success': success, 'message': message}, 200 if success else 404)
+
+@api_bp.route('/holds/<patron_id>')
+def list_holds_api(patron_id):
+    """List a patron's holds with their queue positions."""
+    holds = get_patron_holds(patron_id)
+    return json_response({'patron_id': patron_id, 'holds': holds, 'count': len(holds)})
+
+@api_bp.route('/payments/<transaction_id>/status')
+def payment_status_api(transaction_id):
+    """A payment's status from the gateway (cached once final)."""
+    try:
+        status = payment_statuses.get(transaction_id)
+    except Exception as e:
+        return json_response({'error': f'Payment gateway error: {e}'}, 502)
+    return json_response(status, 404 if status.get('status') == 'not_found' else 200)
+
+@api_bp.route('/payments/status', methods=['POST'])
+def payment_statuses_api():
+    """Statuses of many payments in one gateway round trip. Body: ``{"transaction_ids": [...]}``."""
+    data = request.get_json(silent=True)
+    transaction_ids = data.get('transaction_ids') if isinstance(data, dict) else None
+    if not isinstance(transaction_ids, list) or not all(isinstance(t, str) for t in transaction_ids):
+        return json_response({'error': 'Expected a "transaction_ids" list of strings.'}, 400)
+    if len(transaction_ids) > MAX_STATUS_LOOKUPS:
+        return json_response({'error': f'At most {MAX_STATUS_LOOKUPS} transactions per request.'}, 400)
+    try:
+        statuses = payment_statuses.get_many(transaction_ids)
+    except Exception as e:
+        return json_response({'error': f'Payment gateway error: {e}'}, 502)
+    return json_response({'statuses': statuses, 'count': len(statuses)})
+
+@api_bp.route('/patrons/<patron_id>/history')
+def patron_history_api(patron_id):
+    """
+    Page through a patron's returned loans, oldest first.
+
+    Query parameters: ``limit`` (default 25, at most 200), ``cursor`` (the
+    ``next_cursor`` of the previous page), and ``since``/``until``
+    (inclusive ISO dates on the borrow date).
+    """
+    if not patron_id.isdigit() or len(patron_id) != 6:
+        return json_response({'error': 'Invalid patron ID. Must be exactly 6 digits.'}, 400)
+
+    try:
+        limit = min(max(int(request.args.get('limit', 25)), 1), 200)
+    except ValueError:
+        return json_response({'error': 'limit must be an integer'}, 400)
+
+    try:
+        since = _date_arg('since')
+        until = _date_arg('until')
+        since = datetime.combine(since, datetime.min.time()) if since else None
+        until = datetime.combine(until + timedelta(days=1), datetime.min.time()) if until else None
+    except ValueError:
+        return json_response({'error': 'since and until must be dates (YYYY-MM-DD)'}, 400)
+
+    try:
+        page = get_patron_history_page(patron_id, limit, request.args.get('cursor'), since, until)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    return json_response({
+        'patron_id': patron_id,
+        'history': page['history'],
+        'count': len(page['history']),
+        'next_cursor': page['next_cursor']
+    })
+
+@api_bp.route('/stats/<group>')
+def stats_api(group):
+    """
+    Circulation report from the daily rollups: ``books``, ``authors`` or ``daily``.
+
+    Query parameters: ``since``/``until`` (inclusive ISO dates, default the
+    last 30 days), ``order`` (borrows, late_returns, overdue_rate or
+    utilisation) and ``limit`` (default 20, at most 200). Read-only:
+    ``pending_events`` counts loan events the rollup job has not folded in yet.
+    """
+    if group not in STATS_GROUPS:
+        return json_response({'error': f'Unknown report: {group}'}, 404)
+
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 200)
+    except ValueError:
+        return json_response({'error': 'limit must be an integer'}, 400)
+
+    try:
+        since = _date_arg('since')
+        until = _date_arg('until')
+    except ValueError:
+        return json_response({'error': 'since and until must be dates (YYYY-MM-DD)'}, 400)
+
+    try:
+        report = circulation_report(group, since, until, request.args.get('order', 'borrows'), limit)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    report['count'] = len(report['rows'])
+    return json_response(report)
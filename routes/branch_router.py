@@ -0,0 +1,38 @@
+"""
+Branch Router - Selects the database shard for each request
+
+The branch comes from the ``X-Library-Branch`` header, or the ``branch``
+query/form parameter. ``branch=all`` is left unset so handlers can fan out
+across every shard.
+"""
+
+from flask import g, request
+from database import BRANCH_DATABASES, _current_branch
+
+BRANCH_HEADER = 'X-Library-Branch'
+
+
+def select_branch():
+    """Route this request's database calls to the requested branch's shard."""
+    branch = request.headers.get(BRANCH_HEADER) or request.values.get('branch')
+    if not branch or branch == 'all' or not BRANCH_DATABASES:
+        return None
+
+    if branch not in BRANCH_DATABASES:
+        return f'Unknown branch: {branch}', 400
+
+    g.branch_token = _current_branch.set(branch)
+    return None
+
+
+def reset_branch(exc=None):
+    """Clear the branch selected for the request."""
+    token = g.pop('branch_token', None)
+    if token is not None:
+        _current_branch.reset(token)
+
+
+def register_branch_router(app):
+    """Install the branch router on the Flask app."""
+    app.before_request(select_branch)
+    app.teardown_request(reset_branch)
@@ -3,7 +3,8 @@ Catalog Routes - Book catalog related endpoints
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
+from repositories import get_all_books
+from routes.streaming import stream_page
 from services.library_service import add_book_to_catalog
 
 catalog_bp = Blueprint('catalog', __name__)
@@ -18,9 +19,10 @@ def catalog():
     """
     Display all books in the catalog.
     Implements R2: Book Catalog Display
+    Streamed, since the page has a row per book.
     """
     books = get_all_books()
-    return render_template('catalog.html', books=books)
+    return stream_page('catalog.html', books=books)
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
@@ -0,0 +1,31 @@
+"""
+Debug Routes - Database statement timings and slow query plans
+"""
+
+from flask import Blueprint, request
+from routes.api_response import json_response
+from services.query_stats import query_stats
+
+debug_bp = Blueprint('debug', __name__, url_prefix='/debug')
+
+
+@debug_bp.route('/queries', methods=['GET'])
+def query_report():
+    """
+    Statements by total time (count, mean/max/percentile ms, histogram) and
+    the most recent slow ones with their query plans. ``?top=N`` limits the
+    statements listed. 404 unless LIBRARY_QUERY_STATS enabled the timing.
+    """
+    if not query_stats.enabled:
+        return json_response({'error': 'Query statistics are not enabled (set LIBRARY_QUERY_STATS=1).'}, 404)
+    top = request.args.get('top', type=int)
+    return json_response(query_stats.report(top))
+
+
+@debug_bp.route('/queries', methods=['DELETE'])
+def reset_query_report():
+    """Start the statistics over."""
+    if not query_stats.enabled:
+        return json_response({'error': 'Query statistics are not enabled (set LIBRARY_QUERY_STATS=1).'}, 404)
+    query_stats.reset()
+    return json_response({'reset': True})
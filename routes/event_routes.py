@@ -0,0 +1,65 @@
+"""
+Event Routes - Live availability changes as server-sent events
+"""
+
+from typing import Iterator, Optional
+
+from flask import Blueprint, Response, request
+from routes.api_response import json_response
+from services.event_bus import format_event, live_events
+
+events_bp = Blueprint('events', __name__, url_prefix='/api')
+
+# Milliseconds a disconnected browser waits before reconnecting
+RECONNECT_MILLISECONDS = 3000
+
+
+def _last_event_id() -> Optional[int]:
+    """Position a reconnecting client has seen up to (EventSource sends Last-Event-ID)."""
+    value = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+@events_bp.route('/events')
+def stream_events():
+    """
+    Stream availability changes and new books as they happen.
+
+    Events: ``availability`` {book_id, available_copies, total_copies},
+    ``book_added`` {book_id, title, author, isbn, ...}, and ``resync`` when
+    the client fell behind and should reload the catalog. Idle streams get
+    a comment line every 15 s.
+    """
+    subscription = live_events.subscribe(_last_event_id())
+    if subscription is None:
+        response = json_response({'error': 'Too many event streams, try again shortly.'}, 503)
+        response.headers['Retry-After'] = '5'
+        return response
+
+    def stream() -> Iterator[str]:
+        yield f'retry: {RECONNECT_MILLISECONDS}\n\n'
+        while True:
+            batch = subscription.next_batch()
+            if batch is None:
+                yield format_event('resync', {'reason': 'Missed events; reload the catalog.'},
+                                   subscription.cursor)
+            elif not batch:
+                yield ': keepalive\n\n'
+            else:
+                yield ''.join(event['text'] for event in batch)
+
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # The server closes the response when the client goes away, even before
+    # the first chunk (a generator that never started skips its finally)
+    response.call_on_close(subscription.close)
+    return response
+
+
+@events_bp.route('/events/metrics')
+def event_metrics():
+    """Connected streams and published/delivered/coalesced event counts."""
+    return json_response(live_events.snapshot())
@@ -0,0 +1,166 @@
+"""
+Job Routes - Queue slow payment gateway work and poll its status
+"""
+
+from flask import Blueprint, current_app, request, url_for
+from routes.api_response import json_response
+from services.library_service import validate_refund
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+MAX_REFUND_BATCH = 10000
+
+
+def _queue():
+    return current_app.extensions['job_queue']
+
+
+def _accepted(job_id: int):
+    """202 response pointing at the job's status URL."""
+    status_url = url_for('jobs.get_job', job_id=job_id)
+    response = json_response({'job_id': job_id, 'status': 'queued', 'status_url': status_url}, 202)
+    response.headers['Location'] = status_url
+    return response
+
+
+def _body():
+    """The request's JSON object or form fields; None for a JSON body that is not an object."""
+    data = request.get_json(silent=True)
+    if data is None:
+        return request.form
+    return data if isinstance(data, dict) else None
+
+
+def _not_an_object():
+    return json_response({'error': 'Expected a JSON object.'}, 400)
+
+
+def _patron_id(data) -> str:
+    patron_id = str(data.get('patron_id', '')).strip()
+    if not patron_id.isdigit() or len(patron_id) != 6:
+        raise ValueError('Invalid patron ID. Must be exactly 6 digits.')
+    return patron_id
+
+
+def _transaction_id(data) -> str:
+    transaction_id = str(data.get('transaction_id', '')).strip()
+    if not transaction_id.startswith('txn_'):
+        raise ValueError('Invalid transaction ID.')
+    return transaction_id
+
+
+def _number(data, field: str, cast, message: str):
+    try:
+        value = cast(data.get(field, ''))
+    except (ValueError, TypeError):
+        raise ValueError(message)
+    if value <= 0:
+        raise ValueError(message)
+    return value
+
+
+@jobs_bp.route('/payments', methods=['POST'])
+def enqueue_payment():
+    """Queue a late fee payment. Body (JSON or form): ``patron_id`` and ``book_id``."""
+    data = _body()
+    if data is None:
+        return _not_an_object()
+    try:
+        payload = {'patron_id': _patron_id(data), 'book_id': _number(data, 'book_id', int, 'Invalid book ID.')}
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+    return _accepted(_queue().enqueue('pay_late_fees', payload))
+
+
+@jobs_bp.route('/refunds', methods=['POST'])
+def enqueue_refund():
+    """Queue a refund. Body: ``transaction_id``, ``amount`` and optionally ``patron_id``."""
+    data = _body()
+    if data is None:
+        return _not_an_object()
+    try:
+        payload = {'transaction_id': _transaction_id(data),
+                   'amount': _number(data, 'amount', float, 'Refund amount must be greater than 0.')}
+        if data.get('patron_id'):
+            payload['patron_id'] = _patron_id(data)
+        error = validate_refund(payload['transaction_id'], payload['amount'], payload.get('patron_id'))
+        if error:
+            raise ValueError(error)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+    return _accepted(_queue().enqueue('refund', payload))
+
+
+@jobs_bp.route('/refund-batches', methods=['POST'])
+def enqueue_refund_batch():
+    """
+    Queue many refunds at once. Body: ``{"refunds": [{transaction_id, amount, patron_id?}, ...]}``.
+
+    Every refund is validated first; if any is invalid nothing is queued and
+    the errors are returned by position. Otherwise one refund job per entry is
+    queued in a single transaction, for the workers to run concurrently.
+    """
+    data = request.get_json(silent=True)
+    refunds = data.get('refunds') if isinstance(data, dict) else None
+    if not isinstance(refunds, list) or not refunds:
+        return json_response({'error': 'Expected a non-empty "refunds" list.'}, 400)
+    if len(refunds) > MAX_REFUND_BATCH:
+        return json_response({'error': f'At most {MAX_REFUND_BATCH} refunds per batch.'}, 400)
+
+    payloads, errors, seen = [], [], set()
+    for index, data in enumerate(refunds):
+        try:
+            if not isinstance(data, dict):
+                raise ValueError('Expected an object.')
+            payload = {'transaction_id': _transaction_id(data),
+                       'amount': _number(data, 'amount', float, 'Refund amount must be greater than 0.')}
+            if data.get('patron_id'):
+                payload['patron_id'] = _patron_id(data)
+            error = validate_refund(payload['transaction_id'], payload['amount'], payload.get('patron_id'))
+            if error:
+                raise ValueError(error)
+            if payload['transaction_id'] in seen:
+                raise ValueError('Duplicate transaction ID in batch.')
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+            continue
+        seen.add(payload['transaction_id'])
+        payloads.append(payload)
+    if errors:
+        return json_response({'error': 'Invalid refunds; nothing was queued.', 'errors': errors}, 400)
+
+    job_ids = _queue().enqueue_many('refund', payloads)
+    return json_response({'job_ids': job_ids, 'status': 'queued',
+                          'metrics_url': url_for('jobs.job_metrics')}, 202)
+
+
+@jobs_bp.route('/verifications', methods=['POST'])
+def enqueue_verification():
+    """Queue a payment status check. Body: ``transaction_id``."""
+    data = _body()
+    if data is None:
+        return _not_an_object()
+    try:
+        payload = {'transaction_id': _transaction_id(data)}
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+    return _accepted(_queue().enqueue('verify_payment', payload))
+
+
+@jobs_bp.route('/<int:job_id>')
+def get_job(job_id):
+    """A job's status, attempts and (once done) result."""
+    job = _queue().get(job_id)
+    if job is None:
+        return json_response({'error': 'Job not found'}, 404)
+    return json_response(job)
+
+
+@jobs_bp.route('/metrics')
+def job_metrics():
+    """Jobs by status and recent throughput/latency (``window`` seconds, default 60)."""
+    try:
+        window = float(request.args.get('window', 60))
+    except ValueError:
+        return json_response({'error': 'Invalid window.'}, 400)
+    return json_response(_queue().metrics(max(window, 1.0)))
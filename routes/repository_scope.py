@@ -0,0 +1,26 @@
+"""
+Repository Scope - Routes each request to its app's storage backend
+
+Several apps with different repositories (e.g. an in-memory one per test)
+can live in one process; each request only sees the repository of the app
+handling it.
+"""
+
+from flask import g
+from repositories import _current_repository
+
+
+def register_repository(app, repository):
+    """Install the app's repository for the duration of every request."""
+
+    def select_repository():
+        g.repository_token = _current_repository.set(repository)
+
+    def reset_repository(exc=None):
+        token = g.pop('repository_token', None)
+        if token is not None:
+            _current_repository.reset(token)
+
+    app.extensions['repository'] = repository
+    app.before_request(select_repository)
+    app.teardown_request(reset_repository)
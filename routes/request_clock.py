@@ -0,0 +1,28 @@
+"""
+Request Clock - Pins one "as-of" time for each request
+
+Late fees and due dates computed while handling a request all use the time
+the request started, so they cannot drift apart within a response.
+"""
+
+from flask import g
+from services.fee_policy import _as_of
+from datetime import datetime
+
+
+def pin_request_clock():
+    """Pin current_time() to the start of this request."""
+    g.clock_token = _as_of.set(datetime.now())
+
+
+def reset_request_clock(exc=None):
+    """Release the time pinned for the request."""
+    token = g.pop('clock_token', None)
+    if token is not None:
+        _as_of.reset(token)
+
+
+def register_request_clock(app):
+    """Install the request clock on the Flask app."""
+    app.before_request(pin_request_clock)
+    app.teardown_request(reset_request_clock)
@@ -2,7 +2,8 @@
 Borrowing Routes - Book borrowing and returning endpoints
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, request
+from routes.streaming import stream_page
 from services.library_service import get_patron_status_report
 
 status_bp = Blueprint('status', __name__)
@@ -14,7 +15,8 @@ def patron_status():
     Web interface for R7: Patron Status Report
     """
     patron_id = request.args.get('patron_id', '').strip()
+    history_cursor = request.args.get('history_cursor')
     
-    status = get_patron_status_report(patron_id)
+    status = get_patron_status_report(patron_id, history_cursor)
 
-    return render_template('patron_status.html', patron_id=patron_id, status=status)
\ No newline at end of file
+    return stream_page('patron_status.html', patron_id=patron_id, status=status)
\ No newline at end of file
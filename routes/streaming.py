@@ -0,0 +1,89 @@
+"""
+Streaming - Pages rendered and sent a chunk at a time from precompiled templates
+
+render_template builds the whole page as one string before the first byte
+goes out; for the catalog that is every book's row. stream_page sends the
+page as the template produces it instead, in chunks of STREAM_BUFFER
+template output pieces, so the browser starts drawing at once and the page
+never exists in memory whole.
+
+register_templates loads every template when the app is created rather
+than on the first request that uses it. Compiled bytecode is kept for the
+process (apps created later skip compiling) or in a directory shared by
+worker processes and restarts.
+"""
+
+import os
+from typing import Dict, Iterator, Optional
+
+from flask import Response, current_app, get_flashed_messages, request
+from flask.globals import request_ctx
+from jinja2 import BytecodeCache, FileSystemBytecodeCache
+
+# Template output pieces (text runs and {{ }} values) joined into each chunk sent
+STREAM_BUFFER = 500
+
+
+def stream_page(template_name: str, **context) -> Response:
+    """
+    Render a template as a streamed response.
+
+    As with /api/events, the request itself finishes (its teardown hooks run
+    and its admission slot is freed) once the response starts; the template
+    is rendered in a request context of its own for url_for and friends.
+    Flashed messages are taken from the session now, while the response can
+    still update the session cookie, and handed to that context.
+    """
+    app = current_app._get_current_object()
+    environ = request.environ
+    get_flashed_messages()
+    flashes = request_ctx.flashes
+    template = app.jinja_env.get_template(template_name)
+    app.update_template_context(context)
+
+    def generate() -> Iterator[str]:
+        with app.request_context(environ) as ctx:
+            ctx.flashes = flashes
+            stream = template.stream(context)
+            stream.enable_buffering(STREAM_BUFFER)
+            yield from stream
+
+    return Response(generate(), mimetype='text/html')
+
+
+class MemoryBytecodeCache(BytecodeCache):
+    """Compiled templates kept for the life of the process, shared by every app in it."""
+
+    def __init__(self):
+        self._code: Dict[str, bytes] = {}
+
+    def load_bytecode(self, bucket) -> None:
+        code = self._code.get(bucket.key)
+        if code is not None:
+            bucket.bytecode_from_string(code)
+
+    def dump_bytecode(self, bucket) -> None:
+        self._code[bucket.key] = bucket.bytecode_to_string()
+
+
+_process_bytecode = MemoryBytecodeCache()
+
+
+def register_templates(app, cache_dir: Optional[str] = None) -> int:
+    """
+    Compile every template up front, through a bytecode cache in `cache_dir`
+    (defaults to LIBRARY_TEMPLATE_CACHE, else one kept in memory for the process).
+
+    Returns:
+        int: Number of templates loaded
+    """
+    cache_dir = cache_dir or os.environ.get('LIBRARY_TEMPLATE_CACHE')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    else:
+        app.jinja_env.bytecode_cache = _process_bytecode
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
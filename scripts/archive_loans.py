@@ -0,0 +1,31 @@
+"""
+Loan archiver - moves loans returned long ago out of borrow_records.
+
+Usage:
+    python scripts/archive_loans.py [--days 365] [--batch-size 1000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import archive_returned_loans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=365, help='archive loans returned more than this many days ago')
+    parser.add_argument('--batch-size', type=int, default=1000, help='loans moved per transaction')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    archived = archive_returned_loans(args.days, args.batch_size)
+    print(f'Archived {archived} loan(s) in {time.perf_counter() - start:.2f} s.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Batch refunds - validate a file of refunds, then issue them concurrently.
+
+The input is CSV (header: transaction_id,amount[,patron_id]) or JSON Lines
+with the same fields. Progress is kept in a SQLite file; if the run is
+interrupted, run the same command again to resume where it stopped.
+
+Usage:
+    python scripts/batch_refunds.py refunds.csv [--progress refunds.csv.progress.db] [--concurrency 16]
+                                    [--retry-failed] [--retry-sent] [--report results.csv]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.batch_refunds import (DEFAULT_CONCURRENCY, REFUND_INVALID, REFUND_SENT, RefundBatch,
+                                    run_refund_batch)
+
+
+def read_refunds(path):
+    """Refund dicts from a CSV or JSON Lines file."""
+    with open(path, newline='') as f:
+        if path.endswith(('.jsonl', '.json')):
+            return [json.loads(line) for line in f if line.strip()]
+        return list(csv.DictReader(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('refunds', help='CSV or .jsonl file of refunds')
+    parser.add_argument('--progress', help='progress file (default: <refunds>.progress.db)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='refunds sent to the gateway at once')
+    parser.add_argument('--retry-failed', action='store_true', help='resend refunds the gateway declined')
+    parser.add_argument('--retry-sent', action='store_true',
+                        help='resend refunds whose answer was lost when a run was interrupted '
+                             '(check first that they were not refunded)')
+    parser.add_argument('--report', help='write every refund with its status to this CSV file')
+    parser.add_argument('--quiet', action='store_true', help='only print the summary')
+    args = parser.parse_args()
+
+    batch = RefundBatch(args.progress or args.refunds + '.progress.db')
+    try:
+        if len(batch):
+            print(f'Resuming {batch.path}: {batch.counts()}')
+        else:
+            counts = batch.load(read_refunds(args.refunds))
+            print(f"{counts['pending']} valid refund(s), {counts['invalid']} rejected")
+            for refund in batch.results(REFUND_INVALID):
+                print(f"  invalid  {refund['transaction_id'] or '-'}: {refund['message']}")
+
+        def show(result):
+            if not args.quiet:
+                outcome = 'ok    ' if result['success'] else 'FAILED'
+                print(f"  {outcome} {result['transaction_id']} ${result['amount']:.2f}: {result['message']}")
+
+        summary = run_refund_batch(batch, concurrency=args.concurrency, retry_failed=args.retry_failed,
+                                   retry_sent=args.retry_sent, on_result=show)
+        print(f"{summary['sent']} refund(s) sent in {summary['seconds']} s "
+              f"({summary['refunds_per_second']} refunds/s): {summary['succeeded']} succeeded, "
+              f"{summary['failed']} failed")
+        print(f"Batch totals: {summary['batch']}")
+        if summary['batch'][REFUND_SENT]:
+            print(f"{summary['batch'][REFUND_SENT]} refund(s) have an unknown outcome from an interrupted run; "
+                  f"check them with the gateway, then rerun with --retry-sent if they were not refunded.")
+
+        if args.report:
+            results = batch.results()
+            with open(args.report, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(results[0]) if results else ['transaction_id'])
+                writer.writeheader()
+                writer.writerows(results)
+        return 0 if summary['failed'] == 0 and not summary['batch'][REFUND_INVALID] else 1
+    finally:
+        batch.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
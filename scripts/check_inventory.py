@@ -0,0 +1,37 @@
+"""
+Inventory drift checker - compares books.total_copies/available_copies
+with the copy rows they aggregate.
+
+Usage:
+    python scripts/check_inventory.py [--repair]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import check_inventory_drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repair', action='store_true', help='recompute drifted counters from copy rows')
+    args = parser.parse_args()
+
+    drifted = check_inventory_drift(repair=args.repair)
+    for row in drifted:
+        print(f"book {row['book_id']} ({row['title']}): "
+              f"counters {row['available_copies']}/{row['total_copies']}, "
+              f"copies {row['copy_available']}/{row['copy_total']}")
+
+    if not drifted:
+        print('No drift found.')
+    elif args.repair:
+        print(f'Repaired {len(drifted)} book(s).')
+    return 1 if drifted and not args.repair else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Job worker - runs queued payments, refunds and payment checks until stopped.
+
+Branch shards and fee policies come from LIBRARY_BRANCH_DATABASES and
+LIBRARY_FEE_POLICIES, as for the app.
+
+Also queues a circulation rollup every --rollup-interval seconds, so the
+/api/stats reports stay current without writing themselves.
+
+Usage:
+    python scripts/job_worker.py [--queue jobs.db] [--threads 8] [--poll 0.5] [--rollup-interval 60]
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import configure_from_env
+from services.job_queue import JobQueue, start_workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--queue', default=os.environ.get('LIBRARY_JOB_DB', 'jobs.db'),
+                        help='job queue file (default: LIBRARY_JOB_DB or jobs.db)')
+    parser.add_argument('--threads', type=int, default=8, help='jobs run at the same time')
+    parser.add_argument('--poll', type=float, default=0.5, help='seconds between polls of an empty queue')
+    parser.add_argument('--rollup-interval', type=float, default=60,
+                        help='seconds between circulation rollups (0 to leave them to cron)')
+    args = parser.parse_args()
+
+    configure_from_env()
+    queue = JobQueue(args.queue)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    workers = start_workers(queue, args.threads, stop, poll_interval=args.poll)
+    print(f'{len(workers)} worker(s) on {args.queue}; Ctrl-C to stop.')
+
+    report_at = rollup_at = time.monotonic()
+    try:
+        while not stop.wait(1):
+            now = time.monotonic()
+            if args.rollup_interval > 0 and now >= rollup_at:
+                queue.enqueue('rollup_stats', {}, max_attempts=1)
+                rollup_at = now + args.rollup_interval
+            if now >= report_at + 60:
+                metrics = queue.metrics()
+                print(f"{metrics['jobs']} - {metrics['jobs_per_second']} jobs/s, "
+                      f"avg latency {metrics['avg_latency_seconds']} s")
+                report_at = now
+    except KeyboardInterrupt:
+        stop.set()
+    for worker in workers:
+        worker.join()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
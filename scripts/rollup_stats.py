@@ -0,0 +1,39 @@
+"""
+Circulation rollup - folds new loan events into the daily_book_stats table.
+
+Every branch shard in LIBRARY_BRANCH_DATABASES is rolled up, as by the
+rollup_stats job.
+
+Reports only read the rollups; run this from cron if scripts/job_worker.py
+is not queuing rollups (--rollup-interval 0), or to catch up a large backlog.
+
+Usage:
+    python scripts/rollup_stats.py [--batch-size 100000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import configure_from_env
+from database import fan_out, rollup_loan_events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=100000, help='events folded per transaction')
+    args = parser.parse_args()
+
+    configure_from_env()
+    start = time.perf_counter()
+    for branch, processed in fan_out(rollup_loan_events, args.batch_size):
+        print(f'{branch}: rolled up {processed} event(s).')
+    print(f'Done in {time.perf_counter() - start:.2f} s.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
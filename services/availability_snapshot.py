@@ -0,0 +1,326 @@
+"""
+Availability Snapshot Module - Book availability in a memory-mapped file shared by workers
+
+Every worker process maps the same file: a small header and one 16-byte slot
+per book ID holding (available, total) and the catalog version they were
+read at. Borrows, returns and released holds write their new counters into
+the file (an availability listener), so catalog and search pages read
+availability from memory instead of querying `books` in every worker.
+
+Staleness is detected with the database's catalog_version counter, which
+every change to books or their counters bumps. The header records the
+version the snapshot is complete up to; it only advances when a write is
+the very next version, so a change the snapshot missed (another tool, a
+bulk update, a new book) leaves it behind. At most every `check_interval`
+seconds a reader compares it with the database and rebuilds the file on a
+mismatch; until a rebuild succeeds, callers fall back to the database.
+
+Writers serialize on an flock()ed lock file; readers never take it and retry
+a read that overlapped a write (a sequence counter, odd while writing).
+A rebuild writes a new file and renames it into place, and every process
+remaps when it notices the file was replaced.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:  # POSIX file locks; elsewhere only threads of one process are serialized
+    import fcntl
+except ImportError:  # pragma: no cover - depends on the platform
+    fcntl = None
+
+import database
+from database import get_versioned_book_counts, get_catalog_version, is_default_shard
+
+MAGIC = b'AVS1'
+# magic, sequence (odd while a write is in progress), complete-up-to version, slots, highest book ID
+HEADER = struct.Struct('<4sQQII')
+HEADER_SIZE = 32
+SLOT_SIZE = 16  # (available | total << 32, version) as two unsigned 64-bit integers
+COUNT_MASK = 0xFFFFFFFF
+
+DEFAULT_CHECK_INTERVAL = 1.0
+
+
+class AvailabilitySnapshot:
+    """Book ID -> (available, total) in a memory-mapped file; unopened, it is disabled."""
+
+    def __init__(self, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.path: Optional[str] = None
+        self._lock = threading.RLock()
+        self._mm: Optional[mmap.mmap] = None
+        self._slots: Optional[memoryview] = None
+        self._inode = None
+        self._lock_file = None
+        self._checked = 0.0
+        # Book columns other than the counters, which only change when books are added
+        self._books: Dict[int, Dict] = {}
+        self._by_title: List[Dict] = []
+        self._books_high = -1
+        self.metrics = {'hits': 0, 'fallbacks': 0, 'rebuilds': 0, 'updates': 0, 'skipped': 0}
+
+    # Setup
+
+    def open(self, path: str) -> None:
+        """Map the snapshot file at `path`, building it from the database if needed."""
+        self.close()
+        with self._lock:
+            self.path = path
+            if not os.path.exists(path) or not self._map():
+                self.rebuild()
+            self._checked = 0.0
+
+    def close(self) -> None:
+        """Unmap the file; the snapshot is disabled until opened again."""
+        with self._lock:
+            self._unmap()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            self.path = None
+            self._books, self._by_title, self._books_high = {}, [], -1
+
+    @property
+    def enabled(self) -> bool:
+        return self._mm is not None
+
+    def _map(self) -> bool:
+        """Map the current file at self.path; False if it is missing or not a snapshot."""
+        self._unmap()
+        try:
+            with open(self.path, 'r+b') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < HEADER_SIZE:
+                    return False
+                mm = mmap.mmap(f.fileno(), size)
+                self._inode = os.fstat(f.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+        if HEADER.unpack_from(mm)[0] != MAGIC:
+            mm.close()
+            return False
+        self._mm = mm
+        self._slots = memoryview(mm)[HEADER_SIZE:].cast('Q')
+        self._books_high = -1  # Rebuilt, perhaps after books were deleted: reload their columns
+        return True
+
+    def _unmap(self) -> None:
+        if self._mm is not None:
+            self._slots.release()
+            self._mm.close()
+        self._mm = self._slots = self._inode = None
+
+    def _remap_if_replaced(self) -> bool:
+        """Follow a rebuild by another process (the file was renamed over); False if unusable."""
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return False
+        return inode == self._inode or self._map()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive lock shared by every process writing the snapshot (hold self._lock)."""
+        if self._lock_file is None:
+            self._lock_file = open(self.path + '.lock', 'a+b')
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    # Header and slots
+
+    def _header(self) -> Tuple[int, int, int, int]:
+        """(sequence, version, slots, highest book ID)."""
+        return HEADER.unpack_from(self._mm)[1:]
+
+    def _set_header(self, seq: int, version: int, slots: int, high: int) -> None:
+        HEADER.pack_into(self._mm, 0, MAGIC, seq, version, slots, high)
+
+    def _copy(self) -> Optional[memoryview]:
+        """
+        Consistent copy of every slot up to the highest book ID (as 64-bit
+        integers), retrying reads that overlap a write.
+        """
+        with self._lock:
+            for _ in range(100):
+                seq, _, slots, high = self._header()
+                if seq % 2 == 0:
+                    data = self._mm[HEADER_SIZE:HEADER_SIZE + min(high + 1, slots) * SLOT_SIZE]
+                    if self._header()[0] == seq:
+                        return memoryview(data).cast('Q')
+                time.sleep(0)
+        return None
+
+    def _read(self, book_ids: List[int]) -> Optional[Dict[int, Tuple[int, int]]]:
+        """
+        {book_id: (available, total)} for a few books; books without a slot
+        are left out. None if every attempt overlapped a write.
+        """
+        with self._lock:
+            for _ in range(100):
+                seq, _, slots, _ = self._header()
+                if seq % 2 == 0:
+                    counts = {}
+                    for book_id in book_ids:
+                        if 0 < book_id < slots and self._slots[2 * book_id + 1]:
+                            packed = self._slots[2 * book_id]
+                            counts[book_id] = (packed & COUNT_MASK, packed >> 32)
+                    if self._header()[0] == seq:
+                        return counts
+                time.sleep(0)
+        return None
+
+    # Writes
+
+    def rebuild(self) -> bool:
+        """Write a fresh snapshot of every book's counters and rename it into place."""
+        with self._lock:
+            if self.path is None or not is_default_shard():
+                return False
+            with self._file_lock():
+                version, counts = get_versioned_book_counts()
+                high = max(counts, default=0)
+                slots = max(1024, high + high // 2 + 1)  # room to add books before the next rebuild
+                data = bytearray(HEADER_SIZE + slots * SLOT_SIZE)
+                HEADER.pack_into(data, 0, MAGIC, 0, version, slots, high)
+                view = memoryview(data)[HEADER_SIZE:].cast('Q')
+                for book_id, (total, available) in counts.items():
+                    view[2 * book_id] = available | total << 32
+                    view[2 * book_id + 1] = version
+                view.release()
+                temp = f'{self.path}.{os.getpid()}.tmp'
+                with open(temp, 'wb') as f:
+                    f.write(data)
+                os.replace(temp, self.path)
+                self._map()
+                self.metrics['rebuilds'] += 1
+                return True
+
+    def update(self, book: Dict) -> None:
+        """
+        Availability listener: store a book's new counters, read at catalog
+        version book['version'], unless the slot already holds a newer read.
+        """
+        version = book.get('version')
+        with self._lock:
+            if self._mm is None or version is None:
+                return
+            with self._file_lock():
+                if not self._remap_if_replaced():
+                    return  # Being rebuilt; the rebuild reads the database after this change
+                seq, complete, slots, high = self._header()
+                book_id = book['id']
+                if book_id >= slots:
+                    self.metrics['skipped'] += 1  # No room; the next check rebuilds a bigger file
+                    return
+                self._set_header(seq + 1, complete, slots, high)
+                if version > self._slots[2 * book_id + 1]:
+                    self._slots[2 * book_id] = book['available_copies'] | book['total_copies'] << 32
+                    self._slots[2 * book_id + 1] = version
+                if version == complete + 1:
+                    complete = version
+                else:
+                    self.metrics['skipped'] += 1  # Missed a change; the next check rebuilds
+                self._set_header(seq + 2, complete, slots, max(high, book_id))
+                self.metrics['updates'] += 1
+
+    # Reads
+
+    def _fresh(self) -> bool:
+        """True if the snapshot may be used, checking it against the database when due."""
+        if self._mm is None or not is_default_shard():
+            return False
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return True
+        with self._lock:
+            if self._mm is None:
+                return False
+            if not self._remap_if_replaced() or self._header()[1] != get_catalog_version():
+                if not self.rebuild():
+                    return False
+            self._checked = now
+            return True
+
+    def book_added(self, book: Dict) -> None:
+        """Book insert listener: check against the database on the next read, which adds the book."""
+        self._checked = 0.0
+
+    def counts(self, book_id: int) -> Optional[Tuple[int, int]]:
+        """(available, total) for a book, or None if the snapshot cannot answer."""
+        counts = self._read([book_id]) if self._fresh() else None
+        return counts.get(book_id) if counts else None
+
+    def _load_books(self, high: int) -> None:
+        """Reload the rarely changing book columns once a new book appears."""
+        books = database.get_all_books()
+        with self._lock:
+            self._books = {book['id']: book for book in books}
+            self._by_title = books
+            self._books_high = high
+
+    def _highest_book_id(self) -> int:
+        with self._lock:
+            return self._header()[3]
+
+    def all_books(self) -> Optional[List[Dict]]:
+        """Every book ordered by title with snapshot availability, or None to use the database."""
+        slots = self._copy() if self._fresh() else None
+        books = None
+        if slots is not None:
+            high = len(slots) // 2 - 1
+            if high != self._books_high:
+                self._load_books(high)
+            books = []
+            for book in self._by_title:
+                book_id = book['id']
+                if book_id > high or not slots[2 * book_id + 1]:
+                    books = None  # Not in the snapshot yet
+                    break
+                packed = slots[2 * book_id]
+                books.append(dict(book, total_copies=packed >> 32, available_copies=packed & COUNT_MASK))
+        self.metrics['hits' if books is not None else 'fallbacks'] += 1
+        return books
+
+    def books_by_ids(self, book_ids: List[int]) -> Optional[List[Dict]]:
+        """Books by ID (in the given order, unknown IDs skipped), or None to use the database."""
+        counts = self._read(book_ids) if self._fresh() else None
+        books = None
+        if counts is not None:
+            if self._highest_book_id() != self._books_high:
+                self._load_books(self._highest_book_id())
+            books = []
+            for book_id in book_ids:
+                book = self._books.get(book_id)
+                if book is None:
+                    continue
+                if book_id not in counts:
+                    books = None
+                    break
+                available, total = counts[book_id]
+                books.append(dict(book, total_copies=total, available_copies=available))
+        self.metrics['hits' if books is not None else 'fallbacks'] += 1
+        return books
+
+    def snapshot(self) -> Dict:
+        """File, versions and hit/fallback/rebuild counters."""
+        with self._lock:
+            if self._mm is None:
+                return dict(self.metrics, enabled=False)
+            _, version, slots, high = self._header()
+            return dict(self.metrics, enabled=True, path=self.path, version=version, slots=slots,
+                        highest_book_id=high)
+
+
+availability_snapshot = AvailabilitySnapshot()
@@ -0,0 +1,223 @@
+"""
+Batch Refunds Module - Issue many refunds concurrently, resumably
+
+Each refund spends ~0.5 s waiting on PaymentGateway.refund_payment, so
+thousands of them one after another take hours. A batch validates every
+refund up front, then sends the valid ones through a bounded thread pool,
+recording each outcome in a SQLite progress file as it arrives.
+
+Running a batch again with the same progress file resumes it: refunds that
+already succeeded, failed or were rejected are not sent again. A refund that
+was handed to the gateway but whose answer was never recorded (the process
+died mid-call) is left as 'sent' and reported as unknown, because the
+gateway has no idempotency keys; pass ``retry_sent=True`` once it has been
+checked that those refunds did not go through.
+"""
+
+import contextvars
+import math
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+from services.payment_service import PaymentGateway
+from services.library_service import refund_late_fee_payment, validate_refund
+
+# Refund statuses
+REFUND_PENDING = 'pending'      # validated, not yet sent
+REFUND_SENT = 'sent'            # handed to the gateway, answer not recorded yet
+REFUND_SUCCEEDED = 'succeeded'
+REFUND_FAILED = 'failed'        # the gateway declined or raised
+REFUND_INVALID = 'invalid'      # rejected by validation, never sent
+
+REFUND_STATUSES = (REFUND_PENDING, REFUND_SENT, REFUND_SUCCEEDED, REFUND_FAILED, REFUND_INVALID)
+
+DEFAULT_CONCURRENCY = 16
+
+
+class RefundBatch:
+    """The refunds of one batch and their progress, in a SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS refunds (
+                seq INTEGER PRIMARY KEY,
+                transaction_id TEXT NOT NULL,
+                amount REAL NOT NULL,
+                patron_id TEXT,
+                status TEXT NOT NULL,
+                message TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                finished_at REAL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_refunds_status ON refunds (status, seq)')
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM refunds').fetchone()[0]
+
+    def load(self, refunds: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Validate refunds and add them to the batch, all in one transaction.
+
+        Each refund is a dict with ``transaction_id``, ``amount`` and optionally
+        ``patron_id``. Refunds that fail validation, or repeat a transaction ID,
+        are stored as invalid with the reason instead of being sent.
+
+        Returns:
+            Dict: {'pending': valid refunds, 'invalid': rejected refunds}
+
+        Raises:
+            ValueError: If the batch already holds refunds
+        """
+        if len(self):
+            raise ValueError(f"Batch {self.path} is already loaded; run it again to resume")
+        counts = {REFUND_PENDING: 0, REFUND_INVALID: 0}
+        seen = set()
+        rows = []
+        for refund in refunds:
+            transaction_id = str(refund.get('transaction_id') or '').strip()
+            patron_id = str(refund.get('patron_id') or '').strip() or None
+            try:
+                amount = float(refund.get('amount'))
+            except (TypeError, ValueError):
+                amount, error = 0.0, "Invalid refund amount."
+            else:
+                error = validate_refund(transaction_id, amount, patron_id)
+                if not math.isfinite(amount):
+                    amount = 0.0  # SQLite would store NaN as NULL
+            if error is None and transaction_id in seen:
+                error = "Duplicate transaction ID in batch."
+            seen.add(transaction_id)
+            status = REFUND_INVALID if error else REFUND_PENDING
+            counts[status] += 1
+            rows.append((transaction_id, amount, patron_id, status, error))
+
+        self.conn.execute('BEGIN')
+        self.conn.executemany('''
+            INSERT INTO refunds (transaction_id, amount, patron_id, status, message) VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        self.conn.execute('COMMIT')
+        return counts
+
+    def due(self, retry_failed: bool = False, retry_sent: bool = False) -> List[Dict]:
+        """Refunds still to send, in load order."""
+        statuses = [REFUND_PENDING]
+        if retry_failed:
+            statuses.append(REFUND_FAILED)
+        if retry_sent:
+            statuses.append(REFUND_SENT)
+        rows = self.conn.execute(f'''
+            SELECT seq, transaction_id, amount, patron_id FROM refunds
+            WHERE status IN ({', '.join('?' * len(statuses))}) ORDER BY seq
+        ''', statuses).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_sent(self, seqs: List[int]) -> None:
+        """Record that refunds are about to be handed to the gateway."""
+        self.conn.execute('BEGIN')
+        self.conn.executemany('UPDATE refunds SET status = ?, attempts = attempts + 1 WHERE seq = ?',
+                              [(REFUND_SENT, seq) for seq in seqs])
+        self.conn.execute('COMMIT')
+
+    def record(self, seq: int, success: bool, message: str, now: Optional[float] = None) -> None:
+        """Record the gateway's answer for one refund."""
+        self.conn.execute('UPDATE refunds SET status = ?, message = ?, finished_at = ? WHERE seq = ?',
+                          (REFUND_SUCCEEDED if success else REFUND_FAILED, message,
+                           time.time() if now is None else now, seq))
+
+    def counts(self) -> Dict[str, int]:
+        """Refunds by status."""
+        counts = {status: 0 for status in REFUND_STATUSES}
+        for row in self.conn.execute('SELECT status, COUNT(*) AS count FROM refunds GROUP BY status'):
+            counts[row['status']] = row['count']
+        return counts
+
+    def results(self, status: Optional[str] = None) -> List[Dict]:
+        """Every refund (or those with one status) with its status and message, in load order."""
+        query = 'SELECT transaction_id, amount, patron_id, status, message, attempts FROM refunds'
+        params = ()
+        if status is not None:
+            query += ' WHERE status = ?'
+            params = (status,)
+        return [dict(row) for row in self.conn.execute(query + ' ORDER BY seq', params)]
+
+
+def run_refund_batch(batch: RefundBatch, gateway=None, concurrency: int = DEFAULT_CONCURRENCY,
+                     retry_failed: bool = False, retry_sent: bool = False,
+                     on_result: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Send a batch's due refunds through a pool of `concurrency` threads.
+
+    At most `concurrency` refunds are with the gateway at once. Only this
+    thread writes the progress file, so every answer is committed before the
+    next refund is sent in its place.
+
+    Args:
+        batch: Loaded batch to run (or resume)
+        gateway: Payment gateway shared by the threads (default: PaymentGateway())
+        concurrency: Refunds in flight at once
+        retry_failed: Also resend refunds the gateway declined last time
+        retry_sent: Also resend refunds whose answer was lost in a crash
+        on_result: Called with each refund's outcome as it is recorded
+
+    Returns:
+        Dict: refunds sent in this run, their outcomes, seconds, refunds_per_second,
+              and the batch's counts by status
+    """
+    gateway = gateway or PaymentGateway()
+    concurrency = max(1, concurrency)
+    due = batch.due(retry_failed, retry_sent)
+    sent = succeeded = 0
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='refund') as pool:
+        queued = iter(due)
+        in_flight = {}
+
+        def top_up():
+            refills = []
+            while len(in_flight) + len(refills) < concurrency:
+                refund = next(queued, None)
+                if refund is None:
+                    break
+                refills.append(refund)
+            if refills:
+                batch.mark_sent([refund['seq'] for refund in refills])
+            for refund in refills:
+                # Carry the branch (and other context) into the pool thread
+                future = pool.submit(contextvars.copy_context().run, refund_late_fee_payment,
+                                     refund['transaction_id'], refund['amount'], gateway, refund['patron_id'])
+                in_flight[future] = refund
+
+        top_up()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                refund = in_flight.pop(future)
+                success, message = future.result()
+                batch.record(refund['seq'], success, message)
+                sent += 1
+                succeeded += success
+                if on_result is not None:
+                    on_result({'transaction_id': refund['transaction_id'], 'amount': refund['amount'],
+                               'success': success, 'message': message})
+            top_up()
+
+    seconds = time.perf_counter() - start
+    return {
+        'sent': sent,
+        'succeeded': succeeded,
+        'failed': sent - succeeded,
+        'seconds': round(seconds, 3),
+        'refunds_per_second': round(sent / seconds, 1) if seconds else 0.0,
+        'batch': batch.counts(),
+    }
@@ -0,0 +1,71 @@
+"""
+Circulation Stats Module - Popularity, utilisation and overdue reports
+
+Reports read the daily and monthly rollups rather than borrow_records, so
+their cost depends on the number of books and periods in the range, not on
+the size of the loan history. Reports only read: the rollups are brought up
+to date by the ``rollup_stats`` job (queued on a schedule by
+scripts/job_worker.py) or scripts/rollup_stats.py, and each report says how
+many loan events are still waiting to be counted.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from database import pending_loan_events, get_book_stats, get_author_stats, get_daily_stats, STATS_ORDERS
+
+# Window used when a report is asked for without a start date
+DEFAULT_STATS_DAYS = 30
+STATS_GROUPS = ('books', 'authors', 'daily')
+
+
+def _add_rates(rows: List[Dict], days: int) -> List[Dict]:
+    """Add overdue_rate and utilisation to rollup totals."""
+    for row in rows:
+        row['overdue_rate'] = round(row['late_returns'] / row['returns'], 4) if row['returns'] else 0.0
+        if 'copies' in row:
+            # Share of copy-days spent on loan
+            row['utilisation'] = round(row['loan_days'] / (max(row['copies'], 1) * days), 4)
+        row['loan_days'] = round(row['loan_days'], 2)
+        row['fees_paid'] = round(row['fees_paid'], 2)
+    return rows
+
+
+def circulation_report(group: str, since: Optional[date] = None, until: Optional[date] = None,
+                       order: str = 'borrows', limit: int = 20) -> Dict:
+    """
+    Build a circulation report from the daily rollups.
+
+    Args:
+        group: 'books', 'authors' or 'daily'
+        since: First day included (default DEFAULT_STATS_DAYS before until)
+        until: Last day included (default today)
+        order: Sort key for books/authors, one of STATS_ORDERS
+        limit: Maximum rows for books/authors
+
+    Returns:
+        Dict: {'since': str, 'until': str, 'days': int, 'pending_events': int, 'rows': List[Dict]}
+
+    Raises:
+        ValueError: If the group, order or date range is invalid
+    """
+    if group not in STATS_GROUPS:
+        raise ValueError(f"Unknown report: {group}")
+    if order not in STATS_ORDERS:
+        raise ValueError(f"Order must be one of {', '.join(STATS_ORDERS)}")
+
+    until = until or date.today()
+    since = since or until - timedelta(days=DEFAULT_STATS_DAYS - 1)
+    if since > until:
+        raise ValueError("since must not be after until")
+    days = (until - since).days + 1
+
+    if group == 'books':
+        rows = get_book_stats(since, until, order, limit)
+    elif group == 'authors':
+        rows = get_author_stats(since, until, order, limit)
+    else:
+        rows = get_daily_stats(since, until)
+
+    return {'since': since.isoformat(), 'until': until.isoformat(), 'days': days,
+            'pending_events': pending_loan_events(), 'rows': _add_rates(rows, days)}
@@ -0,0 +1,169 @@
+"""
+Event Bus Module - In-process publish/subscribe for live catalog changes
+
+Borrows, returns, released holds and new books publish small events here
+(through the database/repository listeners), and /api/events streams them
+to front-desk screens as server-sent events instead of the screens polling
+/catalog.
+
+Events go into one bounded ring shared by every subscriber; a subscriber
+only keeps its position in it, so a slow client costs no memory. A client
+that falls further behind than the ring holds is told to resync (reload the
+catalog) rather than being buffered. Bursts are coalesced: a subscriber
+waits `coalesce_seconds` after the first new event and then receives only
+the latest event per book.
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_CAPACITY = 4096           # recent events kept for subscribers to catch up on
+DEFAULT_MAX_SUBSCRIBERS = 2000
+DEFAULT_COALESCE_SECONDS = 1.0
+DEFAULT_HEARTBEAT_SECONDS = 15.0  # idle streams send a comment so dead clients are noticed
+
+EVENT_AVAILABILITY = 'availability'
+EVENT_BOOK_ADDED = 'book_added'
+
+
+def format_event(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    """One server-sent event in wire format."""
+    lines = f'id: {event_id}\n' if event_id is not None else ''
+    payload = json.dumps(data, separators=(',', ':'))
+    return f'{lines}event: {event}\ndata: {payload}\n\n'
+
+
+class EventBus:
+    """Recent events in a bounded ring, with any number of readers blocking for new ones."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, max_subscribers: int = DEFAULT_MAX_SUBSCRIBERS,
+                 coalesce_seconds: float = DEFAULT_COALESCE_SECONDS,
+                 heartbeat_seconds: float = DEFAULT_HEARTBEAT_SECONDS):
+        self.max_subscribers = max_subscribers
+        self.coalesce_seconds = coalesce_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self._cond = threading.Condition()
+        self._events: deque = deque(maxlen=capacity)  # (seq, kind, key, data, text), seqs consecutive
+        self._seq = 0
+        self.subscribers = 0
+        self.metrics = {'published': 0, 'delivered': 0, 'coalesced': 0, 'resyncs': 0, 'rejected': 0}
+
+    def publish(self, kind: str, key, data: Dict) -> int:
+        """Add an event and wake every waiting subscriber; returns its sequence number."""
+        with self._cond:
+            self._seq += 1
+            # Formatted once here rather than by each of the subscribers
+            self._events.append((self._seq, kind, key, data, format_event(kind, data, self._seq)))
+            self.metrics['published'] += 1
+            self._cond.notify_all()
+            return self._seq
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Optional['Subscription']:
+        """
+        Start reading after `last_event_id` (a reconnecting client's position),
+        or after the newest event. None if there are max_subscribers already.
+        A position past the newest event (the server restarted since) can't
+        be resumed from, so the first batch tells the client to resync.
+        """
+        with self._cond:
+            if self.subscribers >= self.max_subscribers:
+                self.metrics['rejected'] += 1
+                return None
+            self.subscribers += 1
+            if last_event_id is None:
+                return Subscription(self, self._seq)
+            return Subscription(self, max(0, min(last_event_id, self._seq)), resync=last_event_id > self._seq)
+
+    def snapshot(self) -> Dict:
+        """Subscribers, the newest sequence number and the counters."""
+        with self._cond:
+            return dict(self.metrics, subscribers=self.subscribers, last_event_id=self._seq)
+
+    def _unsubscribe(self) -> None:
+        with self._cond:
+            self.subscribers -= 1
+
+    def _read(self, cursor: int, timeout: float) -> Tuple[int, Optional[List[Tuple]]]:
+        """
+        Wait up to `timeout` for events after `cursor`.
+
+        Returns:
+            (new cursor, events) - events is None if some were already dropped from the ring
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > cursor, timeout):
+                return cursor, []
+            oldest = self._events[0][0]
+            if cursor < oldest - 1:
+                self.metrics['resyncs'] += 1
+                return self._seq, None
+            return self._seq, list(itertools.islice(self._events, cursor - oldest + 1, None))
+
+
+class Subscription:
+    """One reader's position in an EventBus."""
+
+    def __init__(self, bus: EventBus, cursor: int, resync: bool = False):
+        self.bus = bus
+        self.cursor = cursor
+        self._resync = resync
+        self._closed = False
+
+    def next_batch(self, timeout: Optional[float] = None) -> Optional[List[Dict]]:
+        """
+        The next burst of events, at most one per (kind, key), oldest first.
+
+        Returns:
+            List of {'id', 'event', 'data', 'text'} (text: the event in SSE
+            wire format); [] if nothing happened within `timeout` (default:
+            the bus's heartbeat); None if the subscriber fell too far behind
+            and must resync
+        """
+        bus = self.bus
+        if self._resync:
+            self._resync = False
+            with bus._cond:
+                bus.metrics['resyncs'] += 1
+            return None
+        cursor, events = bus._read(self.cursor, bus.heartbeat_seconds if timeout is None else timeout)
+        if events and bus.coalesce_seconds:
+            time.sleep(bus.coalesce_seconds)  # let the rest of the burst arrive
+            cursor, events = bus._read(self.cursor, 0)
+        self.cursor = cursor
+        if not events:
+            return events
+
+        latest = {}
+        for seq, kind, key, data, text in events:
+            latest[(kind, key)] = (seq, kind, data, text)
+        with bus._cond:
+            bus.metrics['delivered'] += len(latest)
+            bus.metrics['coalesced'] += len(events) - len(latest)
+        return [{'id': seq, 'event': kind, 'data': data, 'text': text}
+                for seq, kind, data, text in sorted(latest.values())]
+
+    def close(self) -> None:
+        """Stop reading (idempotent)."""
+        if not self._closed:
+            self._closed = True
+            self.bus._unsubscribe()
+
+
+def publish_availability(book: Dict) -> None:
+    """Availability listener: a book's copies were checked out, returned or released."""
+    live_events.publish(EVENT_AVAILABILITY, book['id'], {
+        'book_id': book['id'], 'available_copies': book['available_copies'], 'total_copies': book['total_copies']})
+
+
+def publish_book_added(book: Dict) -> None:
+    """Book insert listener: a book was added to the catalog."""
+    live_events.publish(EVENT_BOOK_ADDED, book['id'], {
+        'book_id': book['id'], 'title': book['title'], 'author': book['author'], 'isbn': book['isbn'],
+        'available_copies': book['available_copies'], 'total_copies': book['total_copies']})
+
+
+live_events = EventBus()
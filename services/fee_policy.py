@@ -0,0 +1,239 @@
+"""
+Fee Policy Module - Late fees from precomputed tables in integer cents
+
+The tiered fee is computed once per day count when a policy is compiled, so
+a lookup is a single index into a tuple, and amounts stay exact as cents
+until they are converted for display. The "as-of" time used to measure
+lateness comes from one clock per request (see ``pinned_clock``), so every
+fee within a request is measured against the same moment.
+
+Branches and patron types can have their own policies. Rules are loaded
+once at startup (``load_fee_policies``), and the policy for each
+(branch, patron type) pair is compiled on first use and cached.
+"""
+
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from database import current_branch, DEFAULT_BRANCH
+
+# Time pinned for the current request/thread; None means the live clock
+_as_of: ContextVar[Optional[datetime]] = ContextVar('fee_as_of', default=None)
+
+# Settings a policy rule may override
+POLICY_FIELDS = ('loan_days', 'first_tier_cents', 'first_tier_days', 'later_cents', 'cap_cents')
+# Largest value accepted for each setting; they bound the size of a compiled fee table
+SETTING_LIMITS = {'loan_days': 3650, 'first_tier_days': 3650,
+                  'first_tier_cents': 100000, 'later_cents': 100000, 'cap_cents': 100000}
+
+
+def current_time() -> datetime:
+    """The pinned as-of time for this request, or now if none is pinned."""
+    return _as_of.get() or datetime.now()
+
+
+@contextmanager
+def pinned_clock(as_of: Optional[datetime] = None):
+    """Pin current_time() to as_of (default: now) inside the block."""
+    token = _as_of.set(as_of or datetime.now())
+    try:
+        yield _as_of.get()
+    finally:
+        _as_of.reset(token)
+
+
+class FeePolicy:
+    """Loan period and tiered late fee: a first-tier daily rate, a later daily rate and a cap."""
+
+    __slots__ = POLICY_FIELDS + ('_table', '_dollars')
+
+    def __init__(self, loan_days: int = 14, first_tier_cents: int = 50, first_tier_days: int = 7,
+                 later_cents: int = 100, cap_cents: int = 1500):
+        self.loan_days = loan_days
+        self.first_tier_cents = first_tier_cents
+        self.first_tier_days = first_tier_days
+        self.later_cents = later_cents
+        self.cap_cents = cap_cents
+
+        # Fee for 0, 1, 2... days overdue up to the first day the cap applies
+        table = [0]
+        while table[-1] < cap_cents:
+            days = len(table)
+            if days > first_tier_days and later_cents <= 0:
+                break
+            rate = first_tier_cents if days <= first_tier_days else later_cents
+            table.append(min(table[-1] + rate, cap_cents))
+        self._table = tuple(table)
+        self._dollars = tuple(cents / 100 for cents in table)
+
+    def fee_cents(self, days_overdue: int) -> int:
+        """Late fee in cents for a loan overdue by the given number of days."""
+        if days_overdue <= 0:
+            return 0
+        table = self._table
+        return table[days_overdue] if days_overdue < len(table) else table[-1]
+
+    def fee(self, days_overdue: int) -> float:
+        """Late fee in dollars for a loan overdue by the given number of days."""
+        if days_overdue <= 0:
+            return 0
+        dollars = self._dollars
+        return dollars[days_overdue] if days_overdue < len(dollars) else dollars[-1]
+
+    @property
+    def max_fee(self) -> float:
+        """Largest fee this policy can charge for one loan, in dollars."""
+        return self._dollars[-1]
+
+    @staticmethod
+    def days_overdue(due_date: datetime, as_of: Optional[datetime] = None) -> int:
+        """Whole days past the due date at as_of (default: current_time()), never negative."""
+        return max(((as_of or current_time()) - due_date).days, 0)
+
+
+class FeePolicyRegistry:
+    """
+    Fee policies by branch and patron type.
+
+    Config format::
+
+        {
+            "default": {"cap_cents": 1500},
+            "patron_types": {"staff": ["99"]},
+            "rules": [
+                {"branch": "north", "later_cents": 75},
+                {"patron_type": "staff", "first_tier_cents": 0, "later_cents": 0},
+                {"branch": "north", "patron_type": "staff", "cap_cents": 0}
+            ]
+        }
+
+    Patron types are matched by patron ID prefix (longest wins). Settings are
+    layered default < branch < patron type < branch and patron type.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.load(config or {})
+
+    @staticmethod
+    def _settings(rule: Dict, extra: Tuple[str, ...] = ()) -> Dict:
+        """Validate a rule and return its policy settings."""
+        for field, value in rule.items():
+            if field not in POLICY_FIELDS + extra:
+                raise ValueError(f"Unknown fee policy setting: {field}")
+            if field in POLICY_FIELDS:
+                if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                    raise ValueError(f"{field} must be a non-negative integer")
+                if value > SETTING_LIMITS[field]:
+                    raise ValueError(f"{field} must be at most {SETTING_LIMITS[field]}")
+        return {field: value for field, value in rule.items() if field in POLICY_FIELDS}
+
+    def load(self, config: Dict) -> None:
+        """
+        Replace the rules with a new config and drop compiled policies.
+
+        Raises:
+            ValueError: If the config is malformed
+        """
+        default = self._settings(config.get('default', {}))
+        patron_types = config.get('patron_types', {})
+
+        prefixes = []
+        for patron_type, type_prefixes in patron_types.items():
+            for prefix in type_prefixes:
+                if not str(prefix).isdigit():
+                    raise ValueError(f"Patron ID prefix must be digits: {prefix}")
+                prefixes.append((str(prefix), patron_type))
+
+        overrides = {}
+        for rule in config.get('rules', []):
+            settings = self._settings(rule, ('branch', 'patron_type'))
+            if rule.get('branch') is None and rule.get('patron_type') is None:
+                raise ValueError("Fee policy rule needs a branch or patron_type (use default for every patron)")
+            if rule.get('patron_type') is not None and rule['patron_type'] not in patron_types:
+                raise ValueError(f"Unknown patron type: {rule['patron_type']}")
+            overrides.setdefault((rule.get('branch'), rule.get('patron_type')), {}).update(settings)
+
+        self.config = config
+        self._default = default
+        # Longest prefix first so the most specific match wins
+        self._prefixes = sorted(prefixes, key=lambda item: -len(item[0]))
+        self._overrides = overrides
+        self._compiled: Dict[Tuple[str, Optional[str]], FeePolicy] = {}
+        self._by_settings: Dict[Tuple, FeePolicy] = {}
+
+    def patron_type(self, patron_id: Optional[str]) -> Optional[str]:
+        """The patron's type from the configured ID prefixes, or None."""
+        if patron_id:
+            for prefix, patron_type in self._prefixes:
+                if patron_id.startswith(prefix):
+                    return patron_type
+        return None
+
+    def _compile(self, branch: str, patron_type: Optional[str]) -> FeePolicy:
+        """Merge the layered settings for a key into a policy."""
+        layers = [(branch, None)]
+        if patron_type is not None:
+            layers += [(None, patron_type), (branch, patron_type)]
+
+        settings = dict(self._default)
+        for layer in layers:
+            settings.update(self._overrides.get(layer, {}))
+
+        # Keys with identical settings share one compiled policy
+        signature = tuple(sorted(settings.items()))
+        policy = self._by_settings.get(signature)
+        if policy is None:
+            policy = self._by_settings[signature] = FeePolicy(**settings)
+        return policy
+
+    def policy_for(self, patron_id: Optional[str] = None, branch: Optional[str] = None) -> FeePolicy:
+        """The compiled policy for a patron at a branch (default: the request's branch)."""
+        key = (branch or current_branch() or DEFAULT_BRANCH, self.patron_type(patron_id))
+        policy = self._compiled.get(key)
+        if policy is None:
+            policy = self._compiled[key] = self._compile(*key)
+        return policy
+
+    def evaluate_bulk(self, loans: Iterable[Tuple[str, datetime]], as_of: Optional[datetime] = None,
+                      branch: Optional[str] = None) -> List[int]:
+        """
+        Late fees in cents for many loans at once (e.g. nightly billing).
+
+        Args:
+            loans: (patron_id, due_date) pairs
+            as_of: Time fees are measured at (default: current_time())
+            branch: Branch whose rules apply (default: the request's branch)
+
+        Returns:
+            List[int]: Fee in cents for each loan, in order
+        """
+        as_of = as_of or current_time()
+        branch = branch or current_branch() or DEFAULT_BRANCH
+        policies = {}
+        fees = []
+        for patron_id, due_date in loans:
+            patron_type = self.patron_type(patron_id)
+            policy = policies.get(patron_type)
+            if policy is None:
+                policy = policies[patron_type] = self.policy_for(patron_id, branch)
+            fees.append(policy.fee_cents((as_of - due_date).days))
+        return fees
+
+
+def load_fee_policies(path: str) -> None:
+    """
+    Load fee policy rules from a JSON file into the shared registry.
+
+    Raises:
+        ValueError: If the file is not a valid policy config
+    """
+    with open(path, encoding='utf-8') as f:
+        fee_policies.load(json.load(f))
+
+
+# $0.50/day for the first 7 days overdue, then $1.00/day, capped at $15.00; 14-day loans
+default_fee_policy = FeePolicy()
+fee_policies = FeePolicyRegistry()
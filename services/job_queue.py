@@ -0,0 +1,340 @@
+"""
+Job Queue Module - Durable background jobs for slow payment gateway calls
+
+Late fee payments, refunds and payment status checks are queued in a small
+SQLite file (separate from the library database) and run by worker threads
+in a separate process (scripts/job_worker.py), so a request only pays for an
+INSERT instead of a 0.5 s gateway round trip. The same workers fold new loan
+events into the circulation rollups of every branch shard (``rollup_stats``
+jobs), keeping that write out of the stats requests.
+
+A worker leases a job for ``lease_seconds``; if the worker dies, the lease
+expires and another worker picks the job up. A handler that raises is
+retried with exponential backoff up to ``max_attempts`` times. A gateway
+that answers (even with a decline) completes the job with that answer as
+its result.
+
+The gateway has no idempotency keys, so a payment whose worker dies after
+the charge but before completing the job is charged again on retry.
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from database import current_branch, fan_out, is_known_branch, use_branch, rollup_loan_events
+from services.payment_service import PaymentGateway
+from services.library_service import pay_late_fees, refund_late_fee_payment
+
+# Job statuses
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'        # the handler ran; its answer (success or not) is the result
+JOB_FAILED = 'failed'    # the handler kept raising until max_attempts
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_LEASE_SECONDS = 30.0
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 300.0
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before retrying a job that has failed `attempts` times (jittered exponential)."""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return random.uniform(delay / 2, delay)
+
+
+class JobQueue:
+    """Jobs in a SQLite file, shared by every process that opens it."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One autocommit connection per thread; the file is created on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    branch TEXT,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    run_after REAL NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, run_after)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at) WHERE finished_at IS NOT NULL')
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, kind: str, payload: Dict, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                branch: Optional[str] = None, now: Optional[float] = None) -> int:
+        """
+        Queue a job to run as soon as a worker is free.
+
+        Raises:
+            ValueError: If there is no handler for the kind
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = time.time() if now is None else now
+        cursor = self._connection().execute('''
+            INSERT INTO jobs (kind, payload, branch, max_attempts, run_after, created_at) VALUES (?, ?, ?, ?, ?, ?)
+        ''', (kind, json.dumps(payload), branch or current_branch(), max_attempts, now, now))
+        return cursor.lastrowid
+
+    def enqueue_many(self, kind: str, payloads: List[Dict], max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                     branch: Optional[str] = None, now: Optional[float] = None) -> List[int]:
+        """
+        Queue several jobs of one kind in a single transaction (all or none).
+
+        Raises:
+            ValueError: If there is no handler for the kind
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = time.time() if now is None else now
+        branch = branch or current_branch()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            job_ids = [conn.execute('''
+                INSERT INTO jobs (kind, payload, branch, max_attempts, run_after, created_at) VALUES (?, ?, ?, ?, ?, ?)
+            ''', (kind, json.dumps(payload), branch, max_attempts, now, now)).lastrowid for payload in payloads]
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return job_ids
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        """A job's status, attempts, result and timestamps, or None."""
+        row = self._connection().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {'id': row['id'], 'kind': row['kind'], 'status': row['status'], 'attempts': row['attempts'],
+               'payload': json.loads(row['payload']), 'result': json.loads(row['result']) if row['result'] else None,
+               'error': row['error']}
+        for field in ('created_at', 'started_at', 'finished_at', 'run_after'):
+            job[field] = datetime.fromtimestamp(row[field]).isoformat() if row[field] else None
+        return job
+
+    def lease(self, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+              now: Optional[float] = None) -> Optional[Dict]:
+        """
+        Claim the next due job (or one whose worker's lease expired).
+
+        Returns:
+            Dict: {'id', 'kind', 'payload', 'branch', 'attempts'} or None if nothing is due
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            while True:
+                row = conn.execute('''
+                    SELECT id, kind, payload, branch, attempts, max_attempts FROM jobs
+                    WHERE (status = 'queued' AND run_after <= ?) OR (status = 'running' AND lease_expires <= ?)
+                    ORDER BY run_after, id LIMIT 1
+                ''', (now, now)).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                if row['attempts'] >= row['max_attempts']:
+                    # Its last worker died mid-run; give up rather than run it again
+                    conn.execute('''
+                        UPDATE jobs SET status = 'failed', error = 'Lease expired', finished_at = ?,
+                                        lease_owner = NULL, lease_expires = NULL
+                        WHERE id = ?
+                    ''', (now, row['id']))
+                    continue
+                conn.execute('''
+                    UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?,
+                                    lease_expires = ?, started_at = COALESCE(started_at, ?)
+                    WHERE id = ?
+                ''', (worker, now + lease_seconds, now, row['id']))
+                conn.execute('COMMIT')
+                return {'id': row['id'], 'kind': row['kind'], 'payload': json.loads(row['payload']),
+                        'branch': row['branch'], 'attempts': row['attempts'] + 1}
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def complete(self, job_id: int, worker: str, result: Dict, now: Optional[float] = None) -> bool:
+        """Record a job's result; False if the worker no longer holds the lease."""
+        now = time.time() if now is None else now
+        cursor = self._connection().execute('''
+            UPDATE jobs SET status = 'done', result = ?, error = NULL, finished_at = ?,
+                            lease_owner = NULL, lease_expires = NULL
+            WHERE id = ? AND status = 'running' AND lease_owner = ?
+        ''', (json.dumps(result), now, job_id, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker: str, error: str, now: Optional[float] = None) -> bool:
+        """Schedule a retry with backoff, or mark the job failed after its last attempt."""
+        now = time.time() if now is None else now
+        conn = self._connection()
+        row = conn.execute('SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ?',
+                           (job_id, worker)).fetchone()
+        if row is None:
+            return False
+        if row['attempts'] >= row['max_attempts']:
+            status, run_after, finished_at = JOB_FAILED, now, now
+        else:
+            status, run_after, finished_at = JOB_QUEUED, now + retry_delay(row['attempts']), None
+        cursor = conn.execute('''
+            UPDATE jobs SET status = ?, error = ?, run_after = ?, finished_at = ?, lease_owner = NULL, lease_expires = NULL
+            WHERE id = ? AND status = 'running' AND lease_owner = ?
+        ''', (status, error, run_after, finished_at, job_id, worker))
+        return cursor.rowcount == 1
+
+    def metrics(self, window: float = 60.0, now: Optional[float] = None) -> Dict:
+        """Jobs by status, plus throughput and latency of jobs finished in the last `window` seconds."""
+        now = time.time() if now is None else now
+        conn = self._connection()
+        counts = {status: 0 for status in (JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED)}
+        for row in conn.execute('SELECT status, COUNT(*) AS count FROM jobs GROUP BY status'):
+            counts[row['status']] = row['count']
+        recent = conn.execute('''
+            SELECT COUNT(*) AS count, AVG(finished_at - created_at) AS latency, AVG(finished_at - started_at) AS run_time
+            FROM jobs WHERE finished_at >= ?
+        ''', (now - window,)).fetchone()
+        return {
+            'jobs': counts,
+            'window_seconds': window,
+            'finished': recent['count'],
+            'jobs_per_second': round(recent['count'] / window, 3),
+            'avg_latency_seconds': round(recent['latency'] or 0, 3),
+            'avg_run_seconds': round(recent['run_time'] or 0, 3),
+        }
+
+
+class _WatchedGateway:
+    """Forwards to a gateway and remembers the last exception it raised."""
+
+    def __init__(self, gateway):
+        self._gateway = gateway
+        self.error: Optional[Exception] = None
+
+    def __getattr__(self, name):
+        method = getattr(self._gateway, name)
+
+        def call(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            except Exception as e:
+                self.error = e
+                raise
+        return call
+
+
+def _pay_late_fees(payload: Dict, gateway) -> Dict:
+    watched = _WatchedGateway(gateway)
+    success, message, transaction_id = pay_late_fees(payload['patron_id'], payload['book_id'], watched)
+    if watched.error is not None:
+        raise watched.error  # Gateway unreachable or erroring: retry
+    return {'success': success, 'message': message, 'transaction_id': transaction_id}
+
+
+def _refund(payload: Dict, gateway) -> Dict:
+    watched = _WatchedGateway(gateway)
+    success, message = refund_late_fee_payment(payload['transaction_id'], payload['amount'], watched,
+                                               payload.get('patron_id'))
+    if watched.error is not None:
+        raise watched.error
+    return {'success': success, 'message': message}
+
+
+def _verify_payment(payload: Dict, gateway) -> Dict:
+    return gateway.verify_payment_status(payload['transaction_id'])
+
+
+def _rollup_stats(payload: Dict, gateway) -> Dict:
+    # Every branch shard, whichever branch queued the job
+    processed = dict(fan_out(rollup_loan_events, payload.get('batch_size', 100000)))
+    return {'processed': sum(processed.values()), 'branches': processed}
+
+
+# Job kind -> handler(payload, gateway) returning the job's result
+JOB_HANDLERS: Dict[str, Callable[[Dict, object], Dict]] = {
+    'pay_late_fees': _pay_late_fees,
+    'refund': _refund,
+    'verify_payment': _verify_payment,
+    'rollup_stats': _rollup_stats,
+}
+
+
+class JobWorker:
+    """Leases jobs from a queue and runs them, one at a time."""
+
+    def __init__(self, queue: JobQueue, gateway=None, name: Optional[str] = None,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.queue = queue
+        self.gateway = gateway or PaymentGateway()
+        self.name = name or f'worker-{uuid.uuid4().hex[:8]}'
+        self.lease_seconds = lease_seconds
+
+    def run_once(self) -> Optional[int]:
+        """Run the next due job, if any; returns its ID."""
+        job = self.queue.lease(self.name, self.lease_seconds)
+        if job is None:
+            return None
+        try:
+            # Never fall back to the default database for a branch this process does not know
+            if not is_known_branch(job['branch']):
+                raise ValueError(f"Unknown branch: {job['branch']}")
+            with use_branch(job['branch']):
+                result = JOB_HANDLERS[job['kind']](job['payload'], self.gateway)
+        except Exception as e:
+            self.queue.fail(job['id'], self.name, f'{type(e).__name__}: {e}')
+        else:
+            self.queue.complete(job['id'], self.name, result)
+        return job['id']
+
+    def run(self, stop: threading.Event, poll_interval: float = 0.5) -> None:
+        """Run jobs until stop is set, polling while the queue is empty."""
+        while not stop.is_set():
+            if self.run_once() is None:
+                stop.wait(poll_interval)
+
+
+def start_workers(queue: JobQueue, threads: int, stop: threading.Event, gateway=None,
+                  poll_interval: float = 0.5) -> List[threading.Thread]:
+    """
+    Start worker threads sharing a queue (gateway calls wait on the network,
+    so threads overlap them well).
+
+    Args:
+        queue: Queue to take jobs from
+        threads: Number of worker threads
+        stop: Set to make the workers exit after their current job
+        gateway: Gateway shared by the workers (default: one PaymentGateway each)
+        poll_interval: Seconds an idle worker waits before polling again
+    """
+    workers = []
+    for n in range(threads):
+        worker = JobWorker(queue, gateway, name=f'{uuid.uuid4().hex[:8]}-{n}')
+        thread = threading.Thread(target=worker.run, args=(stop, poll_interval), name=worker.name, daemon=True)
+        thread.start()
+        workers.append(thread)
+    return workers
@@ -3,15 +3,24 @@ Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
 
+import base64
+import math
 from datetime import datetime, timedelta
+from itertools import islice
 from typing import Dict, List, Optional, Tuple
-from database import (
+from database import fan_out, is_default_shard, EVENT_FEE_PAID
+from repositories import (
     get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
-    insert_book, insert_borrow_record, update_book_availability,
-    update_borrow_record_return_date, get_all_books, 
-    get_patron_borrowed_books, get_patron_borrow_history
+    insert_book, get_all_books,
+    get_patron_borrowed_books, iter_patron_borrow_history, get_books_by_ids,
+    search_books_by_author, borrow_copy, return_copy,
+    insert_hold, delete_hold, get_patron_holds, has_ready_hold,
+    insert_loan_event
 )
 from services.payment_service import PaymentGateway
+from services.payment_status import payment_statuses
+from services.fee_policy import FeePolicy, fee_policies, current_time
+from services.search_index import search_index
 
 def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
     """
@@ -79,8 +88,8 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not book:
         return False, "Book not found."
     
-    if book['available_copies'] <= 0:
-        return False, "This book is currently not available."
+    if book['available_copies'] <= 0 and not has_ready_hold(patron_id, book_id):
+        return False, "This book is currently not available. You can place a hold to be next in line."
     
     # Check patron's current borrowed books count
     current_borrowed = get_patron_borrow_count(patron_id)
@@ -88,18 +97,14 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if current_borrowed > 5:
         return False, "You have reached the maximum borrowing limit of 5 books."
     
-    # Create borrow record
-    borrow_date = datetime.now()
-    due_date = borrow_date + timedelta(days=14)
+    # Create borrow record with the loan period of the patron's fee policy
+    borrow_date = current_time()
+    due_date = borrow_date + timedelta(days=fee_policies.policy_for(patron_id).loan_days)
     
-    # Insert borrow record and update availability
-    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
-    if not borrow_success:
-        return False, "Database error occurred while creating borrow record."
-    
-    availability_success = update_book_availability(book_id, -1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
+    # Check out a specific copy and insert the borrow record in one transaction
+    copy_id = borrow_copy(patron_id, book_id, borrow_date, due_date)
+    if copy_id is None:
+        return False, "This book is currently not available. You can place a hold to be next in line."
     
     return True, f'Successfully borrowed "{book["title"]}". Due date: {due_date.strftime("%Y-%m-%d")}.'
 
@@ -128,23 +133,67 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not any(book["id"] == b["book_id"] for b in get_patron_borrowed_books(patron_id)):
         return False, "Cannot return book that was not borrowed"
     
-    # Calculate late fee before submitting record
-    late_fees = calculate_late_fee_for_book(patron_id, book_id)["fee_amount"]
+    # Calculate late fee at the return time before submitting record
+    return_date = current_time()
+    late_fees = calculate_late_fee_for_book(patron_id, book_id, return_date)["fee_amount"]
 
-    # Create return record and insert it
-    return_date = datetime.now()
-    return_success = update_borrow_record_return_date(patron_id, book_id, return_date)
+    # Close the borrow record and check the copy back in
+    return_success = return_copy(patron_id, book_id, return_date)
     if not return_success:
         return False, "Database error occurred while updating borrow record"
     
-    # Update availability
-    availability_success = update_book_availability(book_id, 1)
-    if not availability_success:
-        return False, "Database error occured while updating book availability"
-    
     return True, f'Successfully returned "{book["title"]}" on {return_date.strftime("%Y-%m-%d")}. Late fees: ${late_fees}.'
 
-def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
+def place_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Put a patron in line for a book that has no available copies.
+    When a copy is returned it is set aside for the first patron in line.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book to hold
+        
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    # Validate patron ID
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+    
+    book = get_book_by_id(book_id)
+    if not book:
+        return False, "Book not found."
+    
+    if book['available_copies'] > 0:
+        return False, "This book is available. Borrow it instead of placing a hold."
+    
+    position = insert_hold(patron_id, book_id, current_time())
+    if position is None:
+        return False, "You already have a hold on this book."
+    
+    return True, f'Hold placed on "{book["title"]}". Position in line: {position}.'
+
+def cancel_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Cancel a patron's hold on a book.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the held book
+        
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    # Validate patron ID
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+    
+    if not delete_hold(patron_id, book_id):
+        return False, "No hold found for this book."
+    
+    return True, "Hold cancelled."
+
+def calculate_late_fee_for_book(patron_id: str, book_id: int, as_of: Optional[datetime] = None) -> Dict:
     """
     Returns JSON response with fee amount and days overdue.
     Implements R5 as per requirements  
@@ -152,6 +201,7 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     Args:
         patron_id: 6-digit library card ID
         book_id: ID of the book to calculate fees for
+        as_of: Time the fee is measured at (default: the request's pinned clock)
         
     Returns:
         Dict: {'fee_amount': double, 'days_overdue': int}
@@ -171,25 +221,14 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     if book == None:
         return {"fee_amount": 0, "days_overdue": 0}
     
-    # Calculate days overdue
-    due_date = book["due_date"]
-    date = datetime.now()
-    days_overdue = (date - due_date).days
+    return _late_fee(fee_policies.policy_for(patron_id), book["due_date"], as_of or current_time())
 
-    if (days_overdue < 1):
+def _late_fee(policy: FeePolicy, due_date: datetime, as_of: datetime) -> Dict:
+    """Fee amount and days overdue under a policy for a loan due at due_date, measured at as_of."""
+    days_overdue = policy.days_overdue(due_date, as_of)
+    if days_overdue < 1:
         return {"fee_amount": 0, "days_overdue": 0}
-
-    # Calculate fees based on days overdue (max 15)
-    fee_amount = 0
-    if (days_overdue <= 7):
-        fee_amount = 0.50 * days_overdue
-    else:
-        fee_amount = 3.50 + (days_overdue - 7)
-    
-    if (fee_amount > 15.00):
-        fee_amount = 15.00
-
-    return {"fee_amount": fee_amount, "days_overdue": days_overdue}
+    return {"fee_amount": policy.fee(days_overdue), "days_overdue": days_overdue}
 
 def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     """
@@ -198,35 +237,142 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     
     Args:
         search_term: String to search title/author/ISBN
-        search_type: Type of title/author/ISBN
+        search_type: Type of title/author/ISBN, or all for ranked search
         
     Returns:
         List[Dict]: [{book1}, {book2}]
     """
-    
+    if search_type == "all": # Ranked search over every field
+        return search_books_ranked(search_term)
+
+    if search_type == "author": # Partial author match through the authors table
+        return search_books_by_author(search_term)
+
     search_results = []
     all_books = get_all_books()
     if (search_type == "isbn"): # Search exact ISBN
         for book in all_books:
             if search_term == book["isbn"]:
                 search_results.append(book)
-    else: # Search partial title or author
+    else: # Search partial title
         for book in all_books:
-            if search_term.lower() in (book["title"].lower() if search_type == "title" else book["author"].lower()):
+            if search_term.lower() in book["title"].lower():
                 search_results.append(book)
 
     return search_results
 
-def get_patron_status_report(patron_id: str) -> Dict:
+def search_books_ranked(query: str, limit: int = 20) -> List[Dict]:
+    """
+    Search title, author and ISBN at once, best matches first.
+    Tolerates small typos in title and author words.
+    
+    Args:
+        query: Free-text search terms or an ISBN
+        limit: Maximum number of results
+        
+    Returns:
+        List[Dict]: [{book1, 'score': float}, ...] ordered by relevance
+    """
+    if not query or not query.strip():
+        return []
+
+    if not is_default_shard(): # The in-memory index only covers the default database
+        books = {}
+        for search_type in ("title", "author", "isbn"):
+            for book in search_books_in_catalog(query.strip(), search_type):
+                books.setdefault(book["id"], book)
+        return list(books.values())[:limit]
+
+    hits = search_index.search(query, limit)
+    scores = dict(hits)
+    books = get_books_by_ids([book_id for book_id, _ in hits])
+    for book in books:
+        book["score"] = round(scores[book["id"]], 4)
+
+    return books
+
+def search_books_all_branches(search_term: str, search_type: str) -> List[Dict]:
+    """
+    Search every branch's catalog in parallel and merge the results.
+    
+    Args:
+        search_term: String to search title/author/ISBN
+        search_type: Type of title/author/ISBN/all
+        
+    Returns:
+        List[Dict]: [{book1, 'branch': str}, ...] ordered by title (by score for type all)
+    """
+    results = []
+    for branch, books in fan_out(search_books_in_catalog, search_term, search_type):
+        for book in books:
+            book["branch"] = branch
+            results.append(book)
+
+    if search_type == "all":
+        results.sort(key=lambda book: book.get("score") or 0, reverse=True)
+    else:
+        results.sort(key=lambda book: book["title"])
+    return results
+
+# Previously borrowed books shown per page of the status report
+HISTORY_PAGE_SIZE = 25
+
+def encode_history_cursor(record: Dict) -> str:
+    """Opaque cursor pointing just after a history record."""
+    raw = f"{record['borrow_date'].isoformat()}|{record['loan_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_history_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Decode a cursor made by encode_history_cursor.
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        borrow_date, loan_id = raw.rsplit('|', 1)
+        datetime.fromisoformat(borrow_date)
+        return borrow_date, int(loan_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor.")
+
+def get_patron_history_page(patron_id: str, limit: int = HISTORY_PAGE_SIZE, cursor: Optional[str] = None,
+                            since: Optional[datetime] = None, until: Optional[datetime] = None) -> Dict:
+    """
+    One page of a patron's borrowing history, oldest first.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        limit: Maximum records in the page
+        cursor: next_cursor from the previous page, or None for the first page
+        since: Only loans borrowed at or after this time
+        until: Only loans borrowed before this time
+        
+    Returns:
+        Dict: {'history': List[Dict], 'next_cursor': Optional[str]}
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    after = decode_history_cursor(cursor) if cursor else None
+    # Fetch one extra record to know whether another page follows
+    records = list(islice(iter_patron_borrow_history(patron_id, after, since, until, limit + 1), limit + 1))
+    history = records[:limit]
+    next_cursor = encode_history_cursor(history[-1]) if len(records) > limit else None
+    return {'history': history, 'next_cursor': next_cursor}
+
+def get_patron_status_report(patron_id: str, history_cursor: Optional[str] = None) -> Dict:
     """
     Allows patron to search their status
     Implements R7 as per requirements
     
     Args:
         patron_id: 6-digit library card ID
+        history_cursor: Cursor of the borrowing history page to show (first page if None)
         
     Returns:
-        Dict: {'books': List{Dict}, 'total_late_fees': double, 'num_books_borrowed': int, 'borrowing_history': List[Dict]}
+        Dict: {'books': List{Dict}, 'total_late_fees': double, 'num_books_borrowed': int, 'borrowing_history': List[Dict], 'history_cursor': Optional[str], 'holds': List[Dict]}
     """
     # Validate patron ID
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
@@ -234,12 +380,22 @@ def get_patron_status_report(patron_id: str) -> Dict:
     
     borrowed_books = get_patron_borrowed_books(patron_id)
     num_books_borrowed = len(borrowed_books)
-    borrowing_history = get_patron_borrow_history(patron_id)
-    total_late_fees = 0
+    try:
+        history_page = get_patron_history_page(patron_id, cursor=history_cursor)
+    except ValueError:
+        history_page = get_patron_history_page(patron_id)
+    # Fees come from the loans already fetched, all measured at the same time
+    as_of = current_time()
+    policy = fee_policies.policy_for(patron_id)
+    # Added up in whole cents and converted once, so many loans cannot drift
+    total_cents = 0
     for book in borrowed_books:
-        total_late_fees += calculate_late_fee_for_book(patron_id, book["book_id"])["fee_amount"]
+        total_cents += policy.fee_cents(policy.days_overdue(book["due_date"], as_of))
+    total_late_fees = total_cents / 100
+
+    holds = get_patron_holds(patron_id)
 
-    return {"books": borrowed_books, "total_late_fees": total_late_fees, "num_books_borrowed": num_books_borrowed, "borrowing_history": borrowing_history}
+    return {"books": borrowed_books, "total_late_fees": total_late_fees, "num_books_borrowed": num_books_borrowed, "borrowing_history": history_page['history'], "history_cursor": history_page['next_cursor'], "holds": holds}
 
 
 def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
@@ -298,6 +454,7 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
         )
         
         if success:
+            insert_loan_event(EVENT_FEE_PAID, patron_id, book_id, amount=fee_amount)
             return True, f"Payment successful! {message}", transaction_id
         else:
             return False, f"Payment failed: {message}", None
@@ -306,7 +463,29 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
         # Handle payment gateway errors
         return False, f"Payment processing error: {str(e)}", None
     
-def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None) -> Tuple[bool, str]:
+def validate_refund(transaction_id: str, amount: float, patron_id: Optional[str] = None) -> Optional[str]:
+    """
+    Check a refund request without contacting the gateway.
+    
+    Returns:
+        The reason the refund would be rejected, or None if it is valid
+    """
+    if not transaction_id or not transaction_id.startswith("txn_"):
+        return "Invalid transaction ID."
+    
+    if not math.isfinite(amount):  # float('nan') passes both comparisons below
+        return "Invalid refund amount."
+    
+    if amount <= 0:
+        return "Refund amount must be greater than 0."
+    
+    if amount > fee_policies.policy_for(patron_id).max_fee:  # Maximum late fee per book
+        return "Refund amount exceeds maximum late fee."
+    
+    return None
+
+def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None,
+                            patron_id: Optional[str] = None) -> Tuple[bool, str]:
     """
     Refund a late fee payment (e.g., if book was returned on time but fees were charged in error).
     
@@ -316,19 +495,15 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
         transaction_id: Original transaction ID to refund
         amount: Amount to refund
         payment_gateway: Payment gateway instance (injectable for testing)
+        patron_id: Patron who paid, to apply their fee policy's cap (optional)
         
     Returns:
         tuple: (success: bool, message: str)
     """
     # Validate inputs
-    if not transaction_id or not transaction_id.startswith("txn_"):
-        return False, "Invalid transaction ID."
-    
-    if amount <= 0:
-        return False, "Refund amount must be greater than 0."
-    
-    if amount > 15.00:  # Maximum late fee per book
-        return False, "Refund amount exceeds maximum late fee."
+    error = validate_refund(transaction_id, amount, patron_id)
+    if error:
+        return False, error
     
     # Use provided gateway or create new one
     if payment_gateway is None:
@@ -340,6 +515,8 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
         success, message = payment_gateway.refund_payment(transaction_id, amount)
         
         if success:
+            # A cached 'completed' status no longer holds
+            payment_statuses.invalidate(transaction_id)
             return True, message
         else:
             return False, f"Refund failed: {message}"
@@ -0,0 +1,146 @@
+"""
+Loan Replay Module - Rebuild loan state from the append-only event log
+
+State is folded from the latest snapshot plus the events after it. Snapshots
+are zlib-compressed JSON, so replay cost stays proportional to the events
+since the last snapshot rather than the whole history.
+"""
+
+import json
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from database import (
+    EVENT_BORROWED, EVENT_RETURNED, EVENT_FEE_PAID, EVENT_HELD, EVENT_HOLD_RELEASED,
+    iter_loan_events, insert_loan_snapshot, get_latest_loan_snapshot,
+    get_book_counts, get_open_loan_ids, set_copy_statuses
+)
+
+
+class LoanState:
+    """Open loans, copies set aside for holds and fees paid, as of an event ID."""
+
+    __slots__ = ('last_event_id', 'open_loans', 'held_copies', 'fees_paid')
+
+    def __init__(self):
+        self.last_event_id = 0
+        # loan_id -> (patron_id, book_id, copy_id, borrowed_at)
+        self.open_loans: Dict[int, Tuple[str, int, Optional[int], str]] = {}
+        # copy_id -> (book_id, patron_id)
+        self.held_copies: Dict[int, Tuple[int, str]] = {}
+        # patron_id -> total paid
+        self.fees_paid: Dict[str, float] = {}
+
+    def apply(self, events: Iterable[tuple]) -> 'LoanState':
+        """Fold events (tuples from iter_loan_events) into the state."""
+        open_loans = self.open_loans
+        held_copies = self.held_copies
+        fees_paid = self.fees_paid
+        event_id = self.last_event_id
+
+        for event_id, event_type, patron_id, book_id, loan_id, copy_id, amount, occurred_at in events:
+            if event_type == EVENT_BORROWED:
+                if loan_id is not None:
+                    open_loans[loan_id] = (patron_id, book_id, copy_id, occurred_at)
+                if copy_id is not None:
+                    held_copies.pop(copy_id, None)
+            elif event_type == EVENT_RETURNED:
+                open_loans.pop(loan_id, None)
+            elif event_type == EVENT_HELD:
+                held_copies[copy_id] = (book_id, patron_id)
+            elif event_type == EVENT_HOLD_RELEASED:
+                held_copies.pop(copy_id, None)
+            elif event_type == EVENT_FEE_PAID:
+                fees_paid[patron_id] = fees_paid.get(patron_id, 0.0) + (amount or 0.0)
+
+        self.last_event_id = event_id
+        return self
+
+    def unavailable_by_book(self) -> Dict[int, int]:
+        """Copies per book that are out on loan or set aside for a hold."""
+        counts: Dict[int, int] = {}
+        for _, book_id, copy_id, _ in self.open_loans.values():
+            if copy_id is not None:
+                counts[book_id] = counts.get(book_id, 0) + 1
+        for book_id, _ in self.held_copies.values():
+            counts[book_id] = counts.get(book_id, 0) + 1
+        return counts
+
+    def to_bytes(self) -> bytes:
+        """Serialize to compressed JSON."""
+        data = {
+            'last_event_id': self.last_event_id,
+            'open_loans': [[loan_id, *loan] for loan_id, loan in self.open_loans.items()],
+            'held_copies': [[copy_id, *held] for copy_id, held in self.held_copies.items()],
+            'fees_paid': self.fees_paid,
+        }
+        return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'), 6)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'LoanState':
+        """Deserialize a snapshot produced by to_bytes."""
+        data = json.loads(zlib.decompress(blob))
+        state = cls()
+        state.last_event_id = data['last_event_id']
+        state.open_loans = {row[0]: tuple(row[1:]) for row in data['open_loans']}
+        state.held_copies = {row[0]: tuple(row[1:]) for row in data['held_copies']}
+        state.fees_paid = data['fees_paid']
+        return state
+
+
+def replay(use_snapshot: bool = True) -> LoanState:
+    """Rebuild the current loan state from the latest snapshot plus newer events."""
+    state = LoanState()
+    if use_snapshot:
+        snapshot = get_latest_loan_snapshot()
+        if snapshot:
+            state = LoanState.from_bytes(snapshot['state'])
+    return state.apply(iter_loan_events(state.last_event_id))
+
+
+def create_snapshot() -> LoanState:
+    """Replay up to the newest event and store the result as a snapshot."""
+    state = replay()
+    insert_loan_snapshot(state.last_event_id, state.to_bytes())
+    return state
+
+
+def rebuilt_availability(state: LoanState) -> Dict[int, int]:
+    """Available copies per book implied by the replayed state."""
+    unavailable = state.unavailable_by_book()
+    return {book_id: total - unavailable.get(book_id, 0) for book_id, (total, _) in get_book_counts().items()}
+
+
+def verify(state: Optional[LoanState] = None) -> Dict[str, List]:
+    """
+    Compare replayed state with the live tables.
+    
+    Returns:
+        Dict: {'availability': [(book_id, live, replayed)],
+               'missing_loans': [loan_id open in borrow_records but not in events],
+               'extra_loans': [loan_id open in events but not in borrow_records]}
+    """
+    state = state or replay()
+    live_counts = get_book_counts()
+    availability = [
+        (book_id, live_counts[book_id][1], available)
+        for book_id, available in rebuilt_availability(state).items()
+        if live_counts[book_id][1] != available
+    ]
+    live_loans = set(get_open_loan_ids())
+    replayed_loans = set(state.open_loans)
+    return {
+        'availability': sorted(availability),
+        'missing_loans': sorted(live_loans - replayed_loans),
+        'extra_loans': sorted(replayed_loans - live_loans),
+    }
+
+
+def rebuild_availability(state: Optional[LoanState] = None) -> int:
+    """
+    Set copy statuses to the replayed loans and holds, letting the copy
+    triggers bring the book counters along; returns books changed.
+    """
+    state = state or replay()
+    on_loan = {copy_id for _, _, copy_id, _ in state.open_loans.values() if copy_id is not None}
+    return len(set_copy_statuses(on_loan, state.held_copies))
@@ -7,7 +7,7 @@ since we cannot make actual payment API calls during testing.
 """
 
 import requests
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 import time
 
 
@@ -131,4 +131,34 @@ class PaymentGateway:
             "status": "completed",
             "amount": 10.50,
             "timestamp": time.time()
-        }
\ No newline at end of file
+        }
+    
+    def verify_payment_statuses(self, transaction_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Check the status of many payment transactions in one request.
+        
+        WARNING: This makes an actual HTTP request to external service.
+        You should MOCK this method in tests!
+        
+        Args:
+            transaction_ids: Transaction IDs to check
+            
+        Returns:
+            dict: Transaction ID -> payment status information (as verify_payment_status)
+        """
+        # One round trip, however many IDs:
+        # requests.post(f"{self.base_url}/charges/lookup", json={"ids": transaction_ids})
+        time.sleep(0.3)
+        
+        statuses = {}
+        for transaction_id in transaction_ids:
+            if not transaction_id or not transaction_id.startswith("txn_"):
+                statuses[transaction_id] = {"status": "not_found", "message": "Transaction not found"}
+            else:
+                statuses[transaction_id] = {
+                    "transaction_id": transaction_id,
+                    "status": "completed",
+                    "amount": 10.50,
+                    "timestamp": time.time()
+                }
+        return statuses
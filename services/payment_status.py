@@ -0,0 +1,147 @@
+"""
+Payment Status Module - Cached, coalesced and batched payment status checks
+
+PaymentGateway.verify_payment_status costs a 0.3 s round trip, and a page
+showing payment state asks about the same transactions again and again.
+
+- Final statuses (failed, refunded, cancelled) never change, so they are
+  cached for good; other answers (pending, completed, not_found) for `ttl`
+  seconds. A completed payment can still be refunded, and refunds run in
+  the job workers too, whose invalidations never reach this process.
+- refund_late_fee_payment invalidates the refunded transaction here, so a
+  refund made in this process shows at once. At the size cap the least
+  recently used entry is evicted.
+- Concurrent lookups of the same transaction share one gateway call: the
+  first caller fetches, the rest wait for its answer.
+- get_many() fetches every uncached transaction in one
+  verify_payment_statuses round trip (`max_batch` IDs per call).
+
+Gateway errors are passed to every caller waiting on that call and are
+never cached.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable
+
+from services.payment_service import PaymentGateway
+
+TERMINAL_STATUSES = frozenset({'failed', 'refunded', 'cancelled'})
+
+DEFAULT_TTL_SECONDS = 5.0
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_BATCH = 100
+
+
+class PaymentStatusCache:
+    """Payment statuses by transaction ID, in front of a payment gateway."""
+
+    def __init__(self, gateway=None, ttl: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_batch: int = DEFAULT_MAX_BATCH, clock: Callable[[], float] = time.monotonic):
+        self.gateway = gateway or PaymentGateway()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_batch = max_batch
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # id -> (status, expires or None)
+        self._in_flight: Dict[str, Future] = {}
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'gateway_calls': 0}
+
+    def clear(self) -> None:
+        """Forget every cached status (lookups in flight still complete)."""
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, transaction_id: str) -> None:
+        """Forget a transaction's status (e.g. after refunding it); an answer already on its way is not cached."""
+        with self._lock:
+            self._entries.pop(transaction_id, None)
+            self._in_flight.pop(transaction_id, None)
+
+    def stats(self) -> Dict:
+        """Hits, misses, lookups that joined another's call, gateway calls and cached entries."""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+    def get(self, transaction_id: str) -> Dict:
+        """A transaction's payment status, from the cache or the gateway."""
+        return self.get_many([transaction_id])[transaction_id]
+
+    def get_many(self, transaction_ids: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Payment statuses of many transactions; uncached ones are fetched in batches.
+
+        Returns:
+            Dict: transaction ID -> status dict (a copy; safe to modify)
+
+        Raises:
+            Exception: Whatever the gateway raised for a batch this call needed
+        """
+        transaction_ids = list(dict.fromkeys(transaction_ids))
+        statuses: Dict[str, Dict] = {}
+        waiting: Dict[str, Future] = {}
+        owned: Dict[str, Future] = {}
+        now = self._clock()
+        with self._lock:
+            for transaction_id in transaction_ids:
+                entry = self._entries.get(transaction_id)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    statuses[transaction_id] = entry[0]
+                    self._entries.move_to_end(transaction_id)
+                    self._stats['hits'] += 1
+                elif transaction_id in self._in_flight:
+                    waiting[transaction_id] = self._in_flight[transaction_id]
+                    self._stats['coalesced'] += 1
+                else:
+                    owned[transaction_id] = self._in_flight[transaction_id] = Future()
+                    self._stats['misses'] += 1
+
+        try:
+            pending = list(owned)
+            for start in range(0, len(pending), self.max_batch):
+                statuses.update(self._fetch(pending[start:start + self.max_batch], owned))
+        except BaseException as e:
+            # Release everyone waiting on the calls this lookup never made or that failed
+            with self._lock:
+                for transaction_id, future in owned.items():
+                    if not future.done():
+                        if self._in_flight.get(transaction_id) is future:
+                            del self._in_flight[transaction_id]
+                        future.set_exception(e)
+            raise
+
+        for transaction_id, future in waiting.items():
+            statuses[transaction_id] = future.result()
+        return {transaction_id: dict(statuses[transaction_id]) for transaction_id in transaction_ids}
+
+    def _fetch(self, transaction_ids, owned: Dict[str, Future]) -> Dict[str, Dict]:
+        """One gateway call for transactions this thread owns; caches and publishes the answers."""
+        with self._lock:
+            self._stats['gateway_calls'] += 1
+        if len(transaction_ids) == 1:
+            answers = {transaction_ids[0]: self.gateway.verify_payment_status(transaction_ids[0])}
+        else:
+            answers = self.gateway.verify_payment_statuses(transaction_ids)
+
+        expires = self._clock() + self.ttl
+        statuses = {}
+        with self._lock:
+            for transaction_id in transaction_ids:
+                status = answers.get(transaction_id) or {'status': 'not_found', 'message': 'Transaction not found'}
+                statuses[transaction_id] = status
+                # Not cached if the transaction was invalidated while we asked
+                if self._in_flight.get(transaction_id) is owned[transaction_id]:
+                    del self._in_flight[transaction_id]
+                    self._entries.pop(transaction_id, None)
+                    self._entries[transaction_id] = (status, None if status.get('status') in TERMINAL_STATUSES
+                                                     else expires)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                owned[transaction_id].set_result(status)
+        return statuses
+
+
+payment_statuses = PaymentStatusCache()
@@ -0,0 +1,258 @@
+"""
+Query Stats Module - Latency histograms and slow-query plans for database.py statements
+
+Off by default. enable() makes database.get_db_connection hand out
+TracedConnections, whose statements are timed from execute until their
+results are used up (fetchall, the last row, or the cursor being dropped)
+and counted per normalized SQL (literals and IN lists folded to ?).
+
+A statement slower than `slow_ms` is logged to the 'library.queries'
+logger with its EXPLAIN QUERY PLAN, flagging full scans of the tables that
+grow with the library (borrow_records, books). Disabled, connections are
+plain sqlite3 ones and nothing is measured.
+"""
+
+import bisect
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import database
+
+logger = logging.getLogger('library.queries')
+
+DEFAULT_SLOW_MS = 100.0
+# Histogram bucket upper bounds in milliseconds; one more bucket holds anything slower
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+SCAN_TABLES = ('borrow_records', 'books')
+MAX_STATEMENTS = 1000  # distinct normalized statements tracked
+MAX_SLOW = 100         # recent slow statements kept for the report
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+# SQLite before 3.36 writes "SCAN TABLE books", later versions "SCAN books"
+_SCAN_STEP = re.compile(r'SCAN (?:TABLE )?(\w+)')
+_TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_NOT_ALIASES = {'WHERE', 'JOIN', 'LEFT', 'INNER', 'CROSS', 'NATURAL', 'ON', 'USING', 'ORDER', 'GROUP',
+                'LIMIT', 'UNION', 'EXCEPT', 'INTERSECT', 'INDEXED', 'NOT', 'WINDOW', 'HAVING', 'SET'}
+
+
+def normalize_sql(sql: str) -> str:
+    """One line per statement shape: literals become ? and IN lists of any length IN (?)."""
+    sql = _LITERAL.sub('?', _SPACE.sub(' ', sql).strip())
+    return _IN_LIST.sub('IN (?)', sql)
+
+
+def full_scans(plan: List[str], sql: str) -> List[str]:
+    """Flagged tables some plan step reads every row of (with or without an index)."""
+    names = {table: table for table in SCAN_TABLES}
+    for table, alias in _TABLE_ALIAS.findall(sql):
+        if table in SCAN_TABLES and alias and alias.upper() not in _NOT_ALIASES:
+            names[alias] = table  # plans name aliased tables by their alias
+    scanned = (_SCAN_STEP.match(step) for step in plan)
+    return sorted({names[match.group(1)] for match in scanned if match and match.group(1) in names})
+
+
+class QueryStats:
+    """Per-statement latency histograms plus the most recent slow statements."""
+
+    def __init__(self, slow_ms: float = DEFAULT_SLOW_MS):
+        self.enabled = False
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+        self._normalized: Dict[str, str] = {}
+        self._plans: Dict[str, List[str]] = {}
+        self._slow: deque = deque(maxlen=MAX_SLOW)
+
+    def enable(self, slow_ms: Optional[float] = None) -> None:
+        """Start timing statements on connections opened from now on."""
+        if slow_ms is not None:
+            self.slow_ms = slow_ms
+        self.enabled = True
+        database.set_connection_factory(TracedConnection)
+
+    def disable(self) -> None:
+        """Go back to plain connections (statistics are kept until reset)."""
+        self.enabled = False
+        database.set_connection_factory(None)
+
+    def reset(self) -> None:
+        """Forget every statement's statistics, plans and the slow statements."""
+        with self._lock:
+            self._stats.clear()
+            self._plans.clear()
+            self._slow.clear()
+
+    def _key(self, sql: str) -> str:
+        key = self._normalized.get(sql)
+        if key is None:
+            if len(self._normalized) >= 4 * MAX_STATEMENTS:
+                self._normalized.clear()  # e.g. many IN list lengths; cheap to recompute
+            key = self._normalized[sql] = normalize_sql(sql)
+        return key
+
+    def record(self, sql: str, seconds: float, conn: Optional[sqlite3.Connection] = None,
+               parameters=None) -> None:
+        """
+        Count one execution of `sql`; if it was slow, log it with its query
+        plan (explained on `conn` with `parameters`, once per statement shape).
+        """
+        key = self._key(sql)
+        ms = seconds * 1000
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= MAX_STATEMENTS:
+                    return
+                stats = self._stats[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                            'buckets': [0] * (len(BUCKETS_MS) + 1)}
+            stats['count'] += 1
+            stats['total_ms'] += ms
+            stats['max_ms'] = max(stats['max_ms'], ms)
+            stats['buckets'][bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        if ms >= self.slow_ms:
+            self._log_slow(key, sql, ms, conn, parameters)
+
+    def _explain(self, key: str, sql: str, conn, parameters) -> List[str]:
+        plan = self._plans.get(key)
+        if plan is None and conn is not None and parameters is not None \
+                and sql.lstrip().upper().startswith(_EXPLAINABLE):
+            try:
+                # A plain cursor, so the EXPLAIN is not itself timed
+                rows = sqlite3.Cursor(conn).execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+            except sqlite3.Error:
+                return []  # e.g. the connection was closed before its cursor
+            plan = self._plans[key] = [row[3] for row in rows]
+        return plan or []
+
+    def _log_slow(self, key: str, sql: str, ms: float, conn, parameters) -> None:
+        plan = self._explain(key, sql, conn, parameters)
+        scans = full_scans(plan, sql)
+        self._slow.append({'sql': key, 'ms': round(ms, 3), 'plan': plan, 'full_scans': scans,
+                           'at': time.time()})
+        logger.warning('Slow query (%.1f ms)%s: %s%s', ms,
+                       ' with full scan of ' + ', '.join(scans) if scans else '',
+                       key, ''.join('\n    ' + step for step in plan))
+
+    def report(self, top: Optional[int] = None) -> Dict:
+        """Statements by total time with count, mean/max and percentiles (bucket bounds), and slow ones."""
+        with self._lock:
+            stats = [(key, dict(value, buckets=list(value['buckets']))) for key, value in self._stats.items()]
+            slow = list(self._slow)
+        stats.sort(key=lambda item: item[1]['total_ms'], reverse=True)
+        statements = []
+        for key, value in stats[:top]:
+            count = value['count']
+            entry = {'sql': key, 'count': count, 'total_ms': round(value['total_ms'], 3),
+                     'mean_ms': round(value['total_ms'] / count, 3), 'max_ms': round(value['max_ms'], 3)}
+            for name, share in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+                entry[name] = self._percentile(value['buckets'], count * share, value['max_ms'])
+            entry['histogram'] = {(f'<={bound}' if i < len(BUCKETS_MS) else f'>{BUCKETS_MS[-1]}'): n
+                                  for i, (bound, n) in enumerate(zip(BUCKETS_MS + (None,), value['buckets']))
+                                  if n}
+            statements.append(entry)
+        return {'enabled': self.enabled, 'slow_ms': self.slow_ms, 'statements': statements,
+                'slow': list(reversed(slow))}
+
+    @staticmethod
+    def _percentile(buckets: List[int], rank: float, max_ms: float) -> float:
+        """Upper bound of the bucket holding the rank-th fastest execution (capped at the max)."""
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, buckets):
+            seen += n
+            if seen >= rank:
+                return min(bound, round(max_ms, 3))
+        return round(max_ms, 3)
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor timing each statement from execute until its rows are used up."""
+
+    _sql = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._sql, self._parameters, self._elapsed = sql, parameters, time.perf_counter() - start
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            query_stats.record(sql, time.perf_counter() - start)
+
+    def _timed(self, fetch, *args):
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._elapsed += time.perf_counter() - start
+            self._finish()
+            raise
+        self._elapsed += time.perf_counter() - start
+        return row
+
+    def _finish(self) -> None:
+        sql = self._sql
+        if sql is not None:
+            self._sql = None
+            query_stats.record(sql, self._elapsed, self.connection, self._parameters)
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()  # conn.execute(...).fetchone() drops the cursor with rows left
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose execute/executemany go through a TracedCursor."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+query_stats = QueryStats()
@@ -0,0 +1,215 @@
+"""
+Search Index Module - Relevance-ranked multi-field search
+
+Prebuilt inverted index over book titles and authors scored with BM25F
+(per-field length normalization and weights), exact ISBN lookups, and typo
+tolerance through a trigram index of the vocabulary filtered by bounded
+edit distance. The best k hits are selected with a heap.
+"""
+
+import heapq
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from services.suggest_index import normalize
+
+# BM25 parameters and per-field weights (title, author)
+K1 = 1.2
+B = 0.75
+FIELDS = ('title', 'author')
+FIELD_WEIGHTS = (2.0, 1.0)
+ISBN_BOOST = 100.0
+# Score multiplier for a query term matched through a typo correction
+FUZZY_PENALTY = 0.6
+MIN_FUZZY_LENGTH = 4
+
+
+def tokenize(text: str) -> List[str]:
+    """Split normalized text into alphanumeric terms."""
+    cleaned = ''.join(c if c.isalnum() else ' ' for c in normalize(text))
+    return cleaned.split()
+
+
+def trigrams(term: str) -> set:
+    """Return the padded character trigrams of a term."""
+    padded = f'${term}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(term: str) -> int:
+    """Allowed edit distance for a term of this length."""
+    return 1 if len(term) <= 7 else 2
+
+
+def within_distance(a: str, b: str, limit: int) -> Optional[int]:
+    """
+    Edit distance between a and b if it is at most limit, else None.
+
+    Counts insertions, deletions, substitutions and adjacent transpositions
+    (optimal string alignment). Only cells within ``limit`` of the diagonal
+    are computed and the scan stops once a whole row exceeds the limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+
+    big = limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [big] * (len(b) + 1)
+        current[0] = i
+        lo = max(1, i - limit)
+        hi = min(len(b), i + limit)
+        for j in range(lo, hi + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current[max(0, lo - 1):hi + 1]) > limit:
+            return None
+        before, previous = previous, current
+
+    return previous[len(b)] if previous[len(b)] <= limit else None
+
+
+def normalize_isbn(text: str) -> str:
+    """Strip hyphens and spaces from an ISBN-like string."""
+    return text.replace('-', '').replace(' ', '')
+
+
+class SearchIndex:
+    """Inverted index with BM25F ranking and trigram-based typo tolerance."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self) -> None:
+        # term -> {book_id: (tf_title, tf_author)}
+        self._postings = defaultdict(dict)
+        # book_id -> (len_title, len_author)
+        self._lengths = {}
+        self._total_lengths = [0] * len(FIELDS)
+        self._isbns = {}
+        # trigram -> set of vocabulary terms
+        self._trigrams = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def _add(self, book: Dict) -> None:
+        """Index one book; caller holds the lock."""
+        book_id = book['id']
+        if book_id in self._lengths:
+            return
+
+        field_terms = [tokenize(book[field]) for field in FIELDS]
+        counts = defaultdict(lambda: [0] * len(FIELDS))
+        for f, terms in enumerate(field_terms):
+            for term in terms:
+                counts[term][f] += 1
+            self._total_lengths[f] += len(terms)
+
+        for term, tfs in counts.items():
+            postings = self._postings[term]
+            if not postings:
+                for gram in trigrams(term):
+                    self._trigrams[gram].add(term)
+            postings[book_id] = tuple(tfs)
+
+        self._lengths[book_id] = tuple(len(terms) for terms in field_terms)
+        self._isbns[normalize_isbn(book['isbn'])] = book_id
+
+    def add_book(self, book: Dict) -> None:
+        """Index a single book incrementally (used as an insert_book listener)."""
+        with self._lock:
+            self._add(book)
+
+    def rebuild(self, books: Iterable[Dict]) -> None:
+        """Replace the index contents with the given books."""
+        with self._lock:
+            self._clear()
+            for book in books:
+                self._add(book)
+
+    def _fuzzy_terms(self, term: str) -> List[Tuple[str, int]]:
+        """Vocabulary terms within the allowed edit distance of a term."""
+        if len(term) < MIN_FUZZY_LENGTH:
+            return []
+
+        limit = max_edits(term)
+        grams = trigrams(term)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self._trigrams.get(gram, ()):
+                shared[candidate] += 1
+
+        # Each edit destroys at most 3 trigrams
+        needed = max(1, len(grams) - 3 * limit)
+        matches = []
+        for candidate, count in shared.items():
+            if count >= needed:
+                distance = within_distance(term, candidate, limit)
+                if distance is not None:
+                    matches.append((candidate, distance))
+        return matches
+
+    def _term_scores(self, term: str, weight: float, num_docs: int, avg_lengths: List[float]) -> Dict[int, float]:
+        """BM25F score of every document containing the term."""
+        postings = self._postings.get(term)
+        if not postings:
+            return {}
+
+        idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+        scores = {}
+        for book_id, tfs in postings.items():
+            lengths = self._lengths[book_id]
+            tf = 0.0
+            for f, field_tf in enumerate(tfs):
+                if field_tf:
+                    norm = 1 - B + B * lengths[f] / avg_lengths[f]
+                    tf += FIELD_WEIGHTS[f] * field_tf / norm
+            scores[book_id] = weight * idf * tf * (K1 + 1) / (tf + K1)
+        return scores
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Rank books against a free-text query.
+
+        Args:
+            query: Words from the title and/or author, or an ISBN
+            k: Maximum number of results
+
+        Returns:
+            List[Tuple[int, float]]: [(book_id, score)] best first
+        """
+        with self._lock:
+            num_docs = len(self._lengths)
+            if num_docs == 0 or k <= 0:
+                return []
+            avg_lengths = [max(total / num_docs, 1.0) for total in self._total_lengths]
+
+            scores = defaultdict(float)
+            isbn_match = self._isbns.get(normalize_isbn(query.strip()))
+            if isbn_match is not None:
+                scores[isbn_match] += ISBN_BOOST
+
+            for term in set(tokenize(query)):
+                # Score each query term once per document, keeping its best expansion
+                best = {}
+                expansions = [(term, 1.0)] if term in self._postings else [
+                    (candidate, FUZZY_PENALTY ** distance) for candidate, distance in self._fuzzy_terms(term)
+                ]
+                for candidate, weight in expansions:
+                    for book_id, score in self._term_scores(candidate, weight, num_docs, avg_lengths).items():
+                        if score > best.get(book_id, 0.0):
+                            best[book_id] = score
+                for book_id, score in best.items():
+                    scores[book_id] += score
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+search_index = SearchIndex()
@@ -0,0 +1,128 @@
+"""
+Statements Module - Month-end patron statements generated in parallel
+
+The patron ID space is split into contiguous ranges. Each range is handled by
+a worker process with its own read-only connection, which fetches the open
+loans, holds and recent returns of every patron in the range with one query
+each (instead of several queries per patron) and writes one JSON Lines file.
+"""
+
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from database import get_readonly_connection, get_patron_range_activity, get_shard_path, current_branch, DEFAULT_BRANCH
+from services.fee_policy import FeePolicyRegistry, fee_policies, current_time
+
+PATRON_ID_LIMIT = 1000000  # Patron IDs are 6 digits
+# Ranges per worker; more, smaller ranges keep workers evenly loaded
+PARTITIONS_PER_WORKER = 4
+
+
+def patron_ranges(partitions: int) -> List[Tuple[str, str]]:
+    """Split the 6-digit patron ID space into contiguous inclusive ranges."""
+    step = -(-PATRON_ID_LIMIT // partitions)
+    return [(f'{start:06d}', f'{min(start + step, PATRON_ID_LIMIT) - 1:06d}')
+            for start in range(0, PATRON_ID_LIMIT, step)]
+
+
+def build_statements(activity: Dict[str, list], as_of: datetime,
+                     policies: FeePolicyRegistry = fee_policies, branch: str = DEFAULT_BRANCH) -> Dict[str, Dict]:
+    """Assemble per-patron statements from the rows of get_patron_range_activity."""
+    statements = defaultdict(lambda: {
+        'books': [], 'total_late_fees': 0, 'num_books_borrowed': 0, 'holds': [], 'returned': []
+    })
+
+    fee_cents = defaultdict(int)  # Totals in whole cents, converted to dollars once at the end
+    for loan in activity['open_loans']:
+        statement = statements[loan['patron_id']]
+        policy = policies.policy_for(loan['patron_id'], branch)
+        days_overdue = policy.days_overdue(datetime.fromisoformat(loan['due_date']), as_of)
+        statement['books'].append({
+            'book_id': loan['book_id'], 'title': loan['title'], 'author': loan['author'],
+            'due_date': loan['due_date'], 'days_overdue': days_overdue, 'fee_amount': policy.fee(days_overdue)
+        })
+        fee_cents[loan['patron_id']] += policy.fee_cents(days_overdue)
+        statement['num_books_borrowed'] += 1
+    for patron_id, cents in fee_cents.items():
+        statements[patron_id]['total_late_fees'] = cents / 100
+
+    for hold in activity['holds']:
+        statements[hold['patron_id']]['holds'].append({
+            'book_id': hold['book_id'], 'title': hold['title'], 'author': hold['author'], 'status': hold['status']
+        })
+
+    for loan in activity['returned']:
+        statements[loan['patron_id']]['returned'].append({
+            'book_id': loan['book_id'], 'title': loan['title'], 'author': loan['author'],
+            'borrow_date': loan['borrow_date'], 'return_date': loan['return_date']
+        })
+
+    return statements
+
+
+def write_partition(db_path: str, first_patron: str, last_patron: str, out_dir: str, as_of: datetime,
+                    period_start: datetime, policies: FeePolicyRegistry, branch: str) -> Tuple[str, int, int]:
+    """
+    Write the statements of one patron range (runs in a worker process).
+
+    Returns:
+        tuple: (file path, patrons written, total late fees in cents)
+    """
+    conn = get_readonly_connection(db_path)
+    try:
+        activity = get_patron_range_activity(conn, first_patron, last_patron, period_start)
+    finally:
+        conn.close()
+
+    statements = build_statements(activity, as_of, policies, branch)
+    path = os.path.join(out_dir, f'statements-{first_patron}-{last_patron}.jsonl')
+    total_cents = 0
+    with open(path, 'w', encoding='utf-8') as out:
+        for patron_id in sorted(statements):
+            statement = statements[patron_id]
+            total_cents += round(statement['total_late_fees'] * 100)
+            out.write(json.dumps({'patron_id': patron_id, 'as_of': as_of.isoformat(), **statement},
+                                 separators=(',', ':')) + '\n')
+    return path, len(statements), total_cents
+
+
+def generate_statements(out_dir: str, workers: Optional[int] = None, partitions: Optional[int] = None,
+                        as_of: Optional[datetime] = None, period_start: Optional[datetime] = None) -> Dict:
+    """
+    Write statements for every patron with open loans, holds or returns in
+    the period, one file per patron range.
+
+    Args:
+        out_dir: Directory for the statement files (created if missing)
+        workers: Worker processes (default: CPU count)
+        partitions: Patron ranges (default: PARTITIONS_PER_WORKER per worker)
+        as_of: Time fees are computed at (default: now)
+        period_start: Returns on or after this time are listed (default: start of as_of's month)
+
+    Returns:
+        Dict: {'files': List[str], 'patrons': int, 'total_late_fees': float}
+    """
+    workers = workers or os.cpu_count() or 1
+    partitions = partitions or workers * PARTITIONS_PER_WORKER
+    as_of = as_of or current_time()
+    period_start = period_start or as_of.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    os.makedirs(out_dir, exist_ok=True)
+    db_path = os.path.abspath(get_shard_path())
+    branch = current_branch() or DEFAULT_BRANCH
+
+    files, patrons, total_cents = [], 0, 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(write_partition, db_path, first, last, out_dir, as_of, period_start,
+                               fee_policies, branch)
+                   for first, last in patron_ranges(partitions)]
+        for future in futures:
+            path, count, cents = future.result()
+            files.append(path)
+            patrons += count
+            total_cents += cents
+
+    return {'files': files, 'patrons': patrons, 'total_late_fees': total_cents / 100}
@@ -0,0 +1,263 @@
+"""
+Suggest Index Module - In-memory prefix index for title/author type-ahead
+
+Keys are kept in a sorted array so the entries for a prefix are one binary
+search away. Each entry is packed into a single string
+``key\\0type\\0display`` to keep the footprint small, and per-entry book
+counts live in a parallel ``array``. A lookup returns the entries with the
+most books, so a prolific author comes before a one-off alphabetical
+neighbour.
+
+Short prefixes match a large share of the catalog, so every prefix matching
+more than ``TOP_RANGE`` entries has its best ``TOP_K`` entries per type
+precomputed (children's lists merged into their parent's, bottom up); those
+lookups read a short list whatever the catalog size. Longer prefixes scan
+their range, which holds at most ``TOP_RANGE`` main entries.
+
+Incremental inserts go into a small sorted delta buffer that is merged into
+the main array once it grows past ``DELTA_LIMIT``, so adding a book never
+shifts the whole main array. Counts only grow, so an insert keeps the
+precomputed lists exact by updating the lists of its key's prefixes.
+"""
+
+import sys
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from heapq import merge
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Leading articles ignored when filing titles ("The Great Gatsby" -> "great gatsby")
+LEADING_ARTICLES = ('the ', 'a ', 'an ')
+SUGGEST_TYPES = ('title', 'author')
+DELTA_LIMIT = 65536
+SEP = '\0'
+PREFIX_END = '\U0010ffff'  # sorts after any character that can follow a prefix
+TOP_RANGE = 1024  # prefixes matching more main entries than this get precomputed top lists
+TOP_K = 50        # suggestions kept per type in a precomputed list (the API's largest k)
+
+
+def normalize(text: str) -> str:
+    """Casefold, strip accents and collapse whitespace for prefix matching."""
+    if not text.isascii():
+        decomposed = unicodedata.normalize('NFKD', text)
+        text = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(text.casefold().split())
+
+
+def _keys_for(text: str, kind: str) -> List[str]:
+    """Return the index keys for a title or author."""
+    key = normalize(text)
+    keys = [key] if key else []
+    if kind == 'title':
+        for article in LEADING_ARTICLES:
+            if key.startswith(article) and len(key) > len(article):
+                keys.append(key[len(article):])
+                break
+    return keys
+
+
+def _entries_for(book: Dict) -> Iterable[str]:
+    """Yield the packed index entries for a book."""
+    for kind in SUGGEST_TYPES:
+        text = book[kind]
+        for key in _keys_for(text, kind):
+            yield f'{key}{SEP}{kind}{SEP}{text}'
+
+
+def _find(entries: List[str], entry: str) -> int:
+    """Return the position of entry in a sorted list, or -1."""
+    i = bisect_left(entries, entry)
+    return i if i < len(entries) and entries[i] == entry else -1
+
+
+def _best(candidates: Iterable[Tuple[int, str]], k: int) -> Dict[str, List[Tuple[int, str]]]:
+    """
+    The best k (-count, entry) candidates per type, most books first and
+    alphabetical among equal counts. A title filed under two keys (with and
+    without its article) is kept once.
+    """
+    best = {kind: [] for kind in SUGGEST_TYPES}
+    seen = set()
+    for item in sorted(candidates):
+        _, kind, text = item[1].split(SEP, 2)
+        if len(best[kind]) < k and (kind, text) not in seen:
+            seen.add((kind, text))
+            best[kind].append(item)
+    return best
+
+
+def _build_top(entries: List[str], counts: array) -> Dict[str, Dict[str, List[Tuple[int, str]]]]:
+    """Precomputed best entries per type for every prefix matching more than TOP_RANGE entries."""
+    top = {}
+
+    def visit(prefix: str, lo: int, hi: int) -> List[Tuple[int, str]]:
+        depth = len(prefix)
+        candidates = []
+        i = lo
+        while i < hi:
+            entry = entries[i]
+            if entry[depth] == SEP:
+                # The key is the prefix itself
+                candidates.append((-counts[i], entry))
+                i += 1
+                continue
+            child = prefix + entry[depth]
+            j = bisect_left(entries, child + PREFIX_END, i, hi)
+            if j - i > TOP_RANGE:
+                candidates.extend(visit(child, i, j))
+            else:
+                best = _best(((-counts[n], entries[n]) for n in range(i, j)), TOP_K)
+                candidates.extend(item for kind in SUGGEST_TYPES for item in best[kind])
+            i = j
+        best = top[prefix] = _best(candidates, TOP_K)
+        return [item for kind in SUGGEST_TYPES for item in best[kind]]
+
+    if len(entries) > TOP_RANGE:
+        visit('', 0, len(entries))
+        del top['']  # an empty prefix suggests nothing
+    return top
+
+
+class SuggestIndex:
+    """Sorted-array prefix index of normalized titles and authors."""
+
+    def __init__(self):
+        self._entries = []
+        self._counts = array('I')
+        self._delta = []
+        self._delta_counts = array('I')
+        self._top: Dict[str, Dict[str, List[Tuple[int, str]]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._delta)
+
+    def add_book(self, book: Dict) -> None:
+        """Index a single book incrementally (used as an insert_book listener)."""
+        with self._lock:
+            for entry in _entries_for(book):
+                i = _find(self._entries, entry)
+                if i >= 0:
+                    self._counts[i] += 1
+                    count = self._counts[i]
+                else:
+                    j = bisect_left(self._delta, entry)
+                    if j < len(self._delta) and self._delta[j] == entry:
+                        self._delta_counts[j] += 1
+                        count = self._delta_counts[j]
+                    else:
+                        self._delta.insert(j, entry)
+                        self._delta_counts.insert(j, 1)
+                        count = 1
+                self._update_top(entry, count)
+
+            if len(self._delta) > DELTA_LIMIT:
+                self._merge_delta()
+
+    def _update_top(self, entry: str, count: int) -> None:
+        """Put an entry's new count into its prefixes' precomputed lists; caller holds the lock."""
+        key, kind, text = entry.split(SEP, 2)
+        for depth in range(1, len(key) + 1):
+            top = self._top.get(key[:depth])
+            if top is None:
+                return  # a prefix's extensions match fewer entries, so none of them has a list
+            best = top[kind]
+            for n, (_, listed) in enumerate(best):
+                if listed.split(SEP, 2)[2] == text:
+                    del best[n]
+                    entry = listed  # keep the key it is listed under
+                    break
+            if len(best) < TOP_K or (-count, entry) < best[-1]:
+                insort(best, (-count, entry))
+                del best[TOP_K:]
+
+    def _merge_delta(self) -> None:
+        """Fold the delta buffer into the main array; caller holds the lock."""
+        merged = list(merge(zip(self._entries, self._counts), zip(self._delta, self._delta_counts)))
+        self._entries = [entry for entry, _ in merged]
+        self._counts = array('I', (count for _, count in merged))
+        self._delta = []
+        self._delta_counts = array('I')
+        self._top = _build_top(self._entries, self._counts)
+
+    def rebuild(self, books: Iterable[Dict]) -> None:
+        """Replace the index contents with the given books in one sort."""
+        counts = {}
+        for book in books:
+            for entry in _entries_for(book):
+                counts[entry] = counts.get(entry, 0) + 1
+
+        entries = sorted(counts)
+        entry_counts = array('I', (counts[entry] for entry in entries))
+        del counts
+        top = _build_top(entries, entry_counts)
+
+        with self._lock:
+            self._entries = entries
+            self._counts = entry_counts
+            self._delta = []
+            self._delta_counts = array('I')
+            self._top = top
+
+    @staticmethod
+    def _scan(entries: List[str], counts: array, key: str) -> Iterable[Tuple[int, str]]:
+        """(-count, entry) for the entries whose key starts with the given prefix."""
+        lo = bisect_left(entries, key)
+        hi = bisect_left(entries, key + PREFIX_END, lo)
+        return ((-counts[i], entries[i]) for i in range(lo, hi))
+
+    def suggest(self, prefix: str, k: int = 10, kind: Optional[str] = None) -> List[Dict]:
+        """
+        Return up to k completions for a prefix, most books first
+        (alphabetical among equal counts).
+
+        Args:
+            prefix: Text typed so far
+            k: Maximum number of suggestions
+            kind: 'title', 'author' or None for both
+
+        Returns:
+            List[Dict]: [{'text': str, 'type': str, 'count': int}]
+        """
+        key = normalize(prefix)
+        if not key or k <= 0:
+            return []
+
+        with self._lock:
+            best = self._top.get(key) if k <= TOP_K else None
+            if best is not None:
+                best = {entry_kind: list(items) for entry_kind, items in best.items()}
+            else:
+                candidates = self._scan(self._entries, self._counts, key)
+                if self._delta:
+                    candidates = chain(candidates, self._scan(self._delta, self._delta_counts, key))
+                best = _best(candidates, k)
+
+        if kind is not None:
+            top = best[kind][:k]
+        else:
+            top = list(merge(*(best[entry_kind] for entry_kind in SUGGEST_TYPES)))[:k]
+        results = []
+        for count, entry in top:
+            _, entry_kind, text = entry.split(SEP, 2)
+            results.append({'text': text, 'type': entry_kind, 'count': -count})
+        return results
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index (arrays, entry strings and precomputed lists)."""
+        total = 0
+        for entries, counts in ((self._entries, self._counts), (self._delta, self._delta_counts)):
+            total += sys.getsizeof(entries) + sys.getsizeof(counts)
+            total += sum(sys.getsizeof(entry) for entry in entries)
+        total += sys.getsizeof(self._top)
+        for prefix, best in self._top.items():
+            total += sys.getsizeof(prefix) + sys.getsizeof(best)
+            for items in best.values():
+                total += sys.getsizeof(items) + sum(sys.getsizeof(item) for item in items)
+        return total
+
+
+suggest_index = SuggestIndex()
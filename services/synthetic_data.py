@@ -0,0 +1,268 @@
+"""
+Synthetic Data Module - Large, realistic, reproducible library datasets
+
+Fills an empty database with authors, books and copies, and several years
+of loans (with their loan events) for a population of patrons. The same
+seed always produces the same data.
+
+- Books get valid ISBN-13s and 1-8 copies, more for popular titles.
+- Which book is borrowed follows a Zipf distribution over a shuffled
+  popularity ranking, and patron activity is skewed the same way.
+- Most loans come back within the loan period; ``overdue_rate`` of them
+  come back late, by a geometrically distributed number of days. Loans that
+  would come back after ``now`` are still open.
+
+Rows are generated day by day in borrow order and bulk-loaded with
+executemany in large transactions.
+"""
+
+import heapq
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from database import (
+    get_db_connection, normalize_author_key, COPY_AVAILABLE, COPY_ON_LOAN, DEFAULT_BRANCH,
+    EVENT_BORROWED, EVENT_RETURNED
+)
+from services.fee_policy import default_fee_policy
+
+PATRON_LIMIT = 999999  # Patron IDs are 6 digits
+MAX_OPEN_LOANS = 5
+
+FIRST_NAMES = ('Ada', 'Alan', 'Alice', 'Amara', 'Ben', 'Chen', 'Clara', 'Dmitri', 'Elena', 'Emeka',
+               'Farah', 'George', 'Hana', 'Ines', 'Ivan', 'James', 'Jun', 'Kofi', 'Lena', 'Lucia',
+               'Mara', 'Mateo', 'Mei', 'Nadia', 'Noah', 'Olga', 'Omar', 'Priya', 'Rafael', 'Rosa',
+               'Sam', 'Sofia', 'Tariq', 'Una', 'Victor', 'Wen', 'Yara', 'Yusuf', 'Zoe', 'Zora')
+LAST_NAMES = ('Abe', 'Adeyemi', 'Bauer', 'Brooks', 'Castillo', 'Chen', 'Costa', 'Dubois', 'Eriksen',
+              'Fischer', 'Garcia', 'Gupta', 'Haddad', 'Hughes', 'Ivanova', 'Jensen', 'Kato', 'Khan',
+              'Kowalski', 'Larsen', 'Lopez', 'Mbeki', 'Moreau', 'Murphy', 'Nakamura', 'Novak', 'Okafor',
+              'Olsen', 'Park', 'Patel', 'Quinn', 'Rossi', 'Santos', 'Schmidt', 'Silva', 'Tanaka',
+              'Torres', 'Usman', 'Varga', 'Wang', 'Weber', 'Xu', 'Young', 'Zhang', 'Zielinski')
+TITLE_ADJECTIVES = ('Silent', 'Hidden', 'Last', 'Broken', 'Golden', 'Distant', 'Forgotten', 'Burning',
+                    'Quiet', 'Endless', 'Secret', 'Winter', 'Crimson', 'Lost', 'Wild', 'Hollow')
+TITLE_NOUNS = ('River', 'Garden', 'Empire', 'Letter', 'Mountain', 'Harbor', 'Kingdom', 'Orchard',
+               'Mirror', 'Island', 'Archive', 'Station', 'Lantern', 'Voyage', 'Forest', 'Machine')
+TITLE_PLACES = ('the North', 'Glass', 'Tomorrow', 'the Sea', 'Ash', 'the City', 'Stars', 'Memory')
+
+
+# Weighted digit sums of 3-digit groups for the ISBN-13 check digit (weights
+# alternate 1, 3 from the first digit, so groups at odd and even offsets differ)
+_ISBN_313 = [3 * (n // 100) + (n // 10 % 10) + 3 * (n % 10) for n in range(1000)]
+_ISBN_131 = [(n // 100) + 3 * (n // 10 % 10) + (n % 10) for n in range(1000)]
+_ISBN_PREFIX_SUM = 9 + 3 * 7 + 8  # "978"
+
+
+def isbn13(n: int) -> str:
+    """The n-th "978" ISBN-13 (n < 10**9), with a valid check digit."""
+    high, low = divmod(n, 1000)
+    top, mid = divmod(high, 1000)
+    total = _ISBN_PREFIX_SUM + _ISBN_313[top] + _ISBN_131[mid] + _ISBN_313[low]
+    return f'978{n:09d}{-total % 10}'
+
+
+def zipf_cum_weights(n: int, s: float) -> List[float]:
+    """Cumulative Zipf weights for ranks 1..n (for random.choices)."""
+    return list(itertools.accumulate(1 / rank ** s for rank in range(1, n + 1)))
+
+
+def author_name(n: int) -> str:
+    """A distinct author name for every n."""
+    first = FIRST_NAMES[n % len(FIRST_NAMES)]
+    n //= len(FIRST_NAMES)
+    last = LAST_NAMES[n % len(LAST_NAMES)]
+    n //= len(LAST_NAMES)
+    if n == 0:
+        return f'{first} {last}'
+    initial = chr(ord('A') + (n - 1) % 26)
+    return f'{first} {initial}. {last}' + (f' {(n - 1) // 26 + 1}' if n > 26 else '')
+
+
+_TITLES = [f'The {adjective} {noun}' for adjective in TITLE_ADJECTIVES for noun in TITLE_NOUNS]
+_PLACE_TITLES = [f'{title} of {place}' for title in _TITLES for place in TITLE_PLACES]
+
+
+def generate_library(books: int = 10000, patrons: int = 5000, years: float = 3.0,
+                     loans_per_patron_year: float = 12.0, overdue_rate: float = 0.12,
+                     seed: int = 42, now: Optional[datetime] = None, batch_size: int = 100000,
+                     events: bool = True) -> Dict:
+    """
+    Fill the current (empty) database with a synthetic library.
+
+    Args:
+        books: Number of books (one author per ~8 books)
+        patrons: Number of active patrons (at most 999999)
+        years: Length of the loan history, ending at now
+        loans_per_patron_year: Average loans per patron per year
+        overdue_rate: Share of loans returned after the due date
+        seed: Random seed; the same arguments and seed give the same data
+        now: End of the history (default: now); loans not yet returned at now stay open
+        batch_size: Rows per executemany/transaction
+        events: Also write the matching borrowed/returned loan_events
+
+    Returns:
+        Dict: Row counts per table, 'open_loans', 'seconds' and 'rows_per_second'
+
+    Raises:
+        ValueError: If the arguments are out of range or the database already has books
+    """
+    if books < 1 or not 1 <= patrons <= PATRON_LIMIT or years <= 0 or not 0 <= overdue_rate <= 1:
+        raise ValueError("Invalid dataset size.")
+
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    rand = rng.random
+    now = now or datetime.now()
+    loan_days = default_fee_policy.loan_days
+
+    conn = get_db_connection()
+    try:
+        if conn.execute('SELECT EXISTS (SELECT 1 FROM books)').fetchone()[0]:
+            raise ValueError("The database already has books.")
+        # A failed load leaves a database to throw away, so skip durability.
+        # Secondary indexes are built once at the end instead of row by row,
+        # and the copies triggers are off while books get their final counts
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('PRAGMA journal_mode = MEMORY')
+        conn.execute('PRAGMA cache_size = -262144')
+        deferred = conn.execute('''
+            SELECT type, name, sql FROM sqlite_master
+            WHERE type IN ('index', 'trigger') AND tbl_name IN ('books', 'copies', 'borrow_records')
+              AND sql IS NOT NULL
+        ''').fetchall()
+        for item in deferred:
+            conn.execute(f'DROP {item["type"].upper()} {item["name"]}')
+        counts = {'authors': 0, 'books': 0, 'copies': 0, 'borrow_records': 0, 'loan_events': 0}
+
+        def flush(sql: str, rows: List[tuple], table: str) -> None:
+            if rows:
+                conn.executemany(sql, rows)
+                conn.commit()
+                counts[table] += len(rows)
+                rows.clear()
+
+        # Authors
+        authors = [author_name(n) for n in range(max(1, books // 8))]
+        flush('INSERT INTO authors (id, name, name_key) VALUES (?, ?, ?)',
+              [(n, name, normalize_author_key(name)) for n, name in enumerate(authors, 1)], 'authors')
+
+        # Popularity: rank r (Zipf) -> book ID, and copies by rank
+        by_rank = list(range(1, books + 1))
+        rng.shuffle(by_rank)
+        copies = [0] * (books + 1)
+        for rank, book_id in enumerate(by_rank, 1):
+            copies[book_id] = max(1, min(8, round(8 / rank ** 0.25 + rand() - 0.5)))
+        first_copy = list(itertools.accumulate(copies, initial=1))  # first_copy[b] = ID of book b's first copy
+        book_weights = zipf_cum_weights(books, 1.0)
+
+        patron_ids = [f'{n:06d}' for n in rng.sample(range(1, PATRON_LIMIT + 1), patrons)]
+        patron_weights = zipf_cum_weights(patrons, 0.6)
+
+        # Loans, day by day in borrow order; returns wait in a heap so the
+        # events stay in time order
+        on_loan = [0] * (books + 1)   # open loans per book at now
+        open_by_patron: Dict[str, int] = {}
+        returns = []
+        loan_rows, event_rows = [], []
+        loan_sql = '''INSERT INTO borrow_records (id, patron_id, book_id, borrow_date, due_date, return_date, copy_id)
+                      VALUES (?, ?, ?, ?, ?, ?, ?)'''
+        event_sql = '''INSERT INTO loan_events (event_type, patron_id, book_id, loan_id, copy_id, occurred_at)
+                       VALUES (?, ?, ?, ?, ?, ?)'''
+
+        first_day = (now - timedelta(days=years * 365)).replace(hour=0, minute=0, second=0, microsecond=0)
+        days = (now - first_day).days + 1
+        per_day = patrons * loans_per_patron_year / 365
+        loan_id = 0
+        for day in range(days):
+            midnight = first_day + timedelta(days=day)
+            weekday_factor = 1.3 if midnight.weekday() == 5 else 0.6 if midnight.weekday() == 6 else 1.0
+            count = round(per_day * weekday_factor * rng.uniform(0.8, 1.2))
+            # Opening hours 9:00-20:00
+            seconds = sorted(rng.uniform(9 * 3600, 20 * 3600) for _ in range(count))
+            borrowers = rng.choices(patron_ids, cum_weights=patron_weights, k=count)
+            ranks = rng.choices(by_rank, cum_weights=book_weights, k=count)
+
+            for second, patron_id, book_id in zip(seconds, borrowers, ranks):
+                borrowed = midnight + timedelta(seconds=second)
+                if borrowed > now:
+                    break
+                due = borrowed + timedelta(days=loan_days)
+                if rand() < overdue_rate:
+                    returned = due + timedelta(days=min(60, int(rng.expovariate(1 / 5)) + 1), hours=rng.uniform(0, 8))
+                else:
+                    returned = borrowed + timedelta(days=rng.triangular(0.1, loan_days - 0.1, loan_days * 0.8))
+
+                if returned > now:
+                    # Still out at now if a copy is free and the patron is under the limit
+                    if on_loan[book_id] < copies[book_id] and open_by_patron.get(patron_id, 0) < MAX_OPEN_LOANS:
+                        copy_id = first_copy[book_id] + on_loan[book_id]
+                        on_loan[book_id] += 1
+                        open_by_patron[patron_id] = open_by_patron.get(patron_id, 0) + 1
+                        returned = None
+                    else:
+                        returned = borrowed + (now - borrowed) * rand()
+                if returned is not None:
+                    copy_id = first_copy[book_id] + int(rand() * copies[book_id])
+
+                borrow_date = borrowed.isoformat()
+                while events and returns and returns[0][0] <= borrow_date:
+                    event_rows.append(heapq.heappop(returns)[1])
+                loan_id += 1
+                return_date = returned.isoformat() if returned else None
+                loan_rows.append((loan_id, patron_id, book_id, borrow_date, due.isoformat(), return_date, copy_id))
+                if events:
+                    event_rows.append((EVENT_BORROWED, patron_id, book_id, loan_id, copy_id, borrow_date))
+                    if returned:
+                        heapq.heappush(returns, (return_date, (EVENT_RETURNED, patron_id, book_id, loan_id,
+                                                               copy_id, return_date)))
+
+                if len(loan_rows) >= batch_size:
+                    flush(loan_sql, loan_rows, 'borrow_records')
+                if len(event_rows) >= batch_size:
+                    flush(event_sql, event_rows, 'loan_events')
+
+        flush(loan_sql, loan_rows, 'borrow_records')
+        while returns:
+            event_rows.append(heapq.heappop(returns)[1])
+            if len(event_rows) >= batch_size:
+                flush(event_sql, event_rows, 'loan_events')
+        flush(event_sql, event_rows, 'loan_events')
+
+        copy_rows = []
+        for book_id in range(1, books + 1):
+            for n in range(copies[book_id]):
+                copy_rows.append((first_copy[book_id] + n, f'BK{book_id:06d}-{n + 1:03d}', book_id,
+                                  COPY_ON_LOAN if n < on_loan[book_id] else COPY_AVAILABLE, DEFAULT_BRANCH))
+            if len(copy_rows) >= batch_size:
+                flush('INSERT INTO copies (id, barcode, book_id, status, branch) VALUES (?, ?, ?, ?, ?)',
+                      copy_rows, 'copies')
+        flush('INSERT INTO copies (id, barcode, book_id, status, branch) VALUES (?, ?, ?, ?, ?)',
+              copy_rows, 'copies')
+
+        book_rows = []
+        for book_id in range(1, books + 1):
+            author = int(rand() * len(authors))
+            title = (_PLACE_TITLES[int(rand() * len(_PLACE_TITLES))] if rand() < 0.3
+                     else _TITLES[int(rand() * len(_TITLES))])
+            book_rows.append((book_id, title, authors[author], isbn13(book_id),
+                              copies[book_id], copies[book_id] - on_loan[book_id], author + 1))
+            if len(book_rows) >= batch_size:
+                flush('''INSERT INTO books (id, title, author, isbn, total_copies, available_copies, author_id)
+                         VALUES (?, ?, ?, ?, ?, ?, ?)''', book_rows, 'books')
+        flush('''INSERT INTO books (id, title, author, isbn, total_copies, available_copies, author_id)
+                 VALUES (?, ?, ?, ?, ?, ?, ?)''', book_rows, 'books')
+
+        for item in deferred:
+            conn.execute(item['sql'])
+        # The version triggers were off too; tell caches the catalog changed
+        conn.execute('UPDATE catalog_version SET version = version + 1')
+        conn.commit()
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    rows = sum(counts.values())
+    return {**counts, 'open_loans': sum(on_loan), 'seconds': round(elapsed, 2),
+            'rows_per_second': round(rows / elapsed) if elapsed else rows}
@@ -0,0 +1,108 @@
+import sqlite3
+import pytest
+from app import create_app
+from routes.admission import AdmissionController, MemoryBucketStore, SQLiteBucketStore
+from database import reset_test_additions
+
+
+def make_client(**kwargs):
+    reset_test_additions()
+    return create_app(admission=AdmissionController(**kwargs)).test_client()
+
+
+def test_token_bucket_refills():
+    """Test that a bucket allows a burst, then refills at the configured rate"""
+    store = MemoryBucketStore()
+
+    allowed = [store.take("k", 2.0, 3, 100.0)[0] for _ in range(4)]
+    retry_after = store.take("k", 2.0, 3, 100.0)[1]
+
+    assert allowed == [True, True, True, False]
+    assert retry_after == pytest.approx(0.5)
+    assert store.take("k", 2.0, 3, 100.5)[0]
+
+def test_sqlite_store_is_shared(tmp_path):
+    """Test that two stores on the same file draw from the same bucket"""
+    path = str(tmp_path / "limits.db")
+    first, second = SQLiteBucketStore(path), SQLiteBucketStore(path)
+
+    assert first.take("k", 1.0, 2, 100.0)[0]
+    assert second.take("k", 1.0, 2, 100.0)[0]
+    assert not first.take("k", 1.0, 2, 100.0)[0]
+
+def test_search_rate_limited_per_ip():
+    """Test that search answers 429 with Retry-After once the burst is used"""
+    client = make_client(limits={"search": (0.001, 2, ("api.search_books_api",))})
+
+    statuses = [client.get("/api/search?q=gatsby").status_code for _ in range(3)]
+    response = client.get("/api/search?q=gatsby")
+
+    assert statuses == [200, 200, 429]
+    assert int(response.headers["Retry-After"]) >= 1
+    assert client.get("/catalog").status_code == 200 # Other endpoints are not limited
+
+def test_borrow_rate_limited_per_patron():
+    """Test that a patron is limited across client IPs"""
+    client = make_client(limits={"borrow": (0.001, 1, ("api.place_hold_api",))})
+
+    first = client.post("/api/holds", json={"patron_id": "654321", "book_id": 3},
+                        environ_base={"REMOTE_ADDR": "10.0.0.1"})
+    second = client.post("/api/holds", json={"patron_id": "654321", "book_id": 3},
+                         environ_base={"REMOTE_ADDR": "10.0.0.2"})
+    other = client.post("/api/holds", json={"patron_id": "111111", "book_id": 3},
+                        environ_base={"REMOTE_ADDR": "10.0.0.3"})
+
+    assert first.status_code == 201
+    assert second.status_code == 429
+    assert other.status_code == 201
+
+def test_load_shedding_when_full():
+    """Test that requests beyond max_in_flight get 503 without running the handler"""
+    controller = AdmissionController(max_in_flight=1)
+    reset_test_additions()
+    client = create_app(admission=controller).test_client()
+
+    controller.enter() # Another request is already being handled
+    shed = client.get("/catalog")
+    controller.leave()
+    served = client.get("/catalog")
+
+    assert shed.status_code == 503
+    assert served.status_code == 200
+    assert controller.snapshot()["in_flight"] == 0
+
+def test_metrics_count_rejections():
+    """Test that the metrics endpoint reports shed and rate-limited requests"""
+    client = make_client(limits={"search": (0.001, 1, ("api.search_books_api",))})
+
+    client.get("/api/search?q=gatsby")
+    client.get("/api/search?q=gatsby")
+    metrics = client.get("/admission/metrics").get_json()
+
+    assert metrics["rate_limited"]["search"] == 1
+    assert metrics["admitted"] == 2
+    assert metrics["shed"] == 0
+
+def test_json_array_body_reaches_handler_validation():
+    """Test that a non-object JSON body gets the handler's 400 rather than crashing admission"""
+    client = make_client()
+
+    assert client.post("/api/jobs/refunds", json=[1, 2]).status_code == 400
+    assert client.post("/api/payments/status", json=["txn_1"]).status_code == 400
+
+def test_locked_sqlite_store_admits_and_counts(tmp_path):
+    """Test that a shared store locked by another process admits the request and counts the error"""
+    path = str(tmp_path / "limits.db")
+    controller = AdmissionController(SQLiteBucketStore(path, timeout=0.01))
+    reset_test_additions()
+    client = create_app(admission=controller).test_client()
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        response = client.get("/api/search?q=gatsby")
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+    assert response.status_code == 200
+    assert controller.snapshot()["store_errors"] == 1
@@ -0,0 +1,84 @@
+import pytest
+from services.library_service import (
+    borrow_book_by_patron,
+    return_book_by_patron,
+    get_patron_status_report
+)
+from database import (
+    reset_test_additions,
+    archive_returned_loans,
+    get_patron_borrow_history,
+    get_patron_borrow_count,
+    get_db_connection
+)
+from datetime import datetime, timedelta
+
+
+def add_returned_loan(patron_id, book_id, days_ago):
+    """Insert a loan returned the given number of days ago"""
+    conn = get_db_connection()
+    returned = datetime.now() - timedelta(days=days_ago)
+    conn.execute("""
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?)
+    """, (patron_id, book_id, (returned - timedelta(days=10)).isoformat(),
+          (returned + timedelta(days=4)).isoformat(), returned.isoformat()))
+    conn.commit()
+    conn.close()
+
+def table_count(table):
+    conn = get_db_connection()
+    count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_archive_moves_only_old_returned_loans():
+    """Test that only loans returned before the cutoff are moved, in batches"""
+    reset_test_additions()
+
+    for days_ago in (400, 500, 600):
+        add_returned_loan("654321", 1, days_ago)
+    add_returned_loan("654321", 2, 10)
+
+    archived = archive_returned_loans(older_than_days=365, batch_size=2)
+
+    assert archived == 3
+    assert table_count("borrow_records_archive") == 3
+    assert table_count("borrow_records") == 2 # Recent loan plus the sample open loan
+    assert get_patron_borrow_count("123456") == 1
+
+def test_history_unions_live_and_archive():
+    """Test that history includes archived loans transparently, oldest first"""
+    reset_test_additions()
+
+    add_returned_loan("654321", 1, 600)
+    archive_returned_loans(older_than_days=365)
+    borrow_book_by_patron("654321", 2)
+    return_book_by_patron("654321", 2)
+
+    history = get_patron_borrow_history("654321")
+
+    assert [record["title"] for record in history] == ["The Great Gatsby", "To Kill a Mockingbird"]
+    assert get_patron_status_report("654321")["borrowing_history"] == history
+
+def test_history_pagination():
+    """Test limit/offset across the live and archived tables"""
+    reset_test_additions()
+
+    for days_ago in (700, 600, 500, 20, 10):
+        add_returned_loan("654321", 1, days_ago)
+    archive_returned_loans(older_than_days=365)
+
+    first = get_patron_borrow_history("654321", limit=2)
+    rest = get_patron_borrow_history("654321", limit=10, offset=2)
+
+    assert len(first) == 2
+    assert len(rest) == 3
+    assert first[-1]["borrow_date"] < rest[0]["borrow_date"]
+
+def test_history_excludes_open_loans():
+    """Test that loans still out are not part of the history"""
+    reset_test_additions()
+
+    assert get_patron_borrow_history("123456") == []
@@ -0,0 +1,106 @@
+import sqlite3
+import pytest
+from app import create_app
+import database
+from database import (
+    reset_test_additions,
+    insert_book,
+    get_authors,
+    init_database,
+    get_db_connection
+)
+from services.library_service import (
+    search_books_in_catalog
+)
+from services.query_stats import query_stats
+
+
+@pytest.fixture
+def client():
+    reset_test_additions()
+    return create_app().test_client()
+
+
+def test_author_search_uses_authors_table():
+    """Test partial, case-insensitive author search"""
+    reset_test_additions()
+
+    results = search_books_in_catalog("LEE", "author")
+
+    assert [book["title"] for book in results] == ["To Kill a Mockingbird"]
+
+def test_author_search_matches_from_any_word_by_index():
+    """Test that author search matches names from the start of any word, through the name key index"""
+    reset_test_additions()
+
+    assert [book["title"] for book in search_books_in_catalog("scott fitz", "author")] == ["The Great Gatsby"]
+    assert [book["title"] for book in search_books_in_catalog("f. scott", "author")] == ["The Great Gatsby"]
+    assert search_books_in_catalog("cott", "author") == []
+
+    query_stats.reset()
+    query_stats.enable(slow_ms=0)
+    try:
+        search_books_in_catalog("lee", "author")
+    finally:
+        query_stats.disable()
+    plan = [step for entry in query_stats.report()["slow"] if "author_name_keys" in entry["sql"] for step in entry["plan"]]
+    query_stats.reset()
+    assert any(step.startswith("SEARCH author_name_keys USING PRIMARY KEY") for step in plan)
+    assert not any(step.startswith("SCAN") for step in plan if "TEMP B-TREE" not in step)
+
+def test_author_search_escapes_wildcards():
+    """Test that LIKE wildcards in the search term are matched literally"""
+    reset_test_additions()
+
+    assert search_books_in_catalog("%", "author") == []
+
+def test_insert_book_reuses_author():
+    """Test that the same author in a different case maps to one author row"""
+    reset_test_additions()
+
+    insert_book("Animal Farm", "george  ORWELL", "1234567890123", 2, 2)
+    authors = get_authors("george")
+
+    assert len(authors) == 1
+    assert authors[0]["name"] == "George Orwell"
+    assert authors[0]["book_count"] == 2
+    assert authors[0]["total_copies"] == 3
+
+def test_authors_api_listing(client):
+    """Test the author listing endpoint with prefix and counts"""
+    data = client.get("/api/authors?prefix=h").get_json()
+
+    assert data["count"] == 1
+    assert data["authors"][0]["name"] == "Harper Lee"
+    assert data["authors"][0]["book_count"] == 1
+
+def test_author_api_detail(client):
+    """Test the author detail endpoint and a missing author"""
+    author_id = client.get("/api/authors?prefix=f").get_json()["authors"][0]["id"]
+    data = client.get(f"/api/authors/{author_id}").get_json()
+
+    assert data["books"][0]["title"] == "The Great Gatsby"
+    assert client.get("/api/authors/9999").status_code == 404
+
+def test_migration_backfills_authors(tmp_path, monkeypatch):
+    """Test that init_database links books in a database created before the authors table"""
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, author TEXT NOT NULL,
+            isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL, available_copies INTEGER NOT NULL
+        )
+    """)
+    conn.executemany("INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, 1, 1)",
+                     [("A", "Jane Doe", "1"), ("B", "JANE DOE", "2"), ("C", "John Roe", "3")])
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(database, "DATABASE", path)
+    init_database()
+
+    conn = get_db_connection()
+    assert conn.execute("SELECT COUNT(*) FROM authors").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM books WHERE author_id IS NULL").fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,79 @@
+import pytest
+
+from app import create_app
+from database import add_availability_listener, get_all_books, set_book_available_copies
+from services.availability_snapshot import AvailabilitySnapshot, availability_snapshot
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    """An open snapshot (checked against the database on every read) kept current by borrows and returns."""
+    snapshot = AvailabilitySnapshot(check_interval=0)
+    snapshot.open(str(tmp_path / "availability.snap"))
+    add_availability_listener(snapshot.update)
+    yield snapshot
+    snapshot.close()
+
+
+def test_snapshot_matches_database(snapshot):
+    """Test that a new snapshot answers the catalog exactly as the database does"""
+    assert snapshot.all_books() == get_all_books()
+    assert snapshot.counts(1) == (3, 3)
+    assert [book["id"] for book in snapshot.books_by_ids([3, 999, 1])] == [3, 1]
+    assert snapshot.snapshot()["rebuilds"] == 1
+
+
+def test_borrow_and_return_update_snapshot_without_rebuild(snapshot):
+    """Test that borrows and returns are written into the file and keep it current"""
+    assert borrow_book_by_patron("222222", 1)[0]
+    assert snapshot.counts(1) == (2, 3)
+    assert return_book_by_patron("222222", 1)[0]
+    assert snapshot.counts(1) == (3, 3)
+
+    metrics = snapshot.snapshot()
+    assert (metrics["rebuilds"], metrics["updates"], metrics["skipped"]) == (1, 2, 0)
+
+
+def test_change_behind_snapshot_is_caught_by_version_check(snapshot):
+    """Test that a change made without the listener leaves the snapshot behind until it is rebuilt"""
+    snapshot.check_interval = 3600
+    snapshot.counts(1)
+    assert set_book_available_copies({1: 0})
+    assert snapshot.counts(1) == (3, 3)  # Not due for a check yet
+
+    snapshot.check_interval = 0
+    assert snapshot.counts(1) == (0, 3)
+    assert snapshot.snapshot()["rebuilds"] == 2
+
+
+def test_workers_share_the_file(snapshot, tmp_path):
+    """Test that a second mapping (another worker) sees writes and rebuilds made through the first"""
+    other = AvailabilitySnapshot(check_interval=3600)
+    other.open(snapshot.path)
+    try:
+        other.counts(1)
+        snapshot.update({"id": 1, "total_copies": 3, "available_copies": 1,
+                         "version": snapshot.snapshot()["version"] + 1})
+        assert other.counts(1) == (1, 3)
+
+        set_book_available_copies({2: 0})
+        snapshot.rebuild()
+        other.check_interval = 0
+        total = next(book["total_copies"] for book in get_all_books() if book["id"] == 2)
+        assert other.counts(2) == (0, total)
+        assert other.snapshot()["rebuilds"] == 0
+    finally:
+        other.close()
+
+
+def test_catalog_page_reads_snapshot(tmp_path):
+    """Test that the catalog is served from the snapshot when the app is given one"""
+    client = create_app(availability_snapshot_path=str(tmp_path / "availability.snap")).test_client()
+    try:
+        assert client.get("/catalog").status_code == 200
+        assert availability_snapshot.snapshot()["hits"] >= 1
+        client.post("/borrow", data={"patron_id": "222222", "book_id": "1"})
+        assert availability_snapshot.counts(1) == (2, 3)
+    finally:
+        availability_snapshot.close()
@@ -0,0 +1,138 @@
+import threading
+import time
+from unittest.mock import Mock
+from app import create_app
+from services.payment_service import PaymentGateway
+from services.job_queue import JobQueue
+from services.batch_refunds import RefundBatch, run_refund_batch
+
+
+REFUNDS = [
+    {"transaction_id": "txn_1", "amount": "5.00"},
+    {"transaction_id": "txn_2", "amount": 2.5, "patron_id": "123456"},
+    {"transaction_id": "bad_3", "amount": 1.0},
+    {"transaction_id": "txn_4", "amount": -1},
+    {"transaction_id": "txn_1", "amount": 1.0},
+    {"transaction_id": "txn_5", "amount": "abc"},
+]
+
+
+def make_gateway():
+    gateway = Mock(spec=PaymentGateway)
+    gateway.refund_payment.return_value = (True, "Refund processed")
+    return gateway
+
+
+def test_load_validates_every_refund_up_front(tmp_path):
+    """Test that invalid and duplicate refunds are rejected with a reason and never sent"""
+    batch = RefundBatch(str(tmp_path / "batch.db"))
+    assert batch.load(REFUNDS) == {"pending": 2, "invalid": 4}
+
+    messages = [refund["message"] for refund in batch.results("invalid")]
+    assert messages == ["Invalid transaction ID.", "Refund amount must be greater than 0.",
+                        "Duplicate transaction ID in batch.", "Invalid refund amount."]
+
+    gateway = make_gateway()
+    summary = run_refund_batch(batch, gateway, concurrency=4)
+    assert summary["sent"] == 2 and summary["succeeded"] == 2
+    assert summary["batch"]["succeeded"] == 2 and summary["batch"]["invalid"] == 4
+    assert gateway.refund_payment.call_count == 2
+
+
+def test_declines_are_reported_per_transaction(tmp_path):
+    """Test that each refund's outcome is recorded and failures can be retried"""
+    batch = RefundBatch(str(tmp_path / "batch.db"))
+    batch.load([{"transaction_id": f"txn_{n}", "amount": 1.0} for n in range(3)])
+    gateway = make_gateway()
+    gateway.refund_payment.side_effect = lambda transaction_id, amount: (
+        (False, "Declined") if transaction_id == "txn_1" else (True, "Refund processed"))
+
+    summary = run_refund_batch(batch, gateway)
+    assert (summary["succeeded"], summary["failed"]) == (2, 1)
+    assert [refund["status"] for refund in batch.results()] == ["succeeded", "failed", "succeeded"]
+    assert batch.results("failed")[0]["message"] == "Refund failed: Declined"
+
+    # A plain rerun sends nothing; --retry-failed only resends the declined one
+    assert run_refund_batch(batch, gateway)["sent"] == 0
+    gateway.refund_payment.side_effect = None
+    summary = run_refund_batch(batch, gateway, retry_failed=True)
+    assert summary["sent"] == 1 and summary["batch"]["succeeded"] == 3
+
+
+def test_resume_skips_finished_refunds(tmp_path):
+    """Test that reopening the progress file after a crash only sends what was never sent"""
+    path = str(tmp_path / "batch.db")
+    batch = RefundBatch(path)
+    batch.load([{"transaction_id": f"txn_{n}", "amount": 1.0} for n in range(10)])
+    due = batch.due()
+    batch.mark_sent([refund["seq"] for refund in due[:4]])
+    for refund in due[:3]:
+        batch.record(refund["seq"], True, "Refund processed")
+    batch.close()  # "Crash": txn_3 was sent but its answer was lost
+
+    batch = RefundBatch(path)
+    gateway = make_gateway()
+    summary = run_refund_batch(batch, gateway)
+    assert summary["sent"] == 6
+    assert summary["batch"]["succeeded"] == 9 and summary["batch"]["sent"] == 1
+    sent_ids = {call.args[0] for call in gateway.refund_payment.call_args_list}
+    assert sent_ids == {f"txn_{n}" for n in range(4, 10)}
+
+    assert run_refund_batch(batch, gateway, retry_sent=True)["batch"]["succeeded"] == 10
+
+
+def test_concurrency_is_bounded(tmp_path):
+    """Test that no more than `concurrency` refunds are with the gateway at once"""
+    batch = RefundBatch(str(tmp_path / "batch.db"))
+    batch.load([{"transaction_id": f"txn_{n}", "amount": 1.0} for n in range(20)])
+    lock = threading.Lock()
+    active = {"now": 0, "peak": 0}
+
+    def refund_payment(transaction_id, amount):
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(0.01)
+        with lock:
+            active["now"] -= 1
+        return True, "Refund processed"
+
+    gateway = make_gateway()
+    gateway.refund_payment.side_effect = refund_payment
+    summary = run_refund_batch(batch, gateway, concurrency=4)
+
+    assert summary["succeeded"] == 20
+    assert 1 < active["peak"] <= 4
+    assert summary["refunds_per_second"] > 0
+
+
+def test_refund_batch_endpoint(tmp_path):
+    """Test that the API queues a valid batch in one go and rejects a batch with any invalid refund"""
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    client = create_app(job_queue=queue).test_client()
+
+    response = client.post("/api/jobs/refund-batches", json={"refunds": REFUNDS})
+    assert response.status_code == 400
+    assert [error["index"] for error in response.get_json()["errors"]] == [2, 3, 4, 5]
+    assert queue.metrics()["jobs"]["queued"] == 0
+
+    response = client.post("/api/jobs/refund-batches", json={"refunds": REFUNDS[:2]})
+    assert response.status_code == 202
+    job_ids = response.get_json()["job_ids"]
+    assert [queue.get(job_id)["payload"]["transaction_id"] for job_id in job_ids] == ["txn_1", "txn_2"]
+    assert client.post("/api/jobs/refund-batches", json={"refunds": []}).status_code == 400
+
+
+def test_non_finite_amounts_are_invalid(tmp_path):
+    """Test that NaN and infinite amounts are rejected by the batch file, the API and the single refund"""
+    batch = RefundBatch(str(tmp_path / "batch.db"))
+    refunds = [{"transaction_id": "txn_1", "amount": "nan"}, {"transaction_id": "txn_2", "amount": "inf"}]
+    assert batch.load(refunds) == {"pending": 0, "invalid": 2}
+    assert {refund["message"] for refund in batch.results("invalid")} == {"Invalid refund amount."}
+
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    client = create_app(job_queue=queue).test_client()
+    assert client.post("/api/jobs/refund-batches", json={"refunds": refunds}).status_code == 400
+    assert client.post("/api/jobs/refunds", json={"transaction_id": "txn_1", "amount": "nan"}).status_code == 400
+    assert client.post("/api/jobs/refund-batches", json=refunds).status_code == 400
+    assert queue.metrics()["jobs"]["queued"] == 0
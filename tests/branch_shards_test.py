@@ -0,0 +1,70 @@
+import pytest
+from app import create_app, parse_branch_databases
+from database import (
+    reset_test_additions,
+    configure_shards,
+    use_branch,
+    insert_book,
+    get_book_by_isbn,
+    get_book_copies
+)
+from services.library_service import (
+    search_books_all_branches,
+    borrow_book_by_patron
+)
+
+
+@pytest.fixture
+def client(tmp_path):
+    reset_test_additions()
+    app = create_app({"north": str(tmp_path / "north.db"), "south": str(tmp_path / "south.db")})
+    yield app.test_client()
+    configure_shards({})
+
+
+def test_branch_header_routes_writes_to_shard(client):
+    """Test that a book added for one branch only exists in that branch's shard"""
+    client.post("/add_book", headers={"X-Library-Branch": "north"},
+                data={"title": "North Book", "author": "Test Author", "isbn": "1234567890123", "total_copies": "2"})
+
+    with use_branch("north"):
+        book = get_book_by_isbn("1234567890123")
+        assert book is not None
+        assert get_book_copies(book["id"])[0]["branch"] == "north"
+    with use_branch("south"):
+        assert get_book_by_isbn("1234567890123") is None
+    assert get_book_by_isbn("1234567890123") is None
+
+def test_unknown_branch_rejected(client):
+    """Test that a request for an unconfigured branch is rejected"""
+    response = client.get("/api/search?q=gatsby&branch=west")
+
+    assert response.status_code == 400
+
+def test_search_fans_out_across_branches(client):
+    """Test that branch=all merges results from every shard"""
+    with use_branch("north"):
+        insert_book("Shared Title North", "Test Author", "1234567890123", 1, 1)
+    with use_branch("south"):
+        insert_book("Shared Title South", "Test Author", "1234567890124", 1, 1)
+
+    data = client.get("/api/search?q=shared&type=title&branch=all").get_json()
+
+    assert [(b["title"], b["branch"]) for b in data["results"]] == [
+        ("Shared Title North", "north"), ("Shared Title South", "south")]
+
+def test_loans_stay_in_branch_shard(client):
+    """Test that borrowing in a branch uses that branch's catalog and loans"""
+    with use_branch("south"):
+        insert_book("South Only", "Test Author", "1234567890125", 1, 1)
+        success, message = borrow_book_by_patron("654321", 1)
+        assert success == True
+        assert get_book_copies(1)[0]["patron_id"] == "654321"
+
+    results = search_books_all_branches("south only", "title")
+    assert results[0]["available_copies"] == 0
+
+def test_parse_branch_databases():
+    """Test parsing the branch database environment setting"""
+    assert parse_branch_databases("north=n.db, south = s.db") == {"north": "n.db", "south": "s.db"}
+    assert parse_branch_databases("") == {}
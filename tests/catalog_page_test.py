@@ -0,0 +1,35 @@
+from app import create_app
+from routes.admission import AdmissionController
+
+
+def test_catalog_is_streamed_with_a_form_per_book():
+    """Test that the catalog streams a borrow form for available books and a hold form otherwise"""
+    controller = AdmissionController()
+    client = create_app(admission=controller).test_client()
+
+    response = client.get("/catalog")
+    assert response.is_streamed
+    assert controller.snapshot()["in_flight"] == 0 # Freed before the body is sent
+    page = response.get_data(as_text=True)
+    assert page.count('<tr><td>') == 3
+    assert page.count('action="/borrow"') == 2
+    assert page.count('action="/hold"') == 1
+    assert page.rstrip().endswith("</html>")
+
+
+def test_flash_message_shown_once_on_streamed_page():
+    """Test that a flashed message is consumed by the streamed page it appears on"""
+    client = create_app().test_client()
+
+    page = client.post("/borrow", data={"patron_id": "222222", "book_id": "1"}, follow_redirects=True)
+    assert "Successfully borrowed" in page.get_data(as_text=True)
+    assert "Successfully borrowed" not in client.get("/catalog").get_data(as_text=True)
+
+
+def test_templates_compiled_into_cache_dir(tmp_path):
+    """Test that templates are compiled at startup into the bytecode cache directory"""
+    create_app(template_cache_dir=str(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 6
+
+    client = create_app(template_cache_dir=str(tmp_path)).test_client()
+    assert "Patron ID: 123456" in client.get("/status?patron_id=123456").get_data(as_text=True)
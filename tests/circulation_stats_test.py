@@ -0,0 +1,152 @@
+import pytest
+from unittest.mock import Mock
+from app import create_app
+from services.circulation_stats import circulation_report
+from services.job_queue import JobQueue, JobWorker
+from database import (
+    reset_test_additions,
+    configure_shards,
+    use_branch,
+    insert_borrow_record,
+    return_copy,
+    rollup_loan_events,
+    get_db_connection
+)
+from datetime import date, datetime
+
+
+def lend(patron_id, book_id, borrowed, due, returned=None):
+    """Record a loan (and optionally its return) at the given times"""
+    insert_borrow_record(patron_id, book_id, borrowed, due)
+    if returned:
+        return_copy(patron_id, book_id, returned)
+
+@pytest.fixture
+def client():
+    reset_test_additions()
+    return create_app().test_client()
+
+
+def test_rollup_counts_borrows_returns_and_late_returns():
+    """Test that the rollup aggregates per book and day, with lateness from the due date"""
+    reset_test_additions()
+    lend("654321", 1, datetime(2024, 1, 1), datetime(2024, 1, 15), datetime(2024, 1, 11))
+    lend("111111", 1, datetime(2024, 1, 1), datetime(2024, 1, 15), datetime(2024, 1, 20))
+    rollup_loan_events()
+
+    report = circulation_report("books", date(2024, 1, 1), date(2024, 1, 31))
+    gatsby = report["rows"][0]
+
+    assert gatsby["book_id"] == 1
+    assert gatsby["borrows"] == 2
+    assert gatsby["returns"] == 2
+    assert gatsby["late_returns"] == 1
+    assert gatsby["overdue_rate"] == 0.5
+    assert gatsby["loan_days"] == 29.0
+    assert gatsby["utilisation"] == round(29 / (3 * 31), 4)
+
+def test_rollup_is_incremental():
+    """Test that each event is aggregated exactly once across runs"""
+    reset_test_additions()
+    lend("654321", 2, datetime(2024, 2, 1), datetime(2024, 2, 15))
+
+    first = rollup_loan_events(batch_size=1)
+    again = rollup_loan_events()
+    lend("111111", 2, datetime(2024, 2, 1), datetime(2024, 2, 15))
+    later = rollup_loan_events()
+
+    conn = get_db_connection()
+    borrows = conn.execute("SELECT borrows FROM daily_book_stats WHERE day = '2024-02-01' AND book_id = 2").fetchone()[0]
+    conn.close()
+
+    assert first == 2 # Sample loan plus the new one
+    assert again == 0
+    assert later == 1
+    assert borrows == 2
+
+def test_report_combines_monthly_and_daily_rollups():
+    """Test that a range with partial months at both ends counts exactly its own days"""
+    reset_test_additions()
+    for borrowed in (datetime(2024, 1, 9), datetime(2024, 1, 10), datetime(2024, 2, 14),
+                     datetime(2024, 3, 5), datetime(2024, 3, 6)):
+        lend("654321", 2, borrowed, borrowed)
+    rollup_loan_events()
+
+    middle = circulation_report("books", date(2024, 1, 10), date(2024, 3, 5))["rows"]
+    whole_month = circulation_report("books", date(2024, 2, 1), date(2024, 2, 29))["rows"]
+
+    assert middle[0]["borrows"] == 3
+    assert whole_month[0]["borrows"] == 1
+
+def test_daily_and_author_reports():
+    """Test the per-day and per-author reports over a date range"""
+    reset_test_additions()
+    lend("654321", 1, datetime(2024, 3, 1), datetime(2024, 3, 15), datetime(2024, 3, 2))
+    lend("654321", 2, datetime(2024, 3, 2), datetime(2024, 3, 16))
+    rollup_loan_events()
+
+    daily = circulation_report("daily", date(2024, 3, 1), date(2024, 3, 2))["rows"]
+    authors = circulation_report("authors", date(2024, 3, 1), date(2024, 3, 31))["rows"]
+
+    assert [(day["day"], day["borrows"], day["returns"]) for day in daily] == [("2024-03-01", 1, 0), ("2024-03-02", 1, 1)]
+    assert {author["name"] for author in authors} == {"F. Scott Fitzgerald", "Harper Lee"}
+
+def test_report_rejects_bad_input():
+    """Test that unknown reports, orders and reversed ranges are rejected"""
+    reset_test_additions()
+
+    with pytest.raises(ValueError):
+        circulation_report("patrons")
+    with pytest.raises(ValueError):
+        circulation_report("books", order="title")
+    with pytest.raises(ValueError):
+        circulation_report("books", date(2024, 2, 1), date(2024, 1, 1))
+
+def test_stats_api(client, tmp_path):
+    """Test that the stats endpoints only read, the rollup job catches them up, and validation"""
+    lend("654321", 2, datetime(2024, 4, 1), datetime(2024, 4, 15), datetime(2024, 4, 20))
+    url = "/api/stats/books?since=2024-04-01&until=2024-04-30&order=overdue_rate"
+
+    stale = client.get(url).get_json()
+    assert stale["rows"] == []
+    assert stale["pending_events"] > 0
+    assert client.get(url).get_json()["pending_events"] == stale["pending_events"]
+
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job_id = queue.enqueue("rollup_stats", {})
+    JobWorker(queue, Mock()).run_once()
+    assert queue.get(job_id)["result"]["processed"] == stale["pending_events"]
+
+    response = client.get(url)
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert data["pending_events"] == 0
+    assert data["days"] == 30
+    assert data["rows"][0]["title"] == "To Kill a Mockingbird"
+    assert data["rows"][0]["overdue_rate"] == 1.0
+    assert client.get("/api/stats/patrons").status_code == 404
+    assert client.get("/api/stats/books?since=april").status_code == 400
+
+def test_rollup_job_covers_every_branch(tmp_path):
+    """Test that one rollup job folds the loan events of every branch shard"""
+    reset_test_additions()
+    client = create_app({"north": str(tmp_path / "north.db"), "south": str(tmp_path / "south.db")}).test_client()
+    try:
+        with use_branch("north"):
+            reset_test_additions()
+            lend("654321", 2, datetime(2024, 4, 1), datetime(2024, 4, 15))
+        url = "/api/stats/books?since=2024-04-01&until=2024-04-30&branch=north"
+        assert client.get(url).get_json()["pending_events"] > 0
+
+        queue = JobQueue(str(tmp_path / "jobs.db"))
+        job_id = queue.enqueue("rollup_stats", {})
+        JobWorker(queue, Mock()).run_once()
+
+        result = queue.get(job_id)["result"]
+        assert set(result["branches"]) == {"north", "south"}
+        data = client.get(url).get_json()
+        assert data["pending_events"] == 0
+        assert data["rows"][0]["borrows"] == 1
+    finally:
+        configure_shards({})
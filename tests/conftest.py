@@ -0,0 +1,31 @@
+import pytest
+import database
+from database import init_database, add_sample_data, copy_database
+
+
+@pytest.fixture(scope="session", autouse=True)
+def template_database(tmp_path_factory):
+    """
+    Build the seeded database once per session (per worker under pytest-xdist)
+    and point the tests at their own database file next to it, so parallel
+    workers never share library.db.
+    """
+    root = tmp_path_factory.getbasetemp()
+    original = database.DATABASE
+
+    database.DATABASE = str(root / "template.db")
+    init_database()
+    add_sample_data()
+
+    database.TEST_TEMPLATE = database.DATABASE
+    database.DATABASE = str(root / "library.db")
+    yield database.TEST_TEMPLATE
+
+    database.DATABASE = original
+    database.TEST_TEMPLATE = None
+
+
+@pytest.fixture(autouse=True)
+def fresh_database(template_database):
+    """Give every test a fresh copy of the template database."""
+    copy_database(template_database)
@@ -0,0 +1,115 @@
+from werkzeug.test import EnvironBuilder
+from app import create_app
+from database import add_availability_listener
+from services.event_bus import EventBus, live_events, publish_availability
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+def test_bursts_are_coalesced_per_book():
+    """Test that a subscriber gets only the latest event per book from a burst, in order"""
+    bus = EventBus(coalesce_seconds=0)
+    subscription = bus.subscribe()
+    for available in (3, 2, 1):
+        bus.publish("availability", 1, {"book_id": 1, "available_copies": available})
+    bus.publish("availability", 2, {"book_id": 2, "available_copies": 0})
+
+    batch = subscription.next_batch(timeout=0)
+    assert [(event["id"], event["data"]) for event in batch] == [
+        (3, {"book_id": 1, "available_copies": 1}), (4, {"book_id": 2, "available_copies": 0})]
+    assert subscription.next_batch(timeout=0) == []
+    assert bus.snapshot()["coalesced"] == 2
+
+
+def test_slow_subscriber_is_told_to_resync():
+    """Test that a subscriber who falls off the ring gets a resync instead of buffered events"""
+    bus = EventBus(capacity=4, coalesce_seconds=0)
+    slow, fast = bus.subscribe(), bus.subscribe()
+    for n in range(3):
+        bus.publish("availability", n, {"book_id": n})
+    assert len(fast.next_batch(timeout=0)) == 3
+    for n in range(3, 10):
+        bus.publish("availability", n, {"book_id": n})
+
+    assert slow.next_batch(timeout=0) is None
+    assert slow.cursor == 10
+    assert fast.next_batch(timeout=0) is None
+    bus.publish("availability", 1, {"book_id": 1})
+    assert [event["id"] for event in slow.next_batch(timeout=0)] == [11]
+
+
+def test_subscriber_limit_and_reconnect_position():
+    """Test max_subscribers, closing, and resuming from a Last-Event-ID"""
+    bus = EventBus(max_subscribers=1, coalesce_seconds=0)
+    first = bus.subscribe()
+    assert bus.subscribe() is None
+    first.close()
+    first.close()
+    assert bus.snapshot()["subscribers"] == 0
+
+    for n in range(1, 4):
+        bus.publish("availability", n, {"book_id": n})
+    resumed = bus.subscribe(last_event_id=2)
+    assert [event["id"] for event in resumed.next_batch(timeout=0)] == [3]
+
+
+def test_position_past_newest_event_resyncs():
+    """Test that a Last-Event-ID from before a server restart gets a resync, then new events"""
+    bus = EventBus(coalesce_seconds=0)
+    bus.publish("availability", 1, {"book_id": 1})
+
+    subscription = bus.subscribe(last_event_id=500)
+    assert subscription.next_batch(timeout=0) is None
+    assert subscription.cursor == 1
+    bus.publish("availability", 2, {"book_id": 2})
+    assert [event["id"] for event in subscription.next_batch(timeout=0)] == [2]
+    assert bus.snapshot()["resyncs"] == 1
+
+
+def test_borrow_and_return_publish_availability(monkeypatch):
+    """Test that checking a copy out and back in publishes the book's counters"""
+    monkeypatch.setattr(live_events, "coalesce_seconds", 0)
+    add_availability_listener(publish_availability)
+    subscription = live_events.subscribe()
+    try:
+        assert borrow_book_by_patron("222222", 1)[0]
+        assert [event["data"] for event in subscription.next_batch(timeout=0)] == [
+            {"book_id": 1, "available_copies": 2, "total_copies": 3}]
+        assert return_book_by_patron("222222", 1)[0]
+        assert subscription.next_batch(timeout=0)[0]["data"]["available_copies"] == 3
+    finally:
+        subscription.close()
+
+
+def test_events_endpoint_streams_changes(monkeypatch):
+    """Test that /api/events sends a borrow as a server-sent event and frees its slot on disconnect"""
+    monkeypatch.setattr(live_events, "coalesce_seconds", 0)
+    monkeypatch.setattr(live_events, "heartbeat_seconds", 0.01)
+    client = create_app().test_client()
+    subscribers = live_events.snapshot()["subscribers"]
+
+    response = client.get("/api/events")
+    assert response.mimetype == "text/event-stream"
+    chunks = response.response
+    assert next(chunks) == b"retry: 3000\n\n"
+    assert next(chunks) == b": keepalive\n\n"
+    assert live_events.snapshot()["subscribers"] == subscribers + 1
+
+    assert borrow_book_by_patron("222222", 2)[0]
+    event = next(chunks).decode()
+    assert "event: availability\n" in event
+    assert 'data: {"book_id":2,"available_copies":1,"total_copies":2}\n\n' in event
+
+    response.close()
+    assert live_events.snapshot()["subscribers"] == subscribers
+
+
+def test_events_slot_freed_when_client_leaves_before_first_chunk():
+    """Test that a stream closed before anything was sent still gives its subscriber slot back"""
+    app = create_app()
+    subscribers = live_events.snapshot()["subscribers"]
+
+    body = app.wsgi_app(EnvironBuilder(path="/api/events").get_environ(), lambda status, headers: None)
+    assert live_events.snapshot()["subscribers"] == subscribers + 1
+    body.close()  # What the server does when the client is gone, here before any chunk was read
+
+    assert live_events.snapshot()["subscribers"] == subscribers
@@ -0,0 +1,178 @@
+import pytest
+from unittest.mock import Mock
+from services.fee_policy import (
+    FeePolicy,
+    FeePolicyRegistry,
+    default_fee_policy,
+    fee_policies,
+    pinned_clock,
+    current_time
+)
+from services.library_service import (
+    borrow_book_by_patron,
+    calculate_late_fee_for_book,
+    get_patron_status_report,
+    refund_late_fee_payment
+)
+from services.payment_service import PaymentGateway
+from services.statements import build_statements
+from database import reset_test_additions, insert_borrow_record, get_patron_borrowed_books
+from datetime import datetime, timedelta
+
+
+def reference_fee(days_overdue):
+    """The original branchy float formula"""
+    if days_overdue < 1:
+        return 0
+    if days_overdue <= 7:
+        fee_amount = 0.50 * days_overdue
+    else:
+        fee_amount = 3.50 + (days_overdue - 7)
+    return min(fee_amount, 15.00)
+
+
+def test_table_matches_reference_formula():
+    """Test every day count from before the due date to well past the cap"""
+    for days in range(-30, 2000):
+        assert default_fee_policy.fee(days) == reference_fee(days)
+
+def test_fee_cents_are_exact():
+    """Test that amounts are whole cents and stop at the cap"""
+    assert default_fee_policy.fee_cents(3) == 150
+    assert default_fee_policy.fee_cents(18) == 1450
+    assert default_fee_policy.fee_cents(19) == 1500
+    assert default_fee_policy.fee_cents(10 ** 6) == 1500
+
+def test_custom_policy():
+    """Test a policy with other rates, including one the cap cuts mid-day"""
+    policy = FeePolicy(first_tier_cents=25, first_tier_days=2, later_cents=40, cap_cents=100)
+
+    assert [policy.fee_cents(days) for days in range(6)] == [0, 25, 50, 90, 100, 100]
+
+def test_days_overdue():
+    """Test that lateness is whole days and never negative"""
+    due = datetime(2024, 1, 10, 12)
+
+    assert FeePolicy.days_overdue(due, datetime(2024, 1, 11, 11)) == 0
+    assert FeePolicy.days_overdue(due, datetime(2024, 1, 13, 12)) == 3
+    assert FeePolicy.days_overdue(due, datetime(2024, 1, 1)) == 0
+
+def test_pinned_clock_holds_time():
+    """Test that current_time() is fixed inside a pinned block"""
+    as_of = datetime(2024, 6, 1)
+
+    with pinned_clock(as_of):
+        assert current_time() == as_of
+    assert current_time() != as_of
+
+def test_calculate_late_fee_uses_as_of():
+    """Test that the fee is measured at the given time or the pinned clock"""
+    reset_test_additions()
+    due = datetime.now() + timedelta(days=1)
+    insert_borrow_record("654321", 1, due - timedelta(days=14), due)
+
+    later = due + timedelta(days=10)
+    with pinned_clock(later):
+        pinned = calculate_late_fee_for_book("654321", 1)
+        report = get_patron_status_report("654321")
+
+    assert calculate_late_fee_for_book("654321", 1)["fee_amount"] == 0
+    assert calculate_late_fee_for_book("654321", 1, later) == {"fee_amount": 6.50, "days_overdue": 10}
+    assert pinned == {"fee_amount": 6.50, "days_overdue": 10}
+    assert report["total_late_fees"] == 6.50
+
+POLICY_CONFIG = {
+    "patron_types": {"staff": ["99"], "student": ["2", "21"]},
+    "rules": [
+        {"branch": "north", "later_cents": 200},
+        {"patron_type": "staff", "first_tier_cents": 0, "later_cents": 0},
+        {"patron_type": "student", "loan_days": 21, "cap_cents": 500},
+        {"branch": "north", "patron_type": "student", "cap_cents": 800}
+    ]
+}
+
+def test_registry_layers_rules():
+    """Test default < branch < patron type < branch and patron type"""
+    registry = FeePolicyRegistry(POLICY_CONFIG)
+
+    assert registry.policy_for("654321", "main").fee(10) == 6.50
+    assert registry.policy_for("654321", "north").fee(10) == 9.50
+    assert registry.policy_for("991234", "north").fee(30) == 0
+    assert registry.policy_for("211234", "main").fee(30) == 5.00
+    assert registry.policy_for("211234", "north").fee(30) == 8.00
+    assert registry.policy_for("211234", "main").loan_days == 21
+
+def test_registry_caches_compiled_policies():
+    """Test that keys with the same settings share one compiled policy"""
+    registry = FeePolicyRegistry(POLICY_CONFIG)
+
+    assert registry.policy_for("654321", "main") is registry.policy_for("123456", "south")
+    assert registry.policy_for("654321", "main") is not registry.policy_for("654321", "north")
+
+def test_registry_rejects_bad_config():
+    """Test that malformed rules fail when loaded, not when fees are computed"""
+    with pytest.raises(ValueError):
+        FeePolicyRegistry({"default": {"cap": 100}})
+    with pytest.raises(ValueError):
+        FeePolicyRegistry({"rules": [{"patron_type": "alumni", "cap_cents": 0}]})
+    with pytest.raises(ValueError):
+        FeePolicyRegistry({"default": {"cap_cents": -1}})
+    with pytest.raises(ValueError):
+        FeePolicyRegistry({"rules": [{"later_cents": 0}]})
+    with pytest.raises(ValueError):
+        FeePolicyRegistry({"default": {"first_tier_days": 10 ** 9, "first_tier_cents": 0}})
+    with pytest.raises(ValueError):
+        FeePolicyRegistry({"rules": [{"branch": "north", "cap_cents": 10 ** 7}]})
+    with pytest.raises(ValueError):
+        FeePolicyRegistry({"default": {"later_cents": True}})
+
+def test_evaluate_bulk_matches_single_lookups():
+    """Test bulk evaluation against one policy lookup per loan"""
+    registry = FeePolicyRegistry(POLICY_CONFIG)
+    as_of = datetime(2024, 6, 30)
+    loans = [(patron_id, as_of - timedelta(days=days))
+             for patron_id in ("654321", "991234", "211234") for days in range(-3, 40)]
+
+    fees = registry.evaluate_bulk(loans, as_of, "north")
+
+    assert fees == [registry.policy_for(patron_id, "north").fee_cents((as_of - due).days) for patron_id, due in loans]
+
+def test_policies_apply_to_borrow_fees_and_refunds():
+    """Test that the loaded policies drive due dates, late fees and the refund cap"""
+    reset_test_additions()
+    fee_policies.load(POLICY_CONFIG)
+    try:
+        borrow_book_by_patron("211234", 1)
+        due_date = get_patron_borrowed_books("211234")[0]["due_date"]
+        fee = calculate_late_fee_for_book("211234", 1, due_date + timedelta(days=30))
+        gateway = Mock(spec=PaymentGateway)
+        gateway.refund_payment.return_value = (True, "Refunded")
+        refused = refund_late_fee_payment("txn_123", 6.00, gateway, patron_id="211234")
+        allowed = refund_late_fee_payment("txn_123", 6.00, gateway, patron_id="654321")
+    finally:
+        fee_policies.load({})
+
+    assert (due_date - datetime.now()).days in (20, 21)
+    assert fee["fee_amount"] == 5.00
+    assert refused == (False, "Refund amount exceeds maximum late fee.")
+    assert allowed == (True, "Refunded")
+
+def test_fee_totals_add_whole_cents():
+    """Test that totals of fractional-dollar fees are exact (0.1 + 0.1 + 0.1 in floats is not 0.3)"""
+    reset_test_additions()
+    fee_policies.load({"default": {"first_tier_cents": 10}})
+    as_of = datetime(2024, 6, 10)
+    due = as_of - timedelta(days=1)
+    loans = [{"patron_id": "654321", "book_id": book_id, "title": "T", "author": "A",
+              "due_date": due.isoformat()} for book_id in (1, 2, 3)]
+    try:
+        for book_id in (1, 2, 3):
+            insert_borrow_record("654321", book_id, due - timedelta(days=14), due)
+        with pinned_clock(as_of):
+            report = get_patron_status_report("654321")
+        statements = build_statements({"open_loans": loans, "holds": [], "returned": []}, as_of)
+    finally:
+        fee_policies.load({})
+
+    assert report["total_late_fees"] == 0.3
+    assert statements["654321"]["total_late_fees"] == 0.3
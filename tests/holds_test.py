@@ -0,0 +1,130 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from app import create_app
+from services.library_service import (
+    place_hold,
+    cancel_hold,
+    borrow_book_by_patron,
+    return_book_by_patron,
+    add_book_to_catalog,
+    get_patron_status_report
+)
+from database import (
+    reset_test_additions,
+    get_book_by_id,
+    get_book_copies,
+    get_patron_holds,
+    check_inventory_drift
+)
+from services.fee_policy import pinned_clock
+
+
+def test_place_hold_on_unavailable_book():
+    """Test placing holds returns the queue position"""
+    reset_test_additions()
+
+    success, message = place_hold("654321", 3)
+    assert success == True
+    assert "Position in line: 1" in message
+
+    success, message = place_hold("111111", 3)
+    assert "Position in line: 2" in message
+
+def test_place_hold_uses_pinned_clock():
+    """Test that a hold is stamped with the request's pinned time, like borrows and returns"""
+    reset_test_additions()
+
+    with pinned_clock(datetime(2030, 1, 2, 3, 4, 5)):
+        assert place_hold("654321", 3)[0] == True
+    hold = get_patron_holds("654321")[0]
+    assert str(hold["created_at"]).startswith("2030-01-02")
+
+def test_place_hold_invalid():
+    """Test holds on available books, duplicates and bad patron IDs are rejected"""
+    reset_test_additions()
+
+    assert place_hold("654321", 1) == (False, "This book is available. Borrow it instead of placing a hold.")
+    place_hold("654321", 3)
+    assert place_hold("654321", 3) == (False, "You already have a hold on this book.")
+    assert place_hold("123", 3)[0] == False
+    assert place_hold("654321", 99) == (False, "Book not found.")
+
+def test_return_assigns_copy_to_head_of_queue():
+    """Test that a returned copy is set aside for the first patron in line"""
+    reset_test_additions()
+
+    place_hold("654321", 3)
+    place_hold("111111", 3)
+    return_book_by_patron("123456", 3)
+
+    assert get_book_by_id(3)["available_copies"] == 0
+    assert get_book_copies(3)[0]["status"] == "on_hold"
+    assert get_patron_holds("654321")[0]["status"] == "ready"
+    assert get_patron_holds("111111")[0]["position"] == 1
+
+    # Only the patron at the head of the queue can borrow the copy
+    assert borrow_book_by_patron("111111", 3)[0] == False
+    assert borrow_book_by_patron("654321", 3)[0] == True
+    assert get_patron_holds("654321") == []
+    assert check_inventory_drift() == []
+
+def test_cancel_ready_hold_passes_copy_on():
+    """Test cancelling a ready hold moves the copy to the next patron"""
+    reset_test_additions()
+
+    place_hold("654321", 3)
+    place_hold("111111", 3)
+    return_book_by_patron("123456", 3)
+
+    assert cancel_hold("654321", 3) == (True, "Hold cancelled.")
+    assert get_patron_holds("111111")[0]["status"] == "ready"
+
+    assert cancel_hold("111111", 3)[0] == True
+    assert get_book_by_id(3)["available_copies"] == 1
+    assert cancel_hold("111111", 3) == (False, "No hold found for this book.")
+
+def test_status_report_includes_holds():
+    """Test that the patron status report lists holds"""
+    reset_test_additions()
+
+    place_hold("654321", 3)
+
+    assert get_patron_status_report("654321")["holds"][0]["title"] == "1984"
+
+def test_holds_api():
+    """Test placing, listing and cancelling holds through the API"""
+    reset_test_additions()
+    client = create_app().test_client()
+
+    response = client.post("/api/holds", json={"patron_id": "654321", "book_id": 3})
+    assert response.status_code == 201
+
+    assert client.get("/api/holds/654321").get_json()["count"] == 1
+    assert client.delete("/api/holds/654321/3").status_code == 200
+    assert client.delete("/api/holds/654321/3").status_code == 404
+
+def test_concurrent_returns_fulfil_holds_in_order():
+    """Stress test: concurrent returns serve waiting patrons strictly first come, first served"""
+    reset_test_additions()
+
+    add_book_to_catalog("Popular Book", "Test Author", "1234567890123", 5)
+    borrowers = [f"20000{i}" for i in range(5)]
+    waiting = [f"30000{i}" for i in range(8)]
+    for patron_id in borrowers:
+        assert borrow_book_by_patron(patron_id, 4)[0] == True
+    for patron_id in waiting:
+        assert place_hold(patron_id, 4)[0] == True
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda patron_id: return_book_by_patron(patron_id, 4), borrowers))
+
+    assert all(success for success, _ in results)
+    statuses = {patron_id: get_patron_holds(patron_id)[0] for patron_id in waiting}
+    assert [statuses[p]["status"] for p in waiting] == ["ready"] * 5 + ["waiting"] * 3
+    assert [statuses[p]["position"] for p in waiting[5:]] == [1, 2, 3]
+
+    copies = get_book_copies(4)
+    assert all(copy["status"] == "on_hold" for copy in copies)
+    assert get_book_by_id(4)["available_copies"] == 0
+    assert check_inventory_drift() == []
@@ -0,0 +1,173 @@
+import pytest
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from app import create_app, configure_from_env
+from database import reset_test_additions, insert_borrow_record, configure_shards, BRANCH_DATABASES
+from services.payment_service import PaymentGateway
+from services.fee_policy import fee_policies
+from services.job_queue import JobQueue, JobWorker, start_workers, retry_delay
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def make_gateway():
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_123456_1", "Payment of $3.00 processed successfully")
+    gateway.refund_payment.return_value = (True, "Refund processed")
+    gateway.verify_payment_status.return_value = {"transaction_id": "txn_1", "status": "completed"}
+    return gateway
+
+
+def test_lease_is_exclusive_until_it_expires(queue):
+    """Test that a leased job is not handed out again until its lease expires"""
+    job_id = queue.enqueue("verify_payment", {"transaction_id": "txn_1"}, now=100.0)
+
+    assert queue.lease("a", lease_seconds=30, now=100.0)["id"] == job_id
+    assert queue.lease("b", lease_seconds=30, now=110.0) is None
+
+    # Worker a died: b takes over, and a can no longer complete it
+    assert queue.lease("b", lease_seconds=30, now=131.0)["attempts"] == 2
+    assert not queue.complete(job_id, "a", {"status": "completed"})
+    assert queue.complete(job_id, "b", {"status": "completed"})
+    assert queue.get(job_id)["status"] == "done"
+
+
+def test_failures_retry_with_backoff_then_fail(queue):
+    """Test that a raising job is retried later, and marked failed after max_attempts"""
+    job_id = queue.enqueue("verify_payment", {"transaction_id": "txn_1"}, max_attempts=2, now=100.0)
+
+    queue.lease("a", now=100.0)
+    queue.fail(job_id, "a", "ConnectionError", now=100.0)
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["error"] == "ConnectionError"
+    assert queue.lease("a", now=100.5) is None  # Backing off
+
+    assert queue.lease("a", now=100.0 + retry_delay(1) * 2)["attempts"] == 2
+    queue.fail(job_id, "a", "ConnectionError", now=200.0)
+    assert queue.get(job_id)["status"] == "failed"
+    assert queue.lease("a", now=10000.0) is None
+
+
+def test_retry_delay_grows_and_is_capped():
+    """Test the exponential backoff bounds"""
+    assert 1.0 <= retry_delay(1) <= 2.0
+    assert 8.0 <= retry_delay(4) <= 16.0
+    assert retry_delay(30) <= 300.0
+
+
+def test_worker_runs_payment_job(queue):
+    """Test that a worker pays the late fee of an overdue loan and stores the gateway's answer"""
+    reset_test_additions()
+    insert_borrow_record("222222", 1, datetime.now() - timedelta(days=20), datetime.now() - timedelta(days=6))
+    gateway = make_gateway()
+    job_id = queue.enqueue("pay_late_fees", {"patron_id": "222222", "book_id": 1})
+
+    assert JobWorker(queue, gateway).run_once() == job_id
+
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"success": True, "message": "Payment successful! Payment of $3.00 processed successfully",
+                             "transaction_id": "txn_123456_1"}
+    gateway.process_payment.assert_called_once_with(patron_id="222222", amount=3.0,
+                                                   description="Late fees for 'The Great Gatsby'")
+
+
+def test_gateway_errors_are_retried(queue):
+    """Test that a gateway exception schedules a retry instead of completing the job"""
+    gateway = make_gateway()
+    gateway.refund_payment.side_effect = ConnectionError("gateway down")
+    job_id = queue.enqueue("refund", {"transaction_id": "txn_1", "amount": 5.0})
+
+    JobWorker(queue, gateway).run_once()
+
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["attempts"] == 1
+    assert job["error"] == "ConnectionError: gateway down"
+
+
+def test_unknown_branch_fails_instead_of_using_default_database(queue):
+    """Test that a job for a branch the worker has no shard for is not run against the default database"""
+    gateway = make_gateway()
+    job_id = queue.enqueue("refund", {"transaction_id": "txn_1", "amount": 5.0}, branch="north")
+
+    JobWorker(queue, gateway).run_once()
+
+    assert queue.get(job_id)["error"] == "ValueError: Unknown branch: north"
+    gateway.refund_payment.assert_not_called()
+
+
+def test_worker_config_read_from_environment(tmp_path, monkeypatch):
+    """Test that the standalone worker's setup reads the same branch and fee policy settings as the app"""
+    policies = tmp_path / "fees.json"
+    policies.write_text('{"default": {"cap_cents": 700}}')
+    monkeypatch.setenv("LIBRARY_BRANCH_DATABASES", f"north={tmp_path / 'north.db'}")
+    monkeypatch.setenv("LIBRARY_FEE_POLICIES", str(policies))
+    try:
+        assert configure_from_env() == {"north": str(tmp_path / "north.db")}
+        assert BRANCH_DATABASES == {"north": str(tmp_path / "north.db")}
+        assert fee_policies.policy_for(branch="north").max_fee == 7.0
+    finally:
+        configure_shards({})
+        fee_policies.load({})
+
+
+def test_declines_complete_the_job(queue):
+    """Test that a gateway answer that is not a success is a result, not a retry"""
+    gateway = make_gateway()
+    gateway.refund_payment.return_value = (False, "Invalid transaction ID")
+    job_id = queue.enqueue("refund", {"transaction_id": "txn_1", "amount": 5.0})
+
+    JobWorker(queue, gateway).run_once()
+
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"success": False, "message": "Refund failed: Invalid transaction ID"}
+
+
+def test_worker_pool_drains_queue(queue):
+    """Test that several worker threads finish every queued job exactly once"""
+    gateway = make_gateway()
+    job_ids = [queue.enqueue("verify_payment", {"transaction_id": f"txn_{n}"}) for n in range(20)]
+
+    stop = threading.Event()
+    workers = start_workers(queue, 4, stop, gateway, poll_interval=0.01)
+    try:
+        for _ in range(500):
+            if queue.metrics()["jobs"]["done"] == 20:
+                break
+            stop.wait(0.01)
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+    assert all(queue.get(job_id)["attempts"] == 1 for job_id in job_ids)
+    assert gateway.verify_payment_status.call_count == 20
+    assert queue.metrics()["finished"] == 20
+
+
+def test_job_endpoints(queue):
+    """Test enqueueing through the API, validation and polling a job"""
+    reset_test_additions()
+    client = create_app(job_queue=queue).test_client()
+
+    response = client.post("/api/jobs/payments", json={"patron_id": "123456", "book_id": 3})
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    assert response.headers["Location"] == f"/api/jobs/{job_id}"
+    assert client.get(f"/api/jobs/{job_id}").get_json()["status"] == "queued"
+
+    assert client.post("/api/jobs/payments", json={"patron_id": "12", "book_id": 3}).status_code == 400
+    assert client.post("/api/jobs/refunds", json={"transaction_id": "bad", "amount": 1}).status_code == 400
+    assert client.post("/api/jobs/refunds", json={"transaction_id": "txn_1", "amount": -1}).status_code == 400
+    over_cap = client.post("/api/jobs/refunds", json={"transaction_id": "txn_1", "amount": 500})
+    assert over_cap.status_code == 400
+    assert over_cap.get_json()["error"] == "Refund amount exceeds maximum late fee."
+    assert client.post("/api/jobs/payments", json=["123456", 3]).status_code == 400
+    assert client.post("/api/jobs/verifications", json={"transaction_id": "txn_1"}).status_code == 202
+    assert client.get("/api/jobs/9999").status_code == 404
+    assert client.get("/api/jobs/metrics").get_json()["jobs"]["queued"] == 2
@@ -0,0 +1,125 @@
+import sqlite3
+import pytest
+from services.library_service import (
+    borrow_book_by_patron,
+    return_book_by_patron,
+    place_hold
+)
+from services.loan_replay import (
+    LoanState,
+    replay,
+    create_snapshot,
+    verify,
+    rebuild_availability
+)
+from database import (
+    reset_test_additions,
+    iter_loan_events,
+    get_db_connection,
+    get_book_by_id,
+    get_book_copies,
+    check_inventory_drift
+)
+
+
+def event_types():
+    return [event[1] for event in iter_loan_events()]
+
+def test_sample_loan_seeded_into_log():
+    """Test that loans open before the log existed are seeded as events"""
+    reset_test_additions()
+
+    assert event_types() == ["borrowed"]
+
+def test_borrow_and_return_append_events():
+    """Test that borrow and return each append one event"""
+    reset_test_additions()
+
+    borrow_book_by_patron("654321", 1)
+    return_book_by_patron("654321", 1)
+
+    assert event_types() == ["borrowed", "borrowed", "returned"]
+
+def test_events_are_append_only():
+    """Test that logged events cannot be changed or deleted"""
+    reset_test_additions()
+
+    conn = get_db_connection()
+    with pytest.raises(sqlite3.DatabaseError):
+        conn.execute("DELETE FROM loan_events")
+    with pytest.raises(sqlite3.DatabaseError):
+        conn.execute("UPDATE loan_events SET patron_id = '000000'")
+    conn.close()
+
+def test_replay_matches_live_tables():
+    """Test that replayed availability and open loans match the tables, including holds"""
+    reset_test_additions()
+
+    borrow_book_by_patron("654321", 1)
+    borrow_book_by_patron("654321", 2)
+    return_book_by_patron("654321", 1)
+    place_hold("111111", 3)
+    return_book_by_patron("123456", 3)
+
+    state = replay()
+
+    assert len(state.open_loans) == 1
+    assert list(state.held_copies.values()) == [(3, "111111")]
+    assert verify(state) == {"availability": [], "missing_loans": [], "extra_loans": []}
+
+def test_snapshot_plus_events_equals_full_replay():
+    """Test that replaying from a snapshot gives the same state as a full replay"""
+    reset_test_additions()
+
+    borrow_book_by_patron("654321", 1)
+    create_snapshot()
+    borrow_book_by_patron("654321", 2)
+    return_book_by_patron("654321", 1)
+
+    from_snapshot = replay()
+    full = replay(use_snapshot=False)
+
+    assert from_snapshot.open_loans == full.open_loans
+    assert from_snapshot.last_event_id == full.last_event_id
+
+def test_snapshot_round_trip():
+    """Test that a state survives serialization"""
+    state = LoanState().apply([(1, "borrowed", "654321", 2, 10, 5, None, "2024-01-01T00:00:00"),
+                               (2, "fee_paid", "654321", 2, None, None, 1.5, "2024-01-02T00:00:00")])
+
+    restored = LoanState.from_bytes(state.to_bytes())
+
+    assert restored.open_loans == {10: ("654321", 2, 5, "2024-01-01T00:00:00")}
+    assert restored.fees_paid == {"654321": 1.5}
+    assert restored.last_event_id == 2
+
+def test_rebuild_availability_fixes_counter():
+    """Test that a corrupted counter is rebuilt from the event log"""
+    reset_test_additions()
+
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET available_copies = 0 WHERE id = 1")
+    conn.commit()
+    conn.close()
+
+    assert rebuild_availability() == 1
+    assert get_book_by_id(1)["available_copies"] == 3
+
+def test_rebuild_availability_fixes_copies():
+    """Test that rebuilding sets copy statuses from the event log, keeping books in step with copies"""
+    reset_test_additions()
+    borrow_book_by_patron("654321", 2)
+    lent = [copy["id"] for copy in get_book_copies(2) if copy["status"] == "on_loan"]
+
+    conn = get_db_connection()
+    conn.execute("UPDATE copies SET status = 'on_loan' WHERE book_id = 1")
+    conn.execute("UPDATE copies SET status = 'available' WHERE id = ?", (lent[0],))
+    conn.commit()
+    conn.close()
+
+    assert rebuild_availability() == 2
+    assert get_book_by_id(1)["available_copies"] == 3
+    assert get_book_by_id(2)["available_copies"] == 1
+    assert [copy["id"] for copy in get_book_copies(2) if copy["status"] == "on_loan"] == lent
+    assert check_inventory_drift() == []
+    assert verify()["availability"] == []
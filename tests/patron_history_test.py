@@ -0,0 +1,109 @@
+import pytest
+from app import create_app
+from services.library_service import get_patron_history_page, get_patron_status_report
+from database import (
+    reset_test_additions,
+    iter_patron_borrow_history,
+    archive_returned_loans,
+    get_db_connection
+)
+from datetime import datetime, timedelta
+
+
+def add_returned_loans(patron_id, borrow_dates):
+    """Insert returned loans borrowed on the given dates"""
+    conn = get_db_connection()
+    for borrowed in borrow_dates:
+        conn.execute("""
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+            VALUES (?, ?, ?, ?, ?)
+        """, (patron_id, 1, borrowed.isoformat(), (borrowed + timedelta(days=14)).isoformat(),
+              (borrowed + timedelta(days=7)).isoformat()))
+    conn.commit()
+    conn.close()
+
+@pytest.fixture
+def client():
+    reset_test_additions()
+    return create_app().test_client()
+
+
+def test_history_iterator_is_lazy_and_ordered():
+    """Test that the iterator walks every page in borrow order without skipping ties"""
+    reset_test_additions()
+    same_day = datetime(2024, 3, 1)
+    add_returned_loans("654321", [same_day] * 3 + [datetime(2024, 1, 1), datetime(2024, 5, 1)])
+
+    history = iter_patron_borrow_history("654321", page_size=2)
+    first = next(history)
+    rest = list(history)
+
+    assert first["borrow_date"] == datetime(2024, 1, 1)
+    assert len(rest) == 4
+    assert [record["borrow_date"] for record in rest] == [same_day] * 3 + [datetime(2024, 5, 1)]
+
+def test_history_pages_follow_cursor_across_archive():
+    """Test that cursors page through archived and live loans without gaps"""
+    reset_test_additions()
+    now = datetime.now()
+    add_returned_loans("654321", [now - timedelta(days=days) for days in (900, 800, 700, 30, 20, 10)])
+    archive_returned_loans(older_than_days=365)
+
+    seen = []
+    cursor = None
+    while True:
+        page = get_patron_history_page("654321", limit=4, cursor=cursor)
+        seen += page["history"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 6
+    assert [record["borrow_date"] for record in seen] == sorted(record["borrow_date"] for record in seen)
+
+def test_history_page_invalid_cursor():
+    """Test that a malformed cursor is rejected"""
+    reset_test_additions()
+
+    with pytest.raises(ValueError):
+        get_patron_history_page("654321", cursor="not-a-cursor")
+
+def test_status_report_shows_first_page():
+    """Test that the status report holds one page of history and a cursor for the next"""
+    reset_test_additions()
+    add_returned_loans("654321", [datetime(2024, 1, 1) + timedelta(days=i) for i in range(30)])
+
+    report = get_patron_status_report("654321")
+    next_report = get_patron_status_report("654321", report["history_cursor"])
+
+    assert len(report["borrowing_history"]) == 25
+    assert len(next_report["borrowing_history"]) == 5
+    assert next_report["history_cursor"] is None
+
+def test_history_api_date_range(client):
+    """Test that since/until limit the borrow dates, both inclusive"""
+    add_returned_loans("654321", [datetime(2024, month, 15) for month in range(1, 7)])
+
+    response = client.get("/api/patrons/654321/history?since=2024-02-15&until=2024-04-15")
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert data["count"] == 3
+    assert data["next_cursor"] is None
+
+def test_history_api_cursor(client):
+    """Test following next_cursor through the API"""
+    add_returned_loans("654321", [datetime(2024, 1, 1) + timedelta(days=i) for i in range(5)])
+
+    first = client.get("/api/patrons/654321/history?limit=3").get_json()
+    second = client.get(f"/api/patrons/654321/history?limit=3&cursor={first['next_cursor']}").get_json()
+
+    assert first["count"] == 3
+    assert second["count"] == 2
+    assert second["history"][0]["borrow_date"] == "2024-01-04T00:00:00"
+
+def test_history_api_bad_input(client):
+    """Test that invalid patron IDs, dates and cursors are rejected"""
+    assert client.get("/api/patrons/12ab/history").status_code == 400
+    assert client.get("/api/patrons/654321/history?since=yesterday").status_code == 400
+    assert client.get("/api/patrons/654321/history?cursor=%25%25").status_code == 400
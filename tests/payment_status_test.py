@@ -0,0 +1,166 @@
+import threading
+import time
+import pytest
+from app import create_app
+from unittest.mock import Mock, patch
+from services.payment_service import PaymentGateway
+from services.payment_status import PaymentStatusCache, payment_statuses
+from services.library_service import refund_late_fee_payment
+
+
+class StubGateway:
+    """Local stand-in for the gateway: answers from a dict and counts round trips."""
+
+    def __init__(self, statuses=None, delay=0.0):
+        self.statuses = statuses or {}
+        self.delay = delay
+        self.calls = []
+        self.error = None
+        self.release = threading.Event()
+        self.release.set()
+
+    def _status(self, transaction_id):
+        if transaction_id not in self.statuses:
+            return {"status": "not_found", "message": "Transaction not found"}
+        return {"transaction_id": transaction_id, "status": self.statuses[transaction_id]}
+
+    def verify_payment_status(self, transaction_id):
+        self.calls.append([transaction_id])
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return self._status(transaction_id)
+
+    def verify_payment_statuses(self, transaction_ids):
+        self.calls.append(list(transaction_ids))
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return {transaction_id: self._status(transaction_id) for transaction_id in transaction_ids}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_final_statuses_never_expire_and_others_do():
+    """Test that refunded statuses stay cached while pending ones are refetched after the TTL"""
+    gateway = StubGateway({"txn_done": "refunded", "txn_wait": "pending"})
+    clock = Clock()
+    cache = PaymentStatusCache(gateway, ttl=5.0, clock=clock)
+
+    assert cache.get("txn_done")["status"] == "refunded"
+    assert cache.get("txn_wait")["status"] == "pending"
+    clock.now = 4.0
+    cache.get("txn_done"), cache.get("txn_wait")
+    assert len(gateway.calls) == 2
+
+    clock.now = 1000.0
+    gateway.statuses["txn_wait"] = "completed"
+    assert cache.get("txn_done")["status"] == "refunded"
+    assert cache.get("txn_wait")["status"] == "completed"
+    assert gateway.calls == [["txn_done"], ["txn_wait"], ["txn_wait"]]
+    assert cache.stats()["hits"] == 3
+
+
+def test_completed_payment_shows_refund():
+    """Test that a refund invalidates the cached status, and a completed status expires anyway"""
+    gateway = StubGateway({"txn_1": "completed", "txn_2": "completed"})
+    clock = Clock()
+    cache = PaymentStatusCache(gateway, ttl=5.0, clock=clock)
+    refunds = Mock(spec=PaymentGateway)
+    refunds.refund_payment.return_value = (True, "Refund processed")
+    assert cache.get("txn_1")["status"] == "completed"
+    assert cache.get("txn_2")["status"] == "completed"
+
+    gateway.statuses.update({"txn_1": "refunded", "txn_2": "refunded"})
+    with patch("services.library_service.payment_statuses", cache):
+        assert refund_late_fee_payment("txn_1", 5.0, refunds)[0]
+    assert cache.get("txn_1")["status"] == "refunded"
+
+    # Refunded elsewhere (e.g. by a job worker): seen once the TTL runs out
+    assert cache.get("txn_2")["status"] == "completed"
+    clock.now = 6.0
+    assert cache.get("txn_2")["status"] == "refunded"
+
+
+def test_eviction_is_least_recently_used():
+    """Test that a cache hit keeps an entry from being the next one evicted"""
+    gateway = StubGateway({"txn_a": "refunded", "txn_b": "refunded", "txn_c": "refunded"})
+    cache = PaymentStatusCache(gateway, max_entries=2)
+    cache.get("txn_a"), cache.get("txn_b"), cache.get("txn_a")
+
+    cache.get("txn_c")
+    cache.get("txn_a")
+
+    assert gateway.calls == [["txn_a"], ["txn_b"], ["txn_c"]]
+
+
+def test_get_many_uses_one_round_trip_for_misses():
+    """Test that a batch lookup serves cached IDs and fetches the rest together, in chunks"""
+    gateway = StubGateway({f"txn_{n}": "completed" for n in range(5)})
+    cache = PaymentStatusCache(gateway, max_batch=3)
+    cache.get("txn_0")
+
+    statuses = cache.get_many(["txn_0", "txn_1", "txn_2", "txn_1", "txn_3", "txn_4", "txn_x"])
+
+    assert list(statuses) == ["txn_0", "txn_1", "txn_2", "txn_3", "txn_4", "txn_x"]
+    assert statuses["txn_x"]["status"] == "not_found"
+    assert gateway.calls == [["txn_0"], ["txn_1", "txn_2", "txn_3"], ["txn_4", "txn_x"]]
+    statuses["txn_1"]["status"] = "tampered"
+    assert cache.get("txn_1")["status"] == "completed"
+
+
+def test_concurrent_lookups_share_one_call():
+    """Test that threads asking for the same transaction at once wait for a single gateway call"""
+    gateway = StubGateway({"txn_1": "completed"})
+    gateway.release.clear()
+    cache = PaymentStatusCache(gateway)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("txn_1"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for _ in range(500):
+        if cache.stats()["coalesced"] + cache.stats()["misses"] == 8:
+            break
+        time.sleep(0.005)
+    gateway.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(gateway.calls) == 1
+    assert [result["status"] for result in results] == ["completed"] * 8
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_gateway_errors_are_not_cached():
+    """Test that a failed call raises for the caller and leaves nothing cached or in flight"""
+    gateway = StubGateway({"txn_1": "completed"})
+    cache = PaymentStatusCache(gateway)
+    gateway.error = ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        cache.get_many(["txn_1", "txn_2"])
+    gateway.error = None
+    assert cache.get("txn_1")["status"] == "completed"
+    assert cache.stats()["misses"] == 3
+
+
+def test_payment_status_endpoints(monkeypatch):
+    """Test the single and batch status endpoints against the stub"""
+    monkeypatch.setattr(payment_statuses, "gateway", StubGateway({"txn_1": "completed", "txn_2": "pending"}))
+    payment_statuses.clear()
+    client = create_app().test_client()
+
+    assert client.get("/api/payments/txn_1/status").get_json()["status"] == "completed"
+    assert client.get("/api/payments/txn_9/status").status_code == 404
+    response = client.post("/api/payments/status", json={"transaction_ids": ["txn_1", "txn_2"]})
+    assert response.get_json()["count"] == 2
+    assert response.get_json()["statuses"]["txn_2"]["status"] == "pending"
+    assert client.post("/api/payments/status", json={"transaction_ids": "txn_1"}).status_code == 400
+    assert client.post("/api/payments/status", json=["txn_1"]).status_code == 400
+    payment_statuses.clear()
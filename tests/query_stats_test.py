@@ -0,0 +1,90 @@
+import logging
+import sqlite3
+
+import pytest
+
+import database
+from app import create_app
+from database import get_db_connection, get_all_books, get_book_by_id, get_books_by_ids
+from services.query_stats import TracedConnection, full_scans, normalize_sql, query_stats
+
+
+@pytest.fixture
+def stats():
+    """Query statistics enabled for one test, reset and disabled afterwards."""
+    query_stats.reset()
+    query_stats.enable(slow_ms=1000)
+    yield query_stats
+    query_stats.disable()
+    query_stats.reset()
+
+
+def test_normalize_folds_literals_and_in_lists():
+    """Test that statements differing only in literals and IN list length share one key"""
+    assert normalize_sql("SELECT *\n  FROM books WHERE id IN (?, ?, ?) AND title = 'It''s'") == \
+        "SELECT * FROM books WHERE id IN (?) AND title = ?"
+    assert normalize_sql("SELECT * FROM books WHERE id = 12 LIMIT 5") == "SELECT * FROM books WHERE id = ? LIMIT ?"
+
+
+def test_connections_are_plain_unless_enabled(stats):
+    """Test that only enabled statistics swap in the timing connection"""
+    conn = get_db_connection()
+    assert isinstance(conn, TracedConnection)
+    conn.close()
+    stats.disable()
+    conn = get_db_connection()
+    assert type(conn) is sqlite3.Connection
+    conn.close()
+
+
+def test_statements_counted_per_normalized_sql(stats):
+    """Test that executions are counted per statement shape with a latency histogram"""
+    get_book_by_id(1)
+    get_book_by_id(2)
+    get_books_by_ids([1, 2])
+    get_books_by_ids([1, 2, 3])
+
+    statements = {entry["sql"]: entry for entry in stats.report()["statements"]}
+    assert statements["SELECT * FROM books WHERE id = ?"]["count"] == 2
+    by_ids = statements["SELECT * FROM books WHERE id IN (?)"]
+    assert by_ids["count"] == 2
+    assert sum(by_ids["histogram"].values()) == 2
+    assert by_ids["p99_ms"] <= by_ids["max_ms"]
+
+
+def test_slow_statement_logged_with_full_scan(stats, caplog):
+    """Test that a statement over the threshold is logged with its plan and a books scan flagged"""
+    stats.slow_ms = 0
+    with caplog.at_level(logging.WARNING, logger="library.queries"):
+        get_all_books()
+        get_book_by_id(1)
+
+    slow = {entry["sql"]: entry for entry in stats.report()["slow"]}
+    assert slow["SELECT * FROM books ORDER BY title"]["full_scans"] == ["books"]
+    assert slow["SELECT * FROM books WHERE id = ?"]["full_scans"] == []
+    assert "with full scan of books: SELECT * FROM books ORDER BY title" in caplog.text
+
+
+def test_debug_queries_endpoint(stats):
+    """Test the /debug/queries report, its reset, and 404 while disabled"""
+    client = create_app().test_client()
+    client.get("/catalog").get_data()
+
+    report = client.get("/debug/queries?top=1").get_json()
+    assert report["enabled"] is True
+    assert len(report["statements"]) == 1
+    assert client.delete("/debug/queries").status_code == 200
+    assert client.get("/debug/queries").get_json()["statements"] == []
+
+    stats.disable()
+    assert client.get("/debug/queries").status_code == 404
+    assert database._connection_factory is sqlite3.Connection
+
+
+def test_full_scans_read_old_and_new_plan_formats():
+    """Test that full scans are flagged in both SQLite's pre-3.36 and current plan wording, through aliases"""
+    sql = "SELECT * FROM borrow_records br JOIN books b ON b.id = br.book_id"
+    assert full_scans(["SCAN TABLE borrow_records AS br", "SEARCH TABLE books AS b USING INTEGER PRIMARY KEY (rowid=?)"],
+                      sql) == ["borrow_records"]
+    assert full_scans(["SCAN br", "SEARCH b USING INTEGER PRIMARY KEY (rowid=?)"], sql) == ["borrow_records"]
+    assert full_scans(["SCAN TABLE books USING COVERING INDEX idx_books_title"], "SELECT title FROM books") == ["books"]
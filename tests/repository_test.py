@@ -0,0 +1,161 @@
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from database import reset_test_additions
+from repositories import SQLiteRepository, InMemoryRepository, use_repository, get_repository
+from services.library_service import (
+    add_book_to_catalog,
+    borrow_book_by_patron,
+    return_book_by_patron,
+    place_hold,
+    cancel_hold,
+    calculate_late_fee_for_book,
+    get_patron_status_report,
+    get_patron_history_page,
+    search_books_in_catalog
+)
+import database
+import repositories
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def repository(request):
+    """Each contract test runs against both backends, starting from the sample data."""
+    if request.param == "sqlite":
+        reset_test_additions()
+        repo = SQLiteRepository()
+    else:
+        repo = InMemoryRepository()
+        repo.init()
+    with use_repository(repo):
+        yield repo
+
+
+def test_sample_data(repository):
+    """Both backends start with the same three books, 1984 on loan"""
+    books = repositories.get_all_books()
+    assert [book["title"] for book in books] == ["1984", "The Great Gatsby", "To Kill a Mockingbird"]
+    assert repositories.get_book_by_isbn("9780451524935")["available_copies"] == 0
+    assert repositories.get_patron_borrow_count("123456") == 1
+
+
+def test_add_and_search_book(repository):
+    """Books added through the service can be looked up and searched by author"""
+    success, _ = add_book_to_catalog("Dune", "Frank  HERBERT", "9780441172719", 2)
+    assert success
+    assert not add_book_to_catalog("Dune", "Frank Herbert", "9780441172719", 2)[0]
+
+    book = repositories.get_book_by_isbn("9780441172719")
+    assert book["total_copies"] == 2 and book["available_copies"] == 2
+    assert repositories.get_book_by_id(book["id"])["title"] == "Dune"
+    assert [b["title"] for b in search_books_in_catalog("frank herbert", "author")] == ["Dune"]
+    assert [b["id"] for b in repositories.get_books_by_ids([book["id"], 1, 999])] == [book["id"], 1]
+
+
+def test_insert_notifies_listeners(repository, monkeypatch):
+    """Both backends pass a new book to the book insert listeners"""
+    added = []
+    monkeypatch.setattr(database, "_book_insert_listeners", [added.append])
+
+    assert add_book_to_catalog("Dune", "Frank Herbert", "9780441172719", 2)[0]
+
+    assert [(book["title"], book["available_copies"]) for book in added] == [("Dune", 2)]
+
+
+def test_borrow_return_and_history(repository):
+    """A borrow and return update availability, open loans and history alike"""
+    assert borrow_book_by_patron("222222", 1)[0]
+    assert repositories.get_book_by_id(1)["available_copies"] == 2
+    borrowed = repositories.get_patron_borrowed_books("222222")
+    assert [book["book_id"] for book in borrowed] == [1]
+    assert set(borrowed[0]) == {"book_id", "title", "author", "borrow_date", "due_date", "is_overdue"}
+
+    assert return_book_by_patron("222222", 1)[0]
+    assert not return_book_by_patron("222222", 1)[0]
+    assert repositories.get_book_by_id(1)["available_copies"] == 3
+    assert repositories.get_patron_borrow_count("222222") == 0
+
+    history = get_patron_history_page("222222")["history"]
+    assert [record["book_id"] for record in history] == [1]
+    assert history[0]["return_date"] is not None
+
+
+def test_history_pages_in_keyset_order(repository):
+    """History pages follow (borrow_date, loan_id) and honour since/until"""
+    start = datetime(2024, 1, 1)
+    for day in range(5):
+        assert repositories.borrow_copy("333333", 2, start + timedelta(days=day), start + timedelta(days=day + 14))
+        assert repositories.return_copy("333333", 2, start + timedelta(days=day, hours=1))
+
+    first = get_patron_history_page("333333", limit=2)
+    second = get_patron_history_page("333333", limit=2, cursor=first["next_cursor"])
+    dates = [record["borrow_date"].day for record in first["history"] + second["history"]]
+    assert dates == [1, 2, 3, 4]
+
+    window = get_patron_history_page("333333", since=start + timedelta(days=1), until=start + timedelta(days=3))
+    assert [record["borrow_date"].day for record in window["history"]] == [2, 3]
+    assert window["next_cursor"] is None
+
+
+def test_hold_queue(repository):
+    """A returned copy goes to the first waiting hold, and cancelling passes it on"""
+    assert place_hold("444444", 3)[1].endswith("Position in line: 1.")
+    assert place_hold("555555", 3)[1].endswith("Position in line: 2.")
+    assert not place_hold("444444", 3)[0]
+
+    assert return_book_by_patron("123456", 3)[0]
+    first, = repositories.get_patron_holds("444444")
+    second, = repositories.get_patron_holds("555555")
+    assert first["status"] == "ready" and first["position"] == 0
+    assert second["status"] == "waiting" and second["position"] == 1
+    assert repositories.get_book_by_id(3)["available_copies"] == 0
+
+    assert not borrow_book_by_patron("555555", 3)[0]
+    assert cancel_hold("444444", 3)[0]
+    assert repositories.has_ready_hold("555555", 3)
+    assert borrow_book_by_patron("555555", 3)[0]
+    assert repositories.get_patron_holds("555555") == []
+
+
+def test_late_fee_and_status(repository):
+    """Fees and the status report read loans from the active repository"""
+    borrowed = datetime.now() - timedelta(days=20)
+    repositories.borrow_copy("666666", 1, borrowed, borrowed + timedelta(days=14))
+
+    assert calculate_late_fee_for_book("666666", 1) == {"fee_amount": 3.0, "days_overdue": 6}
+    report = get_patron_status_report("666666")
+    assert report["num_books_borrowed"] == 1
+    assert report["total_late_fees"] == 3.0
+
+
+def test_default_repository_is_sqlite():
+    """Outside use_repository the SQLite repository is used"""
+    assert isinstance(get_repository(), SQLiteRepository)
+    repo = InMemoryRepository()
+    with use_repository(repo):
+        assert get_repository() is repo
+    assert isinstance(get_repository(), SQLiteRepository)
+
+
+def test_app_with_in_memory_repository():
+    """An app created with an in-memory repository serves requests from it"""
+    reset_test_additions()
+    repo = InMemoryRepository()
+    client = create_app(repository=repo).test_client()
+
+    response = client.post("/add_book", data={
+        "title": "Memory Only", "author": "A. Writer", "isbn": "9999999999999", "total_copies": "1"
+    })
+    assert response.status_code == 302
+    assert repo.get_book_by_isbn("9999999999999") is not None
+    assert b"Memory Only" in client.get("/catalog").data
+
+    # The SQLite database is untouched
+    assert isinstance(get_repository(), SQLiteRepository)
+    assert repositories.get_book_by_isbn("9999999999999") is None
+
+
+def test_in_memory_repository_refuses_availability_snapshot(tmp_path):
+    """The snapshot is versioned by SQLite's catalog_version, so the in-memory backend can't keep it"""
+    with pytest.raises(ValueError, match="requires SQLite storage"):
+        create_app(repository=InMemoryRepository(), availability_snapshot_path=str(tmp_path / "availability.snap"))
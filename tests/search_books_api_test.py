@@ -0,0 +1,70 @@
+import gzip
+import json
+import pytest
+from app import create_app
+from database import (
+    reset_test_additions,
+    insert_book
+)
+from routes import api_response
+
+
+@pytest.fixture
+def client():
+    reset_test_additions()
+    return create_app().test_client()
+
+
+def test_search_api_fields_projection(client):
+    """Test that fields= limits the columns returned per book"""
+    response = client.get("/api/search?q=gatsby&type=title&fields=id,title")
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert data["count"] == 1
+    assert data["results"][0] == {"id": 1, "title": "The Great Gatsby"}
+
+def test_search_api_unknown_field(client):
+    """Test that an unknown field is rejected"""
+    response = client.get("/api/search?q=gatsby&fields=id,password")
+
+    assert response.status_code == 400
+    assert "Unknown field" in response.get_json()["error"]
+
+def test_search_api_small_response_not_compressed(client):
+    """Test that responses under the threshold are sent as-is"""
+    response = client.get("/api/search?q=gatsby", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json()["count"] == 1
+
+def test_search_api_gzip_large_response(client, monkeypatch):
+    """Test that large responses are gzipped when the client accepts it"""
+    monkeypatch.setattr(api_response, "brotli", None)
+    for i in range(30):
+        insert_book(f"Extra Book {i}", "Test Author", f"{1000000000000 + i}", 1, 1)
+
+    response = client.get("/api/search?q=test&type=author", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    data = json.loads(gzip.decompress(response.get_data()))
+    assert data["count"] == 30
+
+def test_search_api_no_accept_encoding(client):
+    """Test that large responses stay uncompressed without Accept-Encoding"""
+    for i in range(30):
+        insert_book(f"Extra Book {i}", "Test Author", f"{1000000000000 + i}", 1, 1)
+
+    response = client.get("/api/search?q=test&type=author", headers={"Accept-Encoding": "identity"})
+
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json()["count"] == 30
+
+def test_dumps_stdlib_fallback(monkeypatch):
+    """Test that the stdlib fallback encoder produces the same JSON"""
+    payload = {"title": "1984", "count": 1}
+    fast = api_response.dumps(payload)
+    monkeypatch.setattr(api_response, "orjson", None)
+
+    assert json.loads(api_response.dumps(payload)) == json.loads(fast)
@@ -0,0 +1,70 @@
+import pytest
+from app import create_app
+from services.library_service import (
+    search_books_ranked,
+    search_books_in_catalog
+)
+from database import (
+    reset_test_additions,
+    insert_book
+)
+from services.search_index import SearchIndex, within_distance
+
+
+@pytest.fixture(autouse=True)
+def app():
+    reset_test_additions()
+    return create_app()
+
+
+def test_ranked_search_title_and_author():
+    """Test a query mixing title and author words finds the book first"""
+    results = search_books_ranked("gatsby fitzgerald")
+
+    assert results[0]["title"] == "The Great Gatsby"
+    assert results[0]["score"] > 0
+
+def test_ranked_search_typo():
+    """Test that a misspelled word still matches"""
+    results = search_books_ranked("mockingbrid")
+
+    assert results[0]["title"] == "To Kill a Mockingbird"
+
+def test_ranked_search_isbn():
+    """Test that an ISBN (with hyphens) returns the exact book"""
+    results = search_books_ranked("978-0451524935")
+
+    assert results[0]["title"] == "1984"
+
+def test_ranked_search_orders_by_relevance():
+    """Test that a title match ranks above an author-only match"""
+    insert_book("Orwell: A Life", "Bernard Crick", "1234567890123", 1, 1)
+    results = search_books_ranked("orwell life")
+
+    assert results[0]["title"] == "Orwell: A Life"
+    assert results[1]["title"] == "1984"
+
+def test_ranked_search_limit_and_empty():
+    """Test the result limit and an empty query"""
+    for i in range(10):
+        insert_book(f"Python Cookbook {i}", "Test Author", f"{1000000000000 + i}", 1, 1)
+
+    assert len(search_books_ranked("python", limit=3)) == 3
+    assert search_books_ranked("   ") == []
+
+def test_search_type_all_uses_ranking():
+    """Test that search_books_in_catalog delegates type all to ranked search"""
+    results = search_books_in_catalog("orwel 1984", "all")
+
+    assert results[0]["title"] == "1984"
+
+def test_within_distance():
+    """Test the bounded edit distance helper"""
+    assert within_distance("gatsby", "gatsby", 1) == 0
+    assert within_distance("gatbsy", "gatsby", 1) == 1
+    assert within_distance("gtasbi", "gatsby", 2) == 2
+    assert within_distance("gatsby", "gatsbyyy", 1) is None
+
+def test_search_index_empty():
+    """Test that an empty index returns nothing"""
+    assert SearchIndex().search("anything") == []
@@ -0,0 +1,62 @@
+import json
+import pytest
+from services.library_service import (
+    borrow_book_by_patron,
+    return_book_by_patron,
+    place_hold,
+    get_patron_status_report
+)
+from services.statements import generate_statements, patron_ranges
+from database import reset_test_additions, insert_borrow_record
+from datetime import datetime, timedelta
+
+
+def read_statements(files):
+    statements = {}
+    for path in files:
+        with open(path) as f:
+            for line in f:
+                statement = json.loads(line)
+                statements[statement["patron_id"]] = statement
+    return statements
+
+
+def test_patron_ranges_cover_all_ids():
+    """Test that the ranges are contiguous and cover every 6-digit ID"""
+    ranges = patron_ranges(3)
+
+    assert ranges[0][0] == "000000"
+    assert ranges[-1][1] == "999999"
+    assert all(int(ranges[i][1]) + 1 == int(ranges[i + 1][0]) for i in range(len(ranges) - 1))
+
+def test_statements_match_status_report(tmp_path):
+    """Test that batch statements agree with the per-patron status report"""
+    reset_test_additions()
+    insert_borrow_record("654321", 1, datetime.now() - timedelta(days=30), datetime.now() - timedelta(days=16))
+    borrow_book_by_patron("999999", 2)
+    return_book_by_patron("999999", 2)
+    place_hold("999999", 3)
+
+    result = generate_statements(str(tmp_path), workers=2, partitions=5)
+    statements = read_statements(result["files"])
+
+    assert len(result["files"]) == 5
+    assert set(statements) == {"123456", "654321", "999999"}
+    for patron_id in ("123456", "654321"):
+        report = get_patron_status_report(patron_id)
+        assert statements[patron_id]["total_late_fees"] == report["total_late_fees"]
+        assert statements[patron_id]["num_books_borrowed"] == report["num_books_borrowed"]
+    assert statements["654321"]["books"][0]["fee_amount"] == 12.50
+    assert statements["999999"]["holds"][0]["book_id"] == 3
+    assert statements["999999"]["returned"][0]["book_id"] == 2
+    assert result["total_late_fees"] == 12.50
+
+def test_statements_skip_old_returns(tmp_path):
+    """Test that only returns within the statement period are listed"""
+    reset_test_additions()
+    borrow_book_by_patron("654321", 2)
+    return_book_by_patron("654321", 2)
+
+    result = generate_statements(str(tmp_path), workers=1, period_start=datetime.now() + timedelta(days=1))
+
+    assert "654321" not in read_statements(result["files"])
@@ -0,0 +1,92 @@
+import pytest
+from app import create_app
+from database import (
+    reset_test_additions,
+    insert_book
+)
+import random
+import services.suggest_index
+from services.suggest_index import SuggestIndex
+
+
+@pytest.fixture
+def client():
+    reset_test_additions()
+    return create_app().test_client()
+
+
+def test_suggest_title_prefix(client):
+    """Test a title prefix returns the matching title"""
+    data = client.get("/api/suggest?q=to ki").get_json()
+
+    assert data["suggestions"] == [{"text": "To Kill a Mockingbird", "type": "title", "count": 1}]
+
+def test_suggest_ignores_leading_article(client):
+    """Test that titles can be found without their leading article"""
+    data = client.get("/api/suggest?q=GREAT&type=title").get_json()
+
+    assert data["suggestions"][0]["text"] == "The Great Gatsby"
+
+def test_suggest_author_type(client):
+    """Test that type=author only returns authors"""
+    data = client.get("/api/suggest?q=g&type=author").get_json()
+
+    assert [s["text"] for s in data["suggestions"]] == ["George Orwell"]
+
+def test_suggest_updated_on_insert(client):
+    """Test that a newly inserted book is suggested without a rebuild"""
+    insert_book("Gardens of the Moon", "Steven Erikson", "1234567890123", 1, 1)
+    data = client.get("/api/suggest?q=garden").get_json()
+
+    assert data["suggestions"][0]["text"] == "Gardens of the Moon"
+
+def test_suggest_invalid_type(client):
+    """Test that an unknown type is rejected"""
+    response = client.get("/api/suggest?q=a&type=isbn")
+
+    assert response.status_code == 400
+
+def test_suggest_index_top_k_and_counts():
+    """Test top-k limiting and shared author counts"""
+    index = SuggestIndex()
+    index.rebuild([{"title": f"Book {i}", "author": "Émile Zola"} for i in range(20)])
+
+    assert len(index.suggest("book", 5)) == 5
+    assert index.suggest("emile", 5) == [{"text": "Émile Zola", "type": "author", "count": 20}]
+    assert index.suggest("", 5) == []
+
+def test_suggest_ranks_by_book_count():
+    """Test that completions with more books come first, alphabetically among equal counts"""
+    index = SuggestIndex()
+    index.rebuild([{"title": "Dune", "author": "Frank Herbert"}] * 3 +
+                  [{"title": "Dubliners", "author": "James Joyce"}] +
+                  [{"title": "Duma Key", "author": "Stephen King"}])
+    index.add_book({"title": "Dune", "author": "Frank Herbert"})
+
+    assert index.suggest("du", 2) == [{"text": "Dune", "type": "title", "count": 4},
+                                      {"text": "Dubliners", "type": "title", "count": 1}]
+
+def test_precomputed_prefixes_match_a_scan(monkeypatch):
+    """Test that lookups served from precomputed top lists, before and after inserts, match scanning the range"""
+    rng = random.Random(3)
+    words = ["red", "rain", "river", "road", "the", "a", "night", "north"]
+    books = [{"title": " ".join(rng.choice(words) for _ in range(rng.randint(1, 3))).title(),
+              "author": f"{rng.choice(words).title()} {rng.randint(0, 5)}"} for _ in range(300)]
+    added = books[:40] + [{"title": "Red Rain Rising", "author": "Rae North"}] * 30
+
+    scanned = SuggestIndex()
+    scanned.rebuild(books)
+    monkeypatch.setattr(services.suggest_index, "TOP_RANGE", 8)
+    precomputed = SuggestIndex()
+    precomputed.rebuild(books)
+    assert precomputed._top
+
+    prefixes = ["r", "re", "red", "ri", "n", "no", "th", "the ", "a", "red r"]
+    for stage in range(2):
+        for prefix in prefixes:
+            for kind in (None, "title", "author"):
+                for k in (1, 3, 10):
+                    assert precomputed.suggest(prefix, k, kind) == scanned.suggest(prefix, k, kind), (prefix, kind, k)
+        for book in added:
+            scanned.add_book(book)
+            precomputed.add_book(book)
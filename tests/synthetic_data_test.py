@@ -0,0 +1,91 @@
+import pytest
+from datetime import datetime
+import database
+from database import init_database, get_db_connection, check_inventory_drift
+from services.loan_replay import verify
+from services.synthetic_data import generate_library, isbn13, author_name
+
+END = datetime(2024, 6, 30, 18, 0)
+
+
+@pytest.fixture
+def empty_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "synthetic.db"))
+    init_database()
+
+
+def _dump():
+    conn = get_db_connection()
+    rows = {table: conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+            for table in ("books", "copies", "borrow_records", "loan_events")}
+    conn.close()
+    return {table: [tuple(row) for row in result] for table, result in rows.items()}
+
+
+def test_isbn13_check_digit():
+    """Test that generated ISBNs are 13 digits with a valid check digit"""
+    assert isbn13(74327356) == "9780743273565"
+    for n in (0, 1, 999999999, 123456789):
+        isbn = isbn13(n)
+        assert len(isbn) == 13 and isbn.isdigit()
+        assert sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(isbn)) % 10 == 0
+
+
+def test_author_names_are_distinct():
+    """Test that every author number gets a different normalized name"""
+    names = {author_name(n).casefold() for n in range(200000)}
+    assert len(names) == 200000
+
+
+def test_generated_data_is_consistent(empty_db):
+    """Test counts, open loans, overdue rate and event log agree with each other"""
+    result = generate_library(books=300, patrons=200, years=1, now=END, seed=7)
+
+    conn = get_db_connection()
+    loans, open_loans, late = conn.execute("""
+        SELECT COUNT(*), SUM(return_date IS NULL), AVG(return_date > due_date) FROM borrow_records
+    """).fetchone()
+    too_many = conn.execute("""
+        SELECT COUNT(*) FROM (SELECT patron_id FROM borrow_records WHERE return_date IS NULL
+                              GROUP BY patron_id HAVING COUNT(*) > 5)
+    """).fetchone()[0]
+    in_future = conn.execute("SELECT COUNT(*) FROM borrow_records WHERE return_date > ? OR borrow_date > ?",
+                             (END.isoformat(), END.isoformat())).fetchone()[0]
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger')")}
+    conn.close()
+
+    assert result["books"] == 300 and result["borrow_records"] == loans
+    assert open_loans == result["open_loans"] > 0
+    assert 0.08 < late < 0.16
+    assert too_many == 0 and in_future == 0
+    assert {"idx_borrow_records_patron", "copies_after_insert", "idx_copies_book_status"} <= indexes
+
+    assert check_inventory_drift() == []
+    assert verify() == {"availability": [], "missing_loans": [], "extra_loans": []}
+
+
+def test_popularity_is_skewed(empty_db):
+    """Test that a few books account for a large share of loans"""
+    generate_library(books=1000, patrons=500, years=1, now=END)
+    conn = get_db_connection()
+    counts = [row[0] for row in conn.execute("SELECT COUNT(*) FROM borrow_records GROUP BY book_id ORDER BY 1 DESC")]
+    conn.close()
+    assert sum(counts[:10]) > 0.2 * sum(counts)
+
+
+def test_same_seed_same_data(tmp_path, monkeypatch):
+    """Test that the same seed and end time produce identical databases"""
+    dumps = []
+    for name in ("a.db", "b.db"):
+        monkeypatch.setattr(database, "DATABASE", str(tmp_path / name))
+        init_database()
+        generate_library(books=100, patrons=50, years=0.5, now=END, seed=3)
+        dumps.append(_dump())
+    assert dumps[0] == dumps[1]
+
+
+def test_refuses_non_empty_database(empty_db):
+    """Test that the generator does not mix with existing books"""
+    generate_library(books=10, patrons=10, years=0.1, now=END)
+    with pytest.raises(ValueError):
+        generate_library(books=10, patrons=10, years=0.1, now=END)